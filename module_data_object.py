@@ -62,7 +62,196 @@
 # variable values array. Previously this was only done if a 'missing_value'
 # attribute was supplied.
 #
-import datetime, netCDF4, numpy, os, platform, string, yaml
+# Changes to the code since 2018/10/25 version
+#
+# Added an optional on-disk compiled template cache to the Creator class,
+# which is enabled by the new optional input argument template_cache_directory.
+# Function Creator.load_a_template() reuses a fresh cache entry instead of
+# parsing and validating the yaml template file again. Cache entries hold
+# plain data only (they are stored with marshal rather than cPickle, so that
+# loading one cannot run code), and a cache file is ignored unless it belongs
+# to the current user and cannot be written by anyone else.
+#
+# Each template is now compiled into a flat creation plan when it is loaded.
+# Function Creator.create_from_template() runs this plan rather than walking
+# the template on every call. The previous approach is kept as a reference
+# implementation in module_data_object_benchmark.py, for comparison.
+#
+# Fixed code error in function Creator.register_a_creation_error(), which set
+# a misspelt 'no_creation_errors_have_been_encounteredl' flag. As a result,
+# missing dimension lengths or substitutions were reported but
+# create_from_template() carried on and crashed, rather than returning an
+# empty dictionary.
+#
+# Added the StreamingWriter class for writing the values of variables to a
+# netCDF file in chunks. Function write_to_netcdf_file() now shares its code
+# for defining the dimensions, variables, and attributes of the file. It
+# defines all of them before any values are written and then transfers the
+# values of each variable in slabs, rather than as a copy of the whole array.
+#
+# Fixed code error in function write_to_netcdf_file(), which crashed for any
+# variable with a _FillValue attribute, since the netCDF4 module only allows
+# this to be defined when the variable is created.
+#
+# Added optional input argument defer_reading_values to function
+# extract_from_netcdf_file(). When it is True, each values array is replaced
+# by a DeferredValues object that reads values on first access or slicing,
+# using a memory map for uncompressed netCDF 3 files.
+#
+# Added optional input argument metadata_only to function
+# extract_from_netcdf_file(), which skips reading the values of variables
+# altogether and takes their data types from the netCDF variables. For a
+# packed variable (with a scale_factor or add_offset attribute) this is the
+# data type of its unpacked values, as when the values are read.
+#
+# Added function extract_from_netcdf_files(), which extracts data objects
+# from a list of netCDF files (or a glob pattern) using a pool of worker
+# processes, yielding each result together with any error message as soon as
+# it is available.
+#
+# Added function Creator.create_many_from_template(), which creates a batch of
+# data objects from one template, computing the substitution-independent
+# attribute values once for the whole batch and optionally using a pool of
+# worker processes.
+#
+# Added function write_to_netcdf_files(), which writes a stream of data
+# objects to netCDF files using a bounded pool of worker processes or threads,
+# and returns the status and timing of each file.
+#
+# Added optional input argument netcdf_format to function
+# write_to_netcdf_file(), the StreamingWriter class, and function
+# write_to_netcdf_files(), so that netCDF 4 files can be written. Templates
+# may now declare the storage features compression_level, shuffle,
+# chunk_sizes, and endianness for each variable, which are used for netCDF 4
+# files and are read back by extract_from_netcdf_file(). Attributes are now
+# defined with a single call per variable, which greatly reduces the time
+# taken to define the structure of a netCDF 3 file.
+#
+# Templates may now declare unlimited dimensions through an optional
+# top-level 'unlimited_dimensions' entry. Data objects have a new
+# 'names_of_unlimited_dimensions' entry, which is used when writing netCDF
+# files and is filled in by extract_from_netcdf_file(). Added function
+# append_to_netcdf_file(), which adds records to an existing file along an
+# unlimited dimension after checking that the file's metadata matches the
+# data object.
+#
+# Templates are now parsed with the yaml safe loader - the libyaml based
+# CSafeLoader where it is available - rather than with yaml.Loader, which is
+# both slower and able to construct arbitrary python objects. The top level
+# of a template is checked on the composed yaml node tree, before any python
+# objects are constructed, and errors are reported with their line numbers.
+#
+# Replaced the separate validation passes over a template (the former
+# check_template_for_dimensions_and_substitutions() function has been merged
+# into check_template_for_conformity()) with a single pass that uses sets
+# for its name look-ups, so that validation time is proportional to the size
+# of the template. Every template error is now recorded, with its line and
+# column in the template file, in self.variables["template_errors"]. The
+# required global attributes and variable features, and the consistency of
+# the values given for a variable with its data type, are now checked as
+# the documentation describes. Fixed a crash when reporting a variable
+# property that is not a dictionary, and when an attribute value is an empty
+# list or an invalid format string.
+#
+# Creator objects now hold their templates in a registry keyed by data
+# object type, in place of a set of parallel lists that were searched with
+# list.index() on every create call. Each registry entry holds a template
+# with its derived tables and creation plan, and is replaced rather than
+# altered. Added functions reload_a_template() and unload_a_template(). The
+# registry is protected by a lock, so that templates can be loaded, reloaded
+# or unloaded while other threads are creating data objects.
+#
+# Added function Creator.watch_a_template_directory(), which loads the
+# templates in a directory and then polls it from a background thread,
+# reloading templates whose files change (a template that fails validation
+# leaves the previous one in use) and unloading those whose files are
+# deleted. The number of reloads and their latencies are available from
+# Creator.return_template_reload_metrics().
+#
+# The values arrays created by Creator.create_from_template() and
+# create_many_from_template() are now allocated in a single step, already
+# filled with the missing value (rather than allocated as zeros and then
+# filled), and values given in the template are copied as a whole. A new
+# optional input argument, values_allocation="deferred", defers allocating
+# the arrays until they are first written to - see the new
+# DeferredAllocationValues class.
+#
+# Creator.create_from_template() and create_many_from_template() can now be
+# given numpy arrays that the caller already holds, as values buffers keyed
+# by variable name. Their data types and shapes are checked against the
+# template and the lengths of the dimensions, and the data object then
+# refers to them instead of to newly allocated arrays.
+#
+# The list values of numerical attributes are now converted to numpy arrays
+# in a single step (by the new function return_array_for_list_value())
+# rather than one element at a time, and are checked to fit within their
+# data type. The converted arrays are held, read-only, in the creation plan,
+# so each data object receives a copy instead of a fresh conversion of the list.
+#
+# The format strings of str attribute values are now parsed once, when the
+# creation plan is compiled, and attribute values that do not depend on the
+# substitutions (str values without fields, and numerical constants) are
+# computed there too. Added function Creator.return_specialized_creator(),
+# which partially evaluates the creation plan of a template with a set of
+# substitutions (e.g. those for a site), so that only the remaining fields
+# are formatted for each data object.
+#
+# Added the TimingStatistics class and function set_timing_statistics(),
+# which record the time spent in each phase of load_a_template(),
+# create_from_template(), extract_from_netcdf_file(), and
+# write_to_netcdf_file(), and the number of bytes of values moved for each
+# variable, optionally passing each call's statistics to a callback. Timing
+# is disabled by default.
+#
+# extract_from_netcdf_file() (and extract_from_netcdf_files()) can now be
+# given the names of the variables to extract, and index or value ranges
+# for any of the dimensions, so that only those hyperslabs are read - e.g.
+# the last hour of a day-long file. The lengths of the dimensions in the data
+# object are those of the hyperslabs. DeferredValues objects can stand in for
+# a hyperslab, and translate slices of it into slices of the variable.
+#
+# Data object creation is now re-entrant, so that one Creator object can be
+# used by many threads at once. The errors encountered by a creation call
+# are kept in a list belonging to the call, in place of the shared
+# 'no_creation_errors_have_been_encountered' flag, and the substitutions are
+# passed to return_substituted_attribute_value() rather than being held in
+# the Creator object.
+#
+# Added write_to_netcdf_bytes() and extract_from_netcdf_bytes(), which turn
+# a data object into the bytes of a netCDF file and back again using the
+# netCDF library's in-memory files, so that files built to be sent over a
+# network no longer go through the filesystem. They share their bodies with
+# write_to_netcdf_file() and extract_from_netcdf_file().
+#
+# write_to_netcdf_file(), write_to_netcdf_files(), and the StreamingWriter
+# class can now write files atomically, through a temporary file in the
+# same directory that is flushed to the disk and then renamed, so that a
+# crash part way through a write never leaves a truncated file at the path.
+#
+# Added concatenate_data_objects(), which concatenates data objects and/or
+# netCDF files that share a structure along one of their dimensions, after
+# checking that their dimensions, variables, and attributes agree. The
+# values arrays are allocated once at their full length and filled one
+# input at a time, rather than grown by repeated concatenation.
+#
+# The reference implementation that creates a data object by walking the
+# template, and its sub function return_substituted_attribute_value(), have
+# been moved out of the Creator class into module_data_object_benchmark.py,
+# which is the only place they are used.
+#
+import collections, copy, datetime, errno, glob, hashlib, marshal, multiprocessing, multiprocessing.pool, netCDF4, numpy, os, platform, string, struct, tempfile, threading, time, traceback, yaml
+#
+#########
+#
+# The yaml loader used for template files. The safe schema only constructs
+# plain python types (i.e. no arbitrary python objects can be created from a
+# template file). The loader based on the libyaml C library is much faster
+# than the pure python one, which is used if PyYAML was built without it.
+#
+if hasattr(yaml,"CSafeLoader"):
+    template_loader_class = yaml.CSafeLoader
+else:
+    template_loader_class = yaml.SafeLoader
 #
 #########
 #
@@ -88,6 +277,230 @@ def return_data_type_object(data_type):
 
     return data_type_object
 #
+#########
+#
+# Internal function used by the Creator class. It converts the list value of
+# a numerical attribute (a list of ints or of floats) to a read-only numpy
+# array of the attribute's data type in a single step, rather than one
+# element at a time. None is returned if any of the values cannot be held
+# by the data type, i.e. if integers would wrap around or floats would become
+# infinite.
+#
+def return_array_for_list_value(list_value,data_type):
+    data_type_object = return_data_type_object(data_type)
+    imported_values = numpy.array(list_value)
+    attribute_value = None
+    if imported_values.dtype.kind in ["i", "u", "f"]:
+        attribute_value = imported_values.astype(data_type_object)
+        if numpy.dtype(data_type_object).kind == "i":
+            data_type_limits = numpy.iinfo(data_type_object)
+            if ((imported_values.dtype.kind == "f") or
+                (imported_values.min() < data_type_limits.min) or
+                (imported_values.max() > data_type_limits.max)):
+
+                attribute_value = None
+
+        elif numpy.any(numpy.isinf(attribute_value) !=
+                       numpy.isinf(imported_values)):
+
+            attribute_value = None
+
+    if attribute_value is not None:
+        attribute_value.flags.writeable = False
+
+    return attribute_value
+#
+######################################
+#
+# Class for collecting timing statistics from the main entry points of this
+# module: Creator.load_a_template() (and reload_a_template()),
+# Creator.create_from_template(), extract_from_netcdf_file(), and
+# write_to_netcdf_file(). Statistics are only collected once an instance has
+# been made active with set_timing_statistics(). For each entry point, the
+# number of calls, the total time, the time spent in each phase (e.g.
+# "yaml_parsing", "validation", "allocation", "attribute_formatting",
+# "dimension_and_variable_creation", "data_transfer"), and the number of
+# bytes of values moved for each variable are accumulated.
+#
+# The optional input argument callback is a function that is called at the
+# end of each instrumented call with the name of the entry point and a
+# dictionary of the statistics for that call (with the keys "seconds",
+# "seconds_per_phase", and "numbers_of_bytes_per_variable"), e.g. to forward
+# them to a metrics system. It is called in the thread that made the call.
+#
+class TimingStatistics():
+    def __init__(self,callback=None):
+        self.variables = {
+            "statistics_per_entry_point": collections.OrderedDict()}
+        self.objects = {
+            "callback": callback,
+            "lock": threading.Lock()}
+#
+#########
+#
+# Internal function used by CallTimer.finish(), which adds the statistics
+# for one call to the totals for its entry point and passes them on to the
+# callback, if there is one.
+#
+    def record_a_call(self,entry_point,call_statistics):
+        with self.objects["lock"]:
+            if entry_point not in self.variables["statistics_per_entry_point"]:
+                self.variables["statistics_per_entry_point"][entry_point] = {
+                    "number_of_calls": 0,
+                    "seconds": 0.0,
+                    "seconds_per_phase": collections.OrderedDict(),
+                    "numbers_of_bytes_per_variable":
+                        collections.OrderedDict()}
+
+            entry_point_statistics = self.variables[
+                "statistics_per_entry_point"][entry_point]
+            entry_point_statistics["number_of_calls"] += 1
+            entry_point_statistics["seconds"] += call_statistics["seconds"]
+            for phase_name, seconds in call_statistics[
+                "seconds_per_phase"].items():
+
+                entry_point_statistics["seconds_per_phase"][phase_name] = \
+                    entry_point_statistics["seconds_per_phase"].get(
+                        phase_name,0.0) + seconds
+
+            for variable_name, number_of_bytes in call_statistics[
+                "numbers_of_bytes_per_variable"].items():
+
+                entry_point_statistics["numbers_of_bytes_per_variable"][
+                    variable_name] = entry_point_statistics[
+                    "numbers_of_bytes_per_variable"].get(
+                        variable_name,0) + number_of_bytes
+
+        if self.objects["callback"] is not None:
+            self.objects["callback"](entry_point,call_statistics)
+#
+#########
+#
+# Function that returns a copy of the accumulated statistics, as a
+# dictionary keyed by entry point name. Each value is a dictionary with the
+# keys "number_of_calls", "seconds", "seconds_per_phase", and
+# "numbers_of_bytes_per_variable".
+#
+    def return_statistics(self):
+        with self.objects["lock"]:
+            statistics = copy.deepcopy(
+                self.variables["statistics_per_entry_point"])
+
+        return statistics
+#
+#########
+#
+# Function to discard the accumulated statistics.
+#
+    def reset(self):
+        with self.objects["lock"]:
+            self.variables["statistics_per_entry_point"] = \
+                collections.OrderedDict()
+#
+#########
+#
+# Function to show the accumulated statistics, with the mean time per call
+# of each entry point and of each of its phases.
+#
+    def show_statistics(self):
+        statistics = self.return_statistics()
+        print "Timing statistics"
+        for entry_point, entry_point_statistics in statistics.items():
+            number_of_calls = entry_point_statistics["number_of_calls"]
+            total_number_of_bytes = sum(
+                entry_point_statistics["numbers_of_bytes_per_variable"].values())
+            print "  %s: %d calls, %.3f ms per call, %d bytes per call" % (
+                entry_point,number_of_calls,
+                1000.0 * entry_point_statistics["seconds"] / number_of_calls,
+                total_number_of_bytes / number_of_calls)
+            for phase_name, seconds in entry_point_statistics[
+                "seconds_per_phase"].items():
+
+                print "    %-32s %.3f ms per call" % (
+                    phase_name,1000.0 * seconds / number_of_calls)
+#
+#########
+#
+# The timing statistics that are currently active, or None if timing is
+# disabled (the default). When it is disabled, each entry point only checks
+# this once, plus a test of a local variable at each phase boundary.
+#
+active_timing_statistics = None
+#
+#########
+#
+# Function to make a TimingStatistics instance active, so that the main
+# entry points record their timings in it. Calling it with None disables
+# timing again. Statistics are only collected in the calling process, not in
+# the worker processes of create_many_from_template(),
+# extract_from_netcdf_files(), or write_to_netcdf_files().
+#
+def set_timing_statistics(timing_statistics):
+    global active_timing_statistics
+    active_timing_statistics = timing_statistics
+#
+#########
+#
+# Internal function used by the main entry points. It returns a CallTimer
+# for one call of an entry point if timing is enabled, and None otherwise.
+#
+def return_call_timer(entry_point):
+    if active_timing_statistics is None:
+        return None
+    else:
+        return CallTimer(entry_point,active_timing_statistics)
+#
+#########
+#
+# Internal class that times the phases of one call of an entry point. Only
+# one phase is timed at a time; starting a phase ends the previous one, and
+# a phase that is started more than once (e.g. once per variable) has its
+# times added together. The statistics for the call are recorded in the
+# TimingStatistics instance by finish().
+#
+class CallTimer():
+    def __init__(self,entry_point,timing_statistics):
+        start_time = time.time()
+        self.variables = {
+            "entry_point": entry_point,
+            "start_time": start_time,
+            "phase_name": None,
+            "phase_start_time": start_time,
+            "seconds_per_phase": collections.OrderedDict(),
+            "numbers_of_bytes_per_variable": collections.OrderedDict()}
+        self.objects = {"timing_statistics": timing_statistics}
+
+    def start_a_phase(self,phase_name):
+        phase_start_time = time.time()
+        self.end_the_phase(phase_start_time)
+        self.variables["phase_name"] = phase_name
+        self.variables["phase_start_time"] = phase_start_time
+
+    def end_the_phase(self,end_time=None):
+        if self.variables["phase_name"] is not None:
+            if end_time is None:
+                end_time = time.time()
+            phase_name = self.variables["phase_name"]
+            self.variables["seconds_per_phase"][phase_name] = \
+                self.variables["seconds_per_phase"].get(phase_name,0.0) + \
+                end_time - self.variables["phase_start_time"]
+            self.variables["phase_name"] = None
+
+    def add_bytes_for_variable(self,variable_name,number_of_bytes):
+        self.variables["numbers_of_bytes_per_variable"][variable_name] = \
+            self.variables["numbers_of_bytes_per_variable"].get(
+                variable_name,0) + number_of_bytes
+
+    def finish(self):
+        end_time = time.time()
+        self.end_the_phase(end_time)
+        self.objects["timing_statistics"].record_a_call(
+            self.variables["entry_point"],
+            {"seconds": end_time - self.variables["start_time"],
+             "seconds_per_phase": self.variables["seconds_per_phase"],
+             "numbers_of_bytes_per_variable":
+                 self.variables["numbers_of_bytes_per_variable"]})
+#
 ######################################
 #
 # Class for creating data objects from one or more templates. The verbosity
@@ -97,49 +510,136 @@ def return_data_type_object(data_type):
 # and substitution keys for a template will be shown as soon as it is
 # loaded. 
 #
+# The template cache directory is also an optional input argument. If it is
+# given, each successfully loaded template is stored there in a compiled
+# (i.e. already parsed and validated) form, keyed by the template file's path,
+# modification time, and content hash. Subsequent loads of an unchanged
+# template file are then served from the cache without any yaml parsing or
+# re-validation.
+#
 class Creator():
-    def __init__(self,verbosity_level=1):
+    def __init__(self,verbosity_level=1,template_cache_directory=None):
         self.variables = {
             "verbosity_level": verbosity_level,
+            "template_cache_directory": template_cache_directory,
+            "template_cache_format_version": 4,
             "permissible_data_types": [
                 "str", "int8", "int16", "int32", "float32", "float64"],
             "permissible_imported_str_data_types": [str, unicode],
             "required_global_attributes": ["Conventions", "title"],
             "required_variable_features": ["data_type", "dimensions"],
             "names_of_variable_features": [
-                "data_type", "dimensions", "values"],
+                "data_type", "dimensions", "values", "compression_level",
+                "shuffle", "chunk_sizes", "endianness"],
+            "names_of_storage_features": [
+                "compression_level", "shuffle", "chunk_sizes", "endianness"],
+            "permissible_endianness_values": ["native", "little", "big"],
             "required_variable_attributes": ["units", "standard_or_long_name"],
             "no_template_errors_have_been_encountered": True,
-            "no_creation_errors_have_been_encountered": True,
-            "templates_file-name": [],
-            "templates_data-object-type": [],
-            "templates_names-of-dimensions": [],
-            "templates_names-of-unspecified-dimensions": [],
-            "templates_lengths-of-specified-dimensions": [],
-            "templates_substitution-keys": [],
-            "templates_substitution-data-types": []}
+            "template_errors": [],
+            "permissible_values_allocations": ["immediate", "deferred"],
+            "template_file_name_patterns": ["*.yaml", "*.yml"],
+            "watched_template_directories": [],
+            "watched_template_files": {},
+            "template_polling_interval": 1.0,
+            "template_reload_metrics": {
+                "number_of_reloads": 0,
+                "number_of_failed_reloads": 0,
+                "latest_reload_latency": None,
+                "maximum_reload_latency": None,
+                "total_reload_latency": 0.0},
+            "names_of_cached_template_items": [
+                "template", "data_object_type", "substitution_keys",
+                "substitution_data_types", "names_of_dimensions",
+                "names_of_unspecified_dimensions",
+                "names_of_unlimited_dimensions",
+                "lengths_of_specified_dimensions"]}
 
         self.objects = {
-            "templates": [],
+            "templates": collections.OrderedDict(),
+            "templates_lock": threading.RLock(),
+            "template_loading_lock": threading.RLock(),
+            "template_being_loaded": {},
+            "template_watcher_thread": None,
+            "template_watcher_stop_event": None,
+            "template_node": None,
             "string_formatter": string.Formatter()}
 #
 #########
 #
-# Internal function to register a template error
+# Internal function to register a template error. If the path within the
+# template to which the error relates is given - i.e. a tuple of the keys
+# and list indices leading to it from the top level - the line and column
+# of that location in the template file are added to the error message. They
+# are looked up in the yaml node tree only when an error occurs. Every error
+# is also recorded in self.variables["template_errors"].
 #
-    def register_a_template_error(self,error_message):
+    def register_a_template_error(self,error_message,template_path=None):
         self.variables["no_template_errors_have_been_encountered"] = False
+        template_error = {
+            "error_message": error_message,
+            "line_number": None,
+            "column_number": None}
+
+        if ((template_path is not None) and
+            (self.objects["template_node"] is not None)):
+
+            template_node = self.return_template_node_for_path(template_path)
+            template_error["line_number"] = template_node.start_mark.line + 1
+            template_error["column_number"] = \
+                template_node.start_mark.column + 1
+            error_message = "%s (line %i, column %i)" % (
+                error_message,template_error["line_number"],
+                template_error["column_number"])
+
+        self.variables["template_errors"].append(template_error)
         if self.variables["verbosity_level"] > 0:
             print "ERROR: %s() in template file %s" % (
-                self.__class__,self.variables["templates_file-name"][-1])
+                self.__class__,
+                self.objects["template_being_loaded"].get(
+                    "file_name","unknown"))
             print "  %s" % error_message
 #
 #########
 #
-# Internal function to register a data object creation error
+# Internal sub function of register_a_template_error, which returns the node
+# of the yaml node tree at the end of a path within the template. If the path
+# cannot be followed all of the way, e.g. because part of the template does
+# not have the expected structure, the last node that was reached is
+# returned. If a key appears more than once in a dictionary, its last
+# occurrence is used, since that is the one that yaml loads.
+#
+    def return_template_node_for_path(self,template_path):
+        template_node = self.objects["template_node"]
+        for path_element in template_path:
+            next_template_node = None
+            if ((type(path_element) == int) and
+                isinstance(template_node,yaml.SequenceNode) and
+                (path_element < len(template_node.value))):
+
+                next_template_node = template_node.value[path_element]
+
+            elif isinstance(template_node,yaml.MappingNode):
+                for key_node, value_node in template_node.value:
+                    if key_node.value == path_element:
+                        next_template_node = value_node
+
+            if next_template_node is None:
+                break
+            else:
+                template_node = next_template_node
+
+        return template_node
+#
+#########
+#
+# Internal function to register a data object creation error. The errors are
+# appended to a list that belongs to the call in which they are encountered
+# (rather than flagged in the Creator object), so that concurrent calls from
+# different threads cannot see each other's errors.
 #
-    def register_a_creation_error(self,error_message):
-        self.variables["no_creation_errors_have_been_encounteredl"] = False
+    def register_a_creation_error(self,error_message,creation_errors):
+        creation_errors.append(error_message)
         if self.variables["verbosity_level"] > 0:
             print "ERROR: %s() in creating a data object" % self.__class__
             print "  %s" % error_message
@@ -164,9 +664,11 @@ class Creator():
         if not os.path.isfile(template_file_path):
             self.show_a_warning("unable to test parse a template file since its path is invalid, %s" % template_file_path)
         else:
-            print "Test parsing a template"
+            print "Test parsing a template using %s" % (
+                template_loader_class.__name__)
             test_parse = yaml.load(
-                file(template_file_path,"r"),Loader=yaml.Loader)
+                file(template_file_path,"rb").read(),
+                Loader=template_loader_class)
             print "\nThe template has been parsed successfully"
 #
 #########
@@ -175,356 +677,1047 @@ class Creator():
 # If no errors have been encountered, the function returns the data object type
 # identifier string, which is given in the template file. Otherwise it
 # returns an empty string, i.e. ""
+#
+# A template cannot be loaded for a data object type that already has one.
+# Use reload_a_template() to replace it.
 #
     def load_a_template(self,template_file_path):
-        self.variables["no_template_errors_have_been_encountered"] = True
-        self.variables["templates_file-name"].append("unknown")
+        return self.register_a_template_from_file(template_file_path,False)
+#
+#########
+#
+# Function to reload a template, e.g. after its file has been edited. The
+# template is loaded and validated exactly as by load_a_template(), and it
+# then replaces any template already registered for its data object type in
+# a single step. Create calls that are running at the time finish with the
+# template that they started with. If the new template has errors, the
+# previous one stays registered and "" is returned. If the file previously
+# held a template of another data object type, that template is unloaded.
+#
+    def reload_a_template(self,template_file_path):
+        return self.register_a_template_from_file(template_file_path,True)
+#
+#########
+#
+# Function to unload the template for a data object type, so that no more
+# data objects can be created from it. Create calls that are running at the
+# time are not affected. The exit code is 0 for success and 1 if no template
+# has been loaded for the data object type.
+#
+    def unload_a_template(self,data_object_type):
+        exit_code = 1
+        with self.objects["templates_lock"]:
+            if data_object_type in self.objects["templates"]:
+                del self.objects["templates"][data_object_type]
+                exit_code = 0
+
+        if exit_code != 0:
+            self.show_a_warning("there is no template for data object type %s" % data_object_type)
+
+        return exit_code
+#
+#########
+#
+# Internal function used by load_a_template() and reload_a_template(). The
+# templates are held in a registry keyed by data object type. Each entry is
+# a dictionary holding the template, the dimension and substitution tables
+# derived from it, and its creation plan, and is never altered once it has
+# been registered. Loading is serialized by its own lock, so that the
+# registry lock is only held while an entry is looked up or swapped in.
+#
+    def register_a_template_from_file(
+        self,template_file_path,replace_existing_template):
+
+        if replace_existing_template:
+            call_timer = return_call_timer("reload_a_template")
+        else:
+            call_timer = return_call_timer("load_a_template")
+
+        data_object_type = ""
+        with self.objects["template_loading_lock"]:
+            self.variables["no_template_errors_have_been_encountered"] = True
+            self.variables["template_errors"] = []
+            template_entry = self.return_template_entry_for_file(
+                template_file_path,call_timer)
+
+            if call_timer is not None:
+                call_timer.start_a_phase("registration")
+
+            if template_entry != {}:
+                with self.objects["templates_lock"]:
+                    if ((not replace_existing_template) and
+                        (template_entry["data_object_type"] in
+                         self.objects["templates"])):
+
+                        self.register_a_template_error("a template has already been loaded for data object type '%s'" % template_entry["data_object_type"],("data_object_type",))
+                    else:
+                        if replace_existing_template:
+                            for registered_data_object_type, registered_template_entry in self.objects["templates"].items():
+                                if ((registered_template_entry["file_path"] ==
+                                     template_entry["file_path"]) and
+                                    (registered_data_object_type !=
+                                     template_entry["data_object_type"])):
+
+                                    del self.objects["templates"][
+                                        registered_data_object_type]
+
+                        data_object_type = template_entry["data_object_type"]
+                        self.objects["templates"][data_object_type] = \
+                            template_entry
+
+            self.objects["template_node"] = None
+            self.objects["template_being_loaded"] = {}
+
+        if call_timer is not None:
+            call_timer.finish()
+
+        if (data_object_type != "") and (self.variables["verbosity_level"] > 1):
+            self.show_requirements_for_template(data_object_type)
+
+        return data_object_type
+#
+#########
+#
+# Internal function that returns the registry entry for a template file,
+# either from a fresh compiled template cache entry or by parsing and
+# validating the file, or an empty dictionary if the template has errors.
+# The entry is filled in as the template is validated. The phases of the
+# load are timed if a call timer is given (see set_timing_statistics()).
+#
+    def return_template_entry_for_file(self,template_file_path,call_timer=None):
+        template_entry = {
+            "file_name": "unknown",
+            "file_path": os.path.abspath(template_file_path)}
+        self.objects["template_being_loaded"] = template_entry
 
         if not os.path.isfile(template_file_path):
             self.register_a_template_error("invalid template file path")
         else:
-            self.variables["templates_file-name"][-1] = os.path.basename(
+            if call_timer is not None:
+                call_timer.start_a_phase("file_reading")
+
+            template_entry["file_name"] = os.path.basename(template_file_path)
+            template_file_contents = file(template_file_path,"rb").read()
+            if call_timer is not None:
+                call_timer.start_a_phase("cache_reading")
+
+            template_cache_entry = self.return_template_cache_entry(
+                template_file_path,template_file_contents)
+
+            if template_cache_entry != {}:
+                for item_name in self.variables[
+                    "names_of_cached_template_items"]:
+
+                    template_entry[item_name] = template_cache_entry[item_name]
+            else:
+                template = self.return_parsed_template(
+                    template_file_contents,call_timer)
+                if template is not None:
+                    template_entry["template"] = template
+                    template_entry["data_object_type"] = ""
+                    template_entry["substitution_keys"] = []
+                    template_entry["substitution_data_types"] = []
+                    template_entry["names_of_dimensions"] = []
+                    template_entry["names_of_unspecified_dimensions"] = []
+                    template_entry["names_of_unlimited_dimensions"] = []
+                    template_entry["lengths_of_specified_dimensions"] = {}
+                    if call_timer is not None:
+                        call_timer.start_a_phase("validation")
+
+                    self.check_template_for_conformity()
+
+                    if self.variables["no_template_errors_have_been_encountered"]:
+                        if call_timer is not None:
+                            call_timer.start_a_phase("cache_writing")
+
+                        self.save_template_cache_entry(
+                            template_file_path,template_file_contents)
+
+        if self.variables["no_template_errors_have_been_encountered"]:
+            if call_timer is not None:
+                call_timer.start_a_phase("plan_compilation")
+
+            template_entry["creation_plan"] = \
+                self.return_creation_plan_for_template(template_entry)
+        else:
+            template_entry = {}
+
+        return template_entry
+#
+#########
+#
+# Internal function that returns the registry entry for a data object type,
+# or an empty dictionary if no template has been loaded for it. Since
+# entries are replaced rather than altered, the entry returned can be used
+# without holding the registry lock.
+#
+    def return_template_entry(self,data_object_type):
+        with self.objects["templates_lock"]:
+            template_entry = self.objects["templates"].get(data_object_type,{})
+
+        return template_entry
+#
+#########
+#
+# Function to run the Creator as a service that watches a directory of yaml
+# templates (files whose names end in .yaml or .yml). The templates already
+# in the directory are loaded before the function returns. A background
+# thread then checks the directory every polling_interval seconds, and
+# reloads any template file that has been added or changed, using
+# reload_a_template(). A template that fails validation therefore leaves the
+# previous good template in use. Templates whose files have been deleted
+# are unloaded. More than one directory can be watched, by calling this
+# function for each one. The exit code is 0 for success and 1 if the
+# directory does not exist.
+#
+    def watch_a_template_directory(
+        self,template_directory_path,polling_interval=1.0):
+
+        exit_code = 1
+        if not os.path.isdir(template_directory_path):
+            self.show_a_warning("unable to watch a template directory since its path is invalid, %s" % template_directory_path)
+        else:
+            with self.objects["template_loading_lock"]:
+                absolute_template_directory_path = os.path.abspath(
+                    template_directory_path)
+                if absolute_template_directory_path not in self.variables[
+                    "watched_template_directories"]:
+
+                    self.variables["watched_template_directories"].append(
+                        absolute_template_directory_path)
+
+                self.variables["template_polling_interval"] = polling_interval
+                self.check_template_directories_for_changes(False)
+
+                if self.objects["template_watcher_thread"] is None:
+                    self.objects["template_watcher_stop_event"] = \
+                        threading.Event()
+                    self.objects["template_watcher_thread"] = threading.Thread(
+                        target=self.run_template_watcher,
+                        args=(self.objects["template_watcher_stop_event"],))
+                    self.objects["template_watcher_thread"].daemon = True
+                    self.objects["template_watcher_thread"].start()
+
+            exit_code = 0
+
+        return exit_code
+#
+#########
+#
+# Function to stop watching template directories. The templates that have
+# been loaded from them remain loaded.
+#
+    def stop_watching_template_directories(self):
+        if self.objects["template_watcher_thread"] is not None:
+            self.objects["template_watcher_stop_event"].set()
+            self.objects["template_watcher_thread"].join()
+            self.objects["template_watcher_thread"] = None
+            self.objects["template_watcher_stop_event"] = None
+
+        with self.objects["template_loading_lock"]:
+            self.variables["watched_template_directories"] = []
+            self.variables["watched_template_files"] = {}
+#
+#########
+#
+# Internal function that is run by the template watcher thread until it is
+# stopped. An unexpected exception while checking the template directories
+# is shown as a warning rather than ending the thread.
+#
+    def run_template_watcher(self,stop_event):
+        while not stop_event.wait(self.variables["template_polling_interval"]):
+            try:
+                self.check_template_directories_for_changes()
+            except Exception:
+                self.show_a_warning("unable to check the template directories for changes\n  %s" % traceback.format_exc().strip().splitlines()[-1])
+#
+#########
+#
+# Function that checks the watched template directories once, reloading any
+# template file whose modification time or size has changed since the last
+# check, and unloading the templates of any file that has been deleted. It
+# is called by the template watcher thread, but can also be called directly,
+# e.g. by a service that prefers to poll from its own main loop. Unless
+# record_metrics is False, each reload is counted in the template reload
+# metrics (see return_template_reload_metrics). The number of template files
+# that were reloaded successfully is returned.
+#
+    def check_template_directories_for_changes(self,record_metrics=True):
+        number_of_templates_reloaded = 0
+        with self.objects["template_loading_lock"]:
+            template_file_states = {}
+            for template_directory_path in self.variables[
+                "watched_template_directories"]:
+
+                for template_file_name_pattern in self.variables[
+                    "template_file_name_patterns"]:
+
+                    for template_file_path in glob.glob(os.path.join(
+                        template_directory_path,template_file_name_pattern)):
+
+                        try:
+                            template_file_status = os.stat(template_file_path)
+                        except OSError:
+                            continue
+                        template_file_states[template_file_path] = (
+                            template_file_status.st_mtime,
+                            template_file_status.st_size)
+
+            for template_file_path in sorted(template_file_states):
+                if (self.variables["watched_template_files"].get(
+                    template_file_path) !=
+                    template_file_states[template_file_path]):
+
+                    data_object_type = self.reload_a_template(
+                        template_file_path)
+                    if data_object_type != "":
+                        number_of_templates_reloaded += 1
+
+                    if record_metrics:
+                        self.record_a_template_reload(
+                            data_object_type,
+                            template_file_states[template_file_path][0])
+
+            for template_file_path in self.variables["watched_template_files"]:
+                if template_file_path not in template_file_states:
+                    with self.objects["templates_lock"]:
+                        for data_object_type, template_entry in \
+                            self.objects["templates"].items():
+
+                            if template_entry["file_path"] == template_file_path:
+                                del self.objects["templates"][data_object_type]
+
+            self.variables["watched_template_files"] = template_file_states
+
+        return number_of_templates_reloaded
+#
+#########
+#
+# Internal function that records a template reload in the template reload
+# metrics. The reload latency is the time from the modification of the
+# template file to the new template being in use, so it includes the time
+# spent waiting for the next check of the directory.
+#
+    def record_a_template_reload(
+        self,data_object_type,template_file_modification_time):
+
+        reload_latency = max(0.0,time.time() - template_file_modification_time)
+        with self.objects["templates_lock"]:
+            template_reload_metrics = self.variables["template_reload_metrics"]
+            if data_object_type == "":
+                template_reload_metrics["number_of_failed_reloads"] += 1
+            else:
+                template_reload_metrics["number_of_reloads"] += 1
+                template_reload_metrics["total_reload_latency"] += \
+                    reload_latency
+                template_reload_metrics["latest_reload_latency"] = \
+                    reload_latency
+                if ((template_reload_metrics["maximum_reload_latency"] is None)
+                    or (reload_latency >
+                        template_reload_metrics["maximum_reload_latency"])):
+
+                    template_reload_metrics["maximum_reload_latency"] = \
+                        reload_latency
+#
+#########
+#
+# Function that returns a copy of the template reload metrics, i.e. a
+# dictionary with the number of templates reloaded successfully by the
+# template directory watcher, the number of reloads that failed validation
+# (for which the previous template was kept), and the latest, maximum, and
+# mean reload latencies in seconds (None until a template has been reloaded).
+#
+    def return_template_reload_metrics(self):
+        with self.objects["templates_lock"]:
+            template_reload_metrics = dict(
+                self.variables["template_reload_metrics"])
+
+        template_reload_metrics["mean_reload_latency"] = None
+        if template_reload_metrics["number_of_reloads"] > 0:
+            template_reload_metrics["mean_reload_latency"] = \
+                template_reload_metrics["total_reload_latency"] / \
+                template_reload_metrics["number_of_reloads"]
+
+        return template_reload_metrics
+#
+#########
+#
+# Internal function that returns the path of the file within the template
+# cache directory that is used for a particular template file. The name is
+# derived from the absolute path of the template file, so that templates
+# sharing a base name in different directories do not collide.
+#
+    def return_template_cache_file_path(self,template_file_path):
+        absolute_template_file_path = os.path.abspath(template_file_path)
+        template_cache_file_name = "%s.%s.cache" % (
+            os.path.basename(absolute_template_file_path),
+            hashlib.sha1(absolute_template_file_path).hexdigest()[:16])
+
+        return os.path.join(
+            self.variables["template_cache_directory"],template_cache_file_name)
+#
+#########
+#
+# Internal function that returns the compiled template cache entry for a
+# template file, provided that one exists and is fresh, i.e. that it was
+# created from a file with the same path, modification time, and content hash.
+# Otherwise it returns an empty dictionary. Since the cache directory may be
+# shared, a cache file that doesn't belong to the current user, or that can
+# be written by its group or by others, is not trusted and is ignored.
+#
+    def return_template_cache_entry(
+        self,template_file_path,template_file_contents):
+
+        template_cache_entry = {}
+        if self.variables["template_cache_directory"] is not None:
+            template_cache_file_path = self.return_template_cache_file_path(
+                template_file_path)
+            if os.path.isfile(template_cache_file_path):
+                try:
+                    template_cache_file = file(template_cache_file_path,"rb")
+                    try:
+                        file_status = os.fstat(template_cache_file.fileno())
+                        if (((hasattr(os,"getuid")) and
+                             (file_status.st_uid != os.getuid())) or
+                            (file_status.st_mode & 0022)):
+
+                            self.show_a_warning("ignoring template cache file %s, which belongs to another user or can be written by others" % template_cache_file_path)
+                        else:
+                            template_cache_entry = marshal.load(
+                                template_cache_file)
+                    finally:
+                        template_cache_file.close()
+                except:
+                    template_cache_entry = {}
+                    self.show_a_warning("unable to read template cache file %s" % template_cache_file_path)
+
+            if template_cache_entry != {}:
+                if ((type(template_cache_entry) != dict) or
+                    (template_cache_entry.get("cache_format_version") !=
+                     self.variables["template_cache_format_version"]) or
+                    (template_cache_entry.get("template_file_path") !=
+                     os.path.abspath(template_file_path)) or
+                    (template_cache_entry.get("template_file_modification_time") !=
+                     os.path.getmtime(template_file_path)) or
+                    (template_cache_entry.get("template_file_content_hash") !=
+                     hashlib.sha1(template_file_contents).hexdigest())):
+
+                    template_cache_entry = {}
+
+        return template_cache_entry
+#
+#########
+#
+# Internal function that stores the template being loaded (which has been
+# validated) in the compiled template cache directory. The cache file is
+# written to a temporary file and then renamed, so that concurrently starting
+# processes never read a partially written cache entry. Failing to write the
+# cache only results in a warning, since the template itself has loaded.
+#
+    def save_template_cache_entry(
+        self,template_file_path,template_file_contents):
+
+        if self.variables["template_cache_directory"] is not None:
+            template_cache_entry = {
+                "cache_format_version": 
+                    self.variables["template_cache_format_version"],
+                "template_file_path": os.path.abspath(template_file_path),
+                "template_file_modification_time": 
+                    os.path.getmtime(template_file_path),
+                "template_file_content_hash": 
+                    hashlib.sha1(template_file_contents).hexdigest()}
+            for item_name in self.variables["names_of_cached_template_items"]:
+                template_cache_entry[item_name] = \
+                    self.objects["template_being_loaded"][item_name]
+
+            template_cache_file_path = self.return_template_cache_file_path(
                 template_file_path)
+            temporary_file_path = ""
             try:
-                self.objects["templates"].append(
-                    yaml.load(file(template_file_path,"r"),
-                              Loader=yaml.Loader))    
+                if not os.path.isdir(
+                    self.variables["template_cache_directory"]):
+
+                    os.makedirs(self.variables["template_cache_directory"])
+
+                temporary_file_descriptor, temporary_file_path = \
+                    tempfile.mkstemp(
+                        dir=self.variables["template_cache_directory"],
+                        suffix=".tmp")
+                temporary_file = os.fdopen(temporary_file_descriptor,"wb")
+                marshal.dump(template_cache_entry,temporary_file)
+                temporary_file.close()
+                os.rename(temporary_file_path,template_cache_file_path)
             except:
-                self.register_a_template_error(
-                    "template file fails yaml parsing")
-                del self.variables["templates_file-name"][-1]                
-            else:
-                self.variables["templates_data-object-type"].append("")
-                self.variables["templates_substitution-keys"].append([])
-                self.variables["templates_substitution-data-types"].append([])
-                self.variables["templates_names-of-dimensions"].append([])
-                self.variables["templates_names-of-unspecified-dimensions"].append([])
-                self.variables["templates_lengths-of-specified-dimensions"].append({})
-                self.check_template_for_conformity()
-
-                if self.variables["no_template_errors_have_been_encountered"]:
-                    self.check_template_for_dimensions_and_substitutions()
-                    if self.variables["verbosity_level"] > 1:
-                        self.show_requirements_for_template(
-                            self.variables["templates_data-object-type"][-1])
-                else:
-                    del self.variables["templates_data-object-type"][-1]
-                    del self.variables["templates_substitution-keys"][-1]
-                    del self.variables["templates_substitution-data-types"][-1]
-                    del self.variables["templates_names-of-dimensions"][-1]
-                    del self.variables["templates_names-of-unspecified-dimensions"][-1]
-                    del self.variables["templates_lengths-of-specified-dimensions"][-1]
+                self.show_a_warning("unable to write template cache file %s" % template_cache_file_path)
+                if os.path.isfile(temporary_file_path):
+                    os.remove(temporary_file_path)
+#
+#########
+#
+# Internal function that parses the contents of a yaml template file and
+# returns the template, or None if it fails parsing. The yaml document is
+# first composed into a tree of nodes, whose top level is checked before any
+# python objects are constructed from it: it must be a dictionary with
+# 'data_object_type', 'global_attributes', and 'variables' entries (and
+# optionally 'unlimited_dimensions'), each given once and with the expected
+# type of value. The node tree is kept while the template is being loaded, so
+# that errors can be reported with their locations in the template file.
+#
+    def return_parsed_template(self,template_file_contents,call_timer=None):
+        template = None
+        if call_timer is not None:
+            call_timer.start_a_phase("yaml_parsing")
 
-        if self.variables["no_template_errors_have_been_encountered"]:
-            return self.variables["templates_data-object-type"][-1]
+        template_loader = template_loader_class(template_file_contents)
+        try:
+            try:
+                template_node = template_loader.get_single_node()
+                self.objects["template_node"] = template_node
+                if template_node is None:
+                    self.register_a_template_error("template file is empty")
+                else:
+                    if call_timer is not None:
+                        call_timer.start_a_phase("validation")
+
+                    if self.check_template_node_for_conformity(template_node):
+                        if call_timer is not None:
+                            call_timer.start_a_phase("yaml_parsing")
+
+                        template = template_loader.construct_document(
+                            template_node)
+            except yaml.YAMLError, error:
+                template = None
+                self.register_a_template_error("template file fails yaml parsing\n  %s" % str(error).replace("\n","\n  "))
+        finally:
+            template_loader.dispose()
+
+        return template
+#
+#########
+#
+# Internal sub-function of return_parsed_template, which checks the top level
+# of the node tree of a template. It returns True if it conforms to the
+# expected structure and False otherwise.
+#
+    def check_template_node_for_conformity(self,template_node):
+        template_node_conforms = True
+        expected_node_types_for_entries = {
+            "data_object_type": yaml.ScalarNode,
+            "global_attributes": yaml.SequenceNode,
+            "variables": yaml.SequenceNode,
+            "unlimited_dimensions": yaml.SequenceNode}
+        descriptions_of_expected_values = {
+            "data_object_type": "a string",
+            "global_attributes": "a list",
+            "variables": "a list",
+            "unlimited_dimensions": "a list"}
+
+        if not isinstance(template_node,yaml.MappingNode):
+            template_node_conforms = False
+            self.register_a_template_error("template does not consist of a dictionary at the top level",())
         else:
-            return ""
+            names_of_entries = set()
+            for key_node, value_node in template_node.value:
+                entry_name = key_node.value
+                if entry_name in names_of_entries:
+                    template_node_conforms = False
+                    self.register_a_template_error("the '%s' entry has been given more than once at the top level" % entry_name,(entry_name,))
+                else:
+                    names_of_entries.add(entry_name)
+
+                if entry_name in expected_node_types_for_entries:
+                    if ((not isinstance(value_node,expected_node_types_for_entries[entry_name])) or
+                        ((entry_name == "data_object_type") and
+                         (value_node.tag != "tag:yaml.org,2002:str"))):
+
+                        template_node_conforms = False
+                        self.register_a_template_error("the value of '%s' is not %s as expected" % (entry_name,descriptions_of_expected_values[entry_name]),(entry_name,))
+
+            for entry_name in ["data_object_type", "global_attributes", "variables"]:
+                if entry_name not in names_of_entries:
+                    template_node_conforms = False
+                    self.register_a_template_error("no '%s' entry has been found at the top level" % entry_name)
+
+        return template_node_conforms
 #
 #########
 #
-# Internal function for checking whether the template conforms to the expected
-# structure.
+# Internal function that checks, in a single pass, whether the template
+# conforms to the expected structure, and at the same time compiles its
+# dimensions and substitution keys. The top level of the template has already
+# been checked by check_template_node_for_conformity. The names that have
+# been seen so far are held in sets (the lists in self.variables only record
+# their order), so the time taken is proportional to the size of the template.
+# Every error is registered together with the location in the template that
+# it relates to.
 #
     def check_template_for_conformity(self):
-        global_attributes_are_available = False
-        variables_are_available = False
-        names_of_global_attributes = []
-        names_of_variables = []
+        template_entry = self.objects["template_being_loaded"]
+        template = template_entry["template"]
+        template_summary = {
+            "names_of_global_attributes": set(),
+            "names_of_variables": set(),
+            "names_of_dimensions": set(),
+            "names_of_dimension_variables": set(),
+            "substitution_keys": set(),
+            "lengths_of_variables_with_values": {}}
 
-        if type(self.objects["templates"][-1]) != dict:
-            self.register_a_template_error("template does not consist of a dictionary at the top level")
-        else:
-            if "global_attributes" not in self.objects["templates"][-1]:
-                self.register_a_template_error("no 'global_attributes' entry has been found at the top level")
-            elif (type(self.objects["templates"][-1]["global_attributes"]) 
-                  != list):
+        if self.variables["verbosity_level"] > 2:
+            print "Checking template for conformity"
+            print "  Global attributes"
 
-                self.register_a_template_error("the contents of 'global_attributes' is not given as a list")
+        template_entry["data_object_type"] = template["data_object_type"]
+#
+        number_of_global_attributes = len(template["global_attributes"])
+        global_attributes_index = 0
+        while global_attributes_index < number_of_global_attributes:
+            global_attribute_properties = \
+                template["global_attributes"][global_attributes_index]
+            template_path = ("global_attributes",global_attributes_index)
+
+            if type(global_attribute_properties) != dict:
+                self.register_a_template_error("global attribute %i does not consist of a dictionary at the top level" % global_attributes_index,template_path)
+            elif len(global_attribute_properties) != 1:
+                self.register_a_template_error("global attribute %i does not have only 1 key (i.e. its name)" % global_attributes_index,template_path)
             else:
-                global_attributes_are_available = True
+                global_attribute_name = global_attribute_properties.keys()[0]
+                global_attribute = global_attribute_properties[
+                    global_attribute_name]
+                template_path += (global_attribute_name,)
 
-            if "variables" not in self.objects["templates"][-1]:
-                self.register_a_template_error("no 'variables' entry has been found at the top level")
-            elif type(self.objects["templates"][-1]["variables"]) != list:
-                self.register_a_template_error("the contents of 'variables' is not given as a list")
-            else:
-                variables_are_available = True
+                if self.variables["verbosity_level"] > 2:
+                    print "    %s" % global_attribute_name
 
-            if "data_object_type" not in self.objects["templates"][-1]:
-                self.register_a_template_error("no 'data_object_type' entry has been found at the top level")
-            elif type(self.objects["templates"][-1]["data_object_type"]) != str:
-                self.register_a_template_error("the value of 'data_object_type' is not a string as expected")
-            else:
-                data_object_type = \
-                    self.objects["templates"][-1]["data_object_type"]
-                if data_object_type in self.variables["templates_data-object-type"]:
-                    self.register_a_template_error("a template has already been loaded for data object type '%s'" % data_object_type)
-                else:
-                    self.variables["templates_data-object-type"][-1] = \
-                        data_object_type
+                if global_attribute_name in template_summary[
+                    "names_of_global_attributes"]:
 
-        if global_attributes_are_available:
-            number_of_global_attributes = len(
-                self.objects["templates"][-1]["global_attributes"])
-            global_attributes_index = 0
-            while global_attributes_index < number_of_global_attributes:
-                if type(self.objects["templates"][-1]["global_attributes"][global_attributes_index]) != dict:
-                    self.register_a_template_error("global attribute %i does not consist of a dictionary at the top level" % global_attributes_index)
+                    self.register_a_template_error("global attribute '%s' has been defined more than once" % global_attribute_name,template_path)
                 else:
-                    global_attribute_keys = self.objects["templates"][-1][
-                        "global_attributes"][global_attributes_index].keys()
-                    if len(global_attribute_keys) != 1:
-                        self.register_a_template_error("global attribute %i does not have only 1 key (i.e. its name)" % global_attributes_index)
-                    else:
-                        global_attribute_name = global_attribute_keys[0]
-                        if global_attribute_name in names_of_global_attributes:
-                            self.register_a_template_error("global attribute '%s' has been defined more than once" % global_attribute_name)
-                        else:
-                            names_of_global_attributes.append(
-                                global_attribute_name)
+                    template_summary["names_of_global_attributes"].add(
+                        global_attribute_name)
 
-                        global_attribute = self.objects["templates"][-1]["global_attributes"][global_attributes_index][global_attribute_name]
-                        self.check_attribute_for_conformity(
-                            "global",global_attribute_name,global_attribute)
+                attribute_description = \
+                    "global attribute '%s'" % global_attribute_name
+                if self.check_attribute_for_conformity(
+                    attribute_description,global_attribute,template_path):
 
-                global_attributes_index += 1
+                    self.add_substitution_keys_for_attribute(
+                        attribute_description,global_attribute,
+                        template_path,template_summary)
+
+            global_attributes_index += 1
+
+        for global_attribute_name in self.variables["required_global_attributes"]:
+            if global_attribute_name not in template_summary[
+                "names_of_global_attributes"]:
+
+                self.register_a_template_error("required global attribute '%s' has not been defined" % global_attribute_name,("global_attributes",))
 #
-        if variables_are_available:
-            number_of_variables = len(
-                self.objects["templates"][-1]["variables"])
-            variables_index = 0
-            while variables_index < number_of_variables:
-                if type(self.objects["templates"][-1]["variables"][variables_index]) != dict:
-                    self.register_a_template_error("variable %i does not consist of a dictionary at the top level" % variables_index)
+        if self.variables["verbosity_level"] > 2:
+            print "  Variables"
+
+        number_of_variables = len(template["variables"])
+        variables_index = 0
+        while variables_index < number_of_variables:
+            variable_properties = template["variables"][variables_index]
+            template_path = ("variables",variables_index)
+
+            if type(variable_properties) != dict:
+                self.register_a_template_error("variable %i does not consist of a dictionary at the top level" % variables_index,template_path)
+            elif len(variable_properties) != 1:
+                self.register_a_template_error("variable %i does not have only 1 key (i.e. its name)" % variables_index,template_path)
+            else:
+                variable_name = variable_properties.keys()[0]
+                template_path += (variable_name,)
+
+                if self.variables["verbosity_level"] > 2:
+                    print "    %s" % variable_name
+
+                if variable_name in template_summary["names_of_variables"]:
+                    self.register_a_template_error("variable '%s' has been defined more than once" % variable_name,template_path)
                 else:
-                    variable_keys = self.objects["templates"][-1][
-                        "variables"][variables_index].keys()
-                    if len(variable_keys) != 1:
-                        self.register_a_template_error("variable %i does not have only 1 key (i.e. its name)" % variables_index)
-                    else:
-                        variable_name = variable_keys[0]
+                    template_summary["names_of_variables"].add(variable_name)
 
-                        if variable_name in names_of_variables:
-                            self.register_a_template_error("variable '%s' has been defined more than once" % variable_name)
-                        else:
-                            names_of_variables.append(variable_name)
+                self.check_variable_for_conformity(
+                    variable_name,variable_properties[variable_name],
+                    template_path,template_summary)
 
-                        variable = self.objects["templates"][-1]["variables"][
-                            variables_index][variable_name]
-                        self.check_variable_for_conformity(
-                            variable_name,variable)
+            variables_index += 1
+#
+# Check that all dimension names correspond to dimension variables, compile a
+# list of dimensions whose lengths have not been specified, and check that
+# any unlimited dimensions are amongst the dimensions.
+#
+        for dimension_name in template_entry["names_of_dimensions"]:
+            if dimension_name not in template_summary[
+                "names_of_dimension_variables"]:
 
-                variables_index += 1
+                self.register_a_template_error("no variable has been defined for dimension '%s'" % dimension_name,("variables",))
+
+            if dimension_name in template_summary[
+                "lengths_of_variables_with_values"]:
+
+                template_entry["lengths_of_specified_dimensions"][dimension_name] = template_summary["lengths_of_variables_with_values"][dimension_name]
+            else:
+                template_entry["names_of_unspecified_dimensions"].append(dimension_name)
+
+        names_of_unlimited_dimensions = set()
+        number_of_unlimited_dimensions = len(
+            template.get("unlimited_dimensions",[]))
+        unlimited_dimensions_index = 0
+        while unlimited_dimensions_index < number_of_unlimited_dimensions:
+            dimension_name = template["unlimited_dimensions"][
+                unlimited_dimensions_index]
+            template_path = ("unlimited_dimensions",unlimited_dimensions_index)
+
+            if not isinstance(dimension_name,basestring):
+                self.register_a_template_error("unlimited dimension %s is not given as a string" % dimension_name,template_path)
+            elif dimension_name in names_of_unlimited_dimensions:
+                self.register_a_template_error("unlimited dimension '%s' has been given more than once" % dimension_name,template_path)
+            elif dimension_name not in template_summary["names_of_dimensions"]:
+                self.register_a_template_error("unlimited dimension '%s' is not a dimension of any variable" % dimension_name,template_path)
+            else:
+                names_of_unlimited_dimensions.add(dimension_name)
+                template_entry["names_of_unlimited_dimensions"].append(dimension_name)
+
+            unlimited_dimensions_index += 1
 #
 #########
 #
 # Internal sub-function of check_template_for_conformity, which checks whether
 # a (global or variable) attribute portion of a template conforms to the
-# expected structure. 
-# 
+# expected structure. It returns True if it does and False otherwise.
+#
     def check_attribute_for_conformity(
-        self,attribute_parent_name,attribute_name,attribute):
-
-        if attribute_parent_name == "global":
-            attribute_description = "global attribute '%s'" % attribute_name
-        else:
-            attribute_description = "variable '%s' attribute '%s'" % (
-                attribute_parent_name,attribute_name)
+        self,attribute_description,attribute,template_path):
 
-        self.variables["data_type_is_available_for_attribute"] = False
+        number_of_template_errors = len(self.variables["template_errors"])
+        data_type_is_available = False
 
         if type(attribute) != dict:
             self.register_a_template_error(
-                "%s is not defined as a dictionary" % attribute_description)
+                "%s is not defined as a dictionary" % attribute_description,
+                template_path)
         else:
             number_of_attribute_elements = len(attribute)
             if "data_type" not in attribute:
                 self.register_a_template_error(
-                    "no data type has been defined for %s" % 
-                    attribute_description)
+                    "no data type has been defined for %s" %
+                    attribute_description,template_path)
             else:
                 number_of_attribute_elements -= 1
 
                 if type(attribute["data_type"]) != str:
                     self.register_a_template_error(
                         "data type for %s is not a string as expected" %
-                        attribute_description)
+                        attribute_description,template_path + ("data_type",))
                 elif attribute["data_type"] not in self.variables[
                     "permissible_data_types"]:
 
                     self.register_a_template_error(
-                        "data type '%s' for %s is not permissible" % 
-                        (attribute["data_type"], attribute_description))
+                        "data type '%s' for %s is not permissible" %
+                        (attribute["data_type"], attribute_description),
+                        template_path + ("data_type",))
                 else:
-                    self.variables[
-                        "data_type_is_available_for_attribute"] = True
+                    data_type_is_available = True
 #
             if "value" not in attribute:
                 self.register_a_template_error(
-                    "no value has been defined for %s" % attribute_description)
+                    "no value has been defined for %s" % attribute_description,
+                    template_path)
             else:
                 number_of_attribute_elements -= 1
+                value_template_path = template_path + ("value",)
                 imported_data_type = type(attribute["value"])
-                if imported_data_type == dict: 
-                    self.register_a_template_error("the value for %s has been given as a dictionary - it shold contain a value" % attribute_description)
+                if imported_data_type == dict:
+                    self.register_a_template_error("the value for %s has been given as a dictionary - it shold contain a value" % attribute_description,value_template_path)
 
                 elif imported_data_type == list:
-                    number_of_values = len(attribute["value"])
-                    first_value_imported_data_type = type(attribute["value"][0])
-                    values_index = 1
-                    while values_index < number_of_values:
-                        if type(attribute["value"][values_index]) != first_value_imported_data_type:
-                            self.register_a_template_error("the values for %s are not all of the same data type" % attribute_description)
-
-                        values_index +=1
-
-                    if self.variables["data_type_is_available_for_attribute"]:
-                        if first_value_imported_data_type == int:
-                            if not attribute["data_type"].startswith("int"):
-                                self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description)
-                    
-                        elif first_value_imported_data_type == float:
-                            if not attribute["data_type"].startswith("float"):
-                                self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description)
-                        else:
-                            self.register_a_template_error("value for %s is an invalid data type" % attribute_description)                         
+                    if len(attribute["value"]) == 0:
+                        self.register_a_template_error("the value for %s is an empty list" % attribute_description,value_template_path)
+                    else:
+                        imported_data_types_of_values = set(
+                            map(type,attribute["value"]))
+                        first_value_imported_data_type = type(
+                            attribute["value"][0])
+                        values_are_consistent = False
+                        if len(imported_data_types_of_values) > 1:
+                            self.register_a_template_error("the values for %s are not all of the same data type" % attribute_description,value_template_path)
+
+                        if data_type_is_available:
+                            if first_value_imported_data_type == int:
+                                if not attribute["data_type"].startswith("int"):
+                                    self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description,value_template_path)
+                                else:
+                                    values_are_consistent = True
+
+                            elif first_value_imported_data_type == float:
+                                if not attribute["data_type"].startswith("float"):
+                                    self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description,value_template_path)
+                                else:
+                                    values_are_consistent = True
+                            else:
+                                self.register_a_template_error("value for %s is an invalid data type" % attribute_description,value_template_path)
 
-                elif self.variables["data_type_is_available_for_attribute"]:
+                        if (values_are_consistent and
+                            (len(imported_data_types_of_values) == 1) and
+                            (return_array_for_list_value(
+                                attribute["value"],attribute["data_type"])
+                             is None)):
+
+                            self.register_a_template_error("the values for %s do not all fit within data type %s" % (attribute_description,attribute["data_type"]),value_template_path)
+
+                elif data_type_is_available:
                     if imported_data_type in self.variables[
                         "permissible_imported_str_data_types"]:
 
                         if ((attribute["data_type"] != "str") and
                             not(attribute["value"].startswith("$"))):
 
-                            self.register_a_template_error("value for %s is not consistent with a numerical data type" % attribute_description)
+                            self.register_a_template_error("value for %s is not consistent with a numerical data type" % attribute_description,value_template_path)
 
                     elif imported_data_type == int:
                         if not attribute["data_type"].startswith("int"):
-                            self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description)
-                    
+                            self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description,value_template_path)
+
                     elif imported_data_type == float:
                         if not attribute["data_type"].startswith("float"):
-                            self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description)
+                            self.register_a_template_error("value for %s is not consistent with defined data type" % attribute_description,value_template_path)
                     else:
-                        self.register_a_template_error("value for %s is an invalid data type" % attribute_description)
+                        self.register_a_template_error("value for %s is an invalid data type" % attribute_description,value_template_path)
 #
             if number_of_attribute_elements != 0:
-                self.register_a_template_error("%s has an invalid number of elements" % attribute_description)
+                self.register_a_template_error("%s has an invalid number of elements" % attribute_description,template_path)
+
+        return len(self.variables["template_errors"]) == number_of_template_errors
+#
+#########
+#
+# Internal sub-function of check_template_for_conformity, which adds the
+# substitution keys used by a (conforming) attribute to those required by the
+# template, i.e. the fields of a str value (including any nested in their
+# format specifications), or the '$' based substitution key of a numerical
+# value.
+#
+    def add_substitution_keys_for_attribute(
+        self,attribute_description,attribute,template_path,template_summary):
+
+        substitution_keys = []
+        if attribute["data_type"] == "str":
+            if "$" in attribute["value"]:
+                self.show_a_warning("'$' based substitution cannot be used for a string value - see %s" % attribute_description)
+
+            try:
+                for text_fragment in self.objects["string_formatter"].parse(
+                    attribute["value"]):
+
+                    if text_fragment[1] != None:
+                        substitution_keys.append(text_fragment[1])
+                        for nested_text_fragment in self.objects[
+                            "string_formatter"].parse(text_fragment[2]):
+
+                            if nested_text_fragment[1] != None:
+                                substitution_keys.append(
+                                    nested_text_fragment[1])
+            except ValueError:
+                self.register_a_template_error("the value for %s is not a valid format string" % attribute_description,template_path + ("value",))
+
+        elif type(attribute["value"]) in self.variables[
+            "permissible_imported_str_data_types"]:
+
+            substitution_keys.append(attribute["value"][1:])
+
+        for substitution_key in substitution_keys:
+            if substitution_key not in template_summary["substitution_keys"]:
+                template_summary["substitution_keys"].add(substitution_key)
+                self.objects["template_being_loaded"]["substitution_keys"].append(
+                    substitution_key)
+                self.objects["template_being_loaded"]["substitution_data_types"].append(
+                    attribute["data_type"])
 #
 #########
 #
 # Internal sub function of check_template_for_conformity, which checks whether
-# a variable portion of a template conforms to the expected structure. 
+# a variable portion of a template conforms to the expected structure, and
+# adds its dimensions and the substitution keys used by its attributes to
+# those of the template.
 #
-    def check_variable_for_conformity(self,variable_name,variable):
-        names_of_attributes = []
+    def check_variable_for_conformity(
+        self,variable_name,variable,template_path,template_summary):
+
+        names_of_properties = set()
         attribute_is_not_available = {}
         for attribute_name in self.variables["required_variable_attributes"]:
             attribute_is_not_available[attribute_name] = True
+        dimensions = []
+        dimensions_are_valid = False
         values_imported_data_type = ""
         number_of_values = -1
         number_of_dimensions = -1
+        number_of_chunk_sizes = -1
         variable_data_type = ""
         missing_value_data_type = ""
 
         if type(variable) != list:
-            self.register_a_template_error("variable '%s' is not defined as a list" % variable_name)
+            self.register_a_template_error("variable '%s' is not defined as a list" % variable_name,template_path)
         else:
             number_of_properties = len(variable)
             property_index = 0
             while property_index < number_of_properties:
+                property_template_path = template_path + (property_index,)
                 if type(variable[property_index]) != dict:
-                    self.register_a_template_error("property %i for variable '%s' is not defined as a dictionary" % variable_name)
+                    self.register_a_template_error("property %i for variable '%s' is not defined as a dictionary" % (property_index,variable_name),property_template_path)
+                elif len(variable[property_index]) != 1:
+                    self.register_a_template_error("variable '%s' attribute %i does not have only 1 key (i.e. its name)" % (variable_name,property_index),property_template_path)
                 else:
-                    attribute_keys = variable[property_index].keys()
-                    if len(attribute_keys) != 1:
-                        self.register_a_template_error("variable '%s' attribute %i does not have only 1 key (i.e. its name)" % (variable_name,property_index))
+                    attribute_name = variable[property_index].keys()[0]
+                    attribute = variable[property_index][attribute_name]
+                    attribute_imported_data_type = type(attribute)
+                    property_template_path += (attribute_name,)
+
+                    if attribute_name in names_of_properties:
+                        self.register_a_template_error("attribute '%s' for variable '%s' has been defined more than once" % (attribute_name,variable_name),property_template_path)
                     else:
-                        attribute_name = attribute_keys[0]
-                        attribute = variable[property_index][attribute_name]
-                        attribute_imported_data_type = type(attribute)
+                        names_of_properties.add(attribute_name)
 
-                        if attribute_name in names_of_attributes:
-                            self.register_a_template_error("attribute '%s' for variable '%s' has been defined more than once" % (attribute_name,variable_name))
+                    if attribute_name == "dimensions":
+                        if attribute_imported_data_type != list:
+                            self.register_a_template_error("dimensions defined for variable '%s' are not given as a list" % variable_name,property_template_path)
                         else:
-                            names_of_attributes.append(attribute_name)
+                            dimensions = attribute
+                            dimensions_are_valid = True
+                            number_of_dimensions = len(attribute)
+                            for dimension_name in attribute:
+                                if not isinstance(dimension_name,basestring):
+                                    dimensions_are_valid = False
+                                    self.register_a_template_error("a dimension name for variable '%s' is not a string" % variable_name,property_template_path)
+
+                    elif attribute_name == "data_type":
+                        if attribute_imported_data_type != str:
+                            self.register_a_template_error("data type for variable '%s' is not consistent with a string" % variable_name,property_template_path)
+                        elif attribute not in self.variables["permissible_data_types"]:
+                            self.register_a_template_error("data type '%s' for variable '%s' is not permissible" % (attribute,variable_name),property_template_path)
+                        else:
+                            variable_data_type = attribute
 
-                        if attribute_name == "dimensions":
-                            if attribute_imported_data_type != list:
-                                self.register_a_template_error("dimensions defined for variable '%s' are not given as a list" % variable_name)
-                            else:
-                                number_of_dimensions = len(attribute)
-                                for dimension_name in attribute:
-                                    if type(dimension_name) != str:
-                                        self.register_a_template_error("a dimension name for variable '%s' is not a string" % variable_name)
-
-                        elif attribute_name == "data_type":
-                            if attribute_imported_data_type != str:
-                                self.register_a_template_error("data type for variable '%s' is not consistent with a string" % variable_name)
-                            elif attribute not in self.variables["permissible_data_types"]:
-                                self.register_a_template_error("data type '%s' for variable '%s' is not permissible" % (attribute,variable_name))
+                    elif attribute_name == "values":
+                        if attribute_imported_data_type != list:
+                            self.register_a_template_error("values for variable '%s' have not given as a list" % variable_name,property_template_path)
+                        else:
+                            number_of_values = len(attribute)
+                            if number_of_values == 0:
+                                self.register_a_template_error("values for variable '%s' is an empty list" % variable_name,property_template_path)
                             else:
-                                variable_data_type = attribute
+                                values_imported_data_type = type(attribute[0])
+                                for value in attribute:
+                                    if type(value) != values_imported_data_type:
+                                        self.register_a_template_error("the values for variable '%s' are not all of the same data type" % variable_name,property_template_path)
+                                        break
 
-                        elif attribute_name == "values":
-                            if attribute_imported_data_type != list:
-                                self.register_a_template_error("values for variable '%s' have not given as a list" % variable_name)
-                            else:
-                                number_of_values = len(attribute)
-                                if number_of_values == 0:
-                                    self.register_a_template_error("values for variable '%s' is an empty list" % variable_name)
-                                else:
-                                    first_value_imported_data_type = type(attribute[0])
-                                    values_index = 1
-                                    while values_index < number_of_values:
-                                        if type(attribute[values_index]) != first_value_imported_data_type:
-                                            self.register_a_template_error("the values for variable '%s' are not all of the same data type" % variable_name)
+                                if ((values_imported_data_type != float) and
+                                    (values_imported_data_type != int)):
 
-                                        values_index +=1
+                                    self.register_a_template_error("values for variable '%s' are not of a numerical type" % variable_name,property_template_path)
 
-                                    if ((first_value_imported_data_type != float) and
-                                        (first_value_imported_data_type != int)):
+                    elif attribute_name == "compression_level":
+                        if ((attribute_imported_data_type != int) or
+                            (attribute < 0) or (attribute > 9)):
+                            self.register_a_template_error("compression level for variable '%s' is not an integer from 0 to 9" % variable_name,property_template_path)
 
-                                        self.register_a_template_error("values for variable '%s' are not of a numerical type" % variable_name)
+                    elif attribute_name == "shuffle":
+                        if attribute_imported_data_type != bool:
+                            self.register_a_template_error("shuffle for variable '%s' is neither true nor false" % variable_name,property_template_path)
 
+                    elif attribute_name == "chunk_sizes":
+                        if attribute_imported_data_type != list:
+                            self.register_a_template_error("chunk sizes for variable '%s' are not given as a list" % variable_name,property_template_path)
                         else:
-                            self.check_attribute_for_conformity(
-                                variable_name,attribute_name,attribute)
-                            if ((attribute_name == "missing_value") and
-                                self.variables["data_type_is_available_for_attribute"]):
+                            number_of_chunk_sizes = len(attribute)
+                            for chunk_size in attribute:
+                                if (type(chunk_size) != int) or (chunk_size < 1):
+                                    self.register_a_template_error("a chunk size for variable '%s' is not a positive integer" % variable_name,property_template_path)
+
+                    elif attribute_name == "endianness":
+                        if attribute not in self.variables["permissible_endianness_values"]:
+                            self.register_a_template_error("endianness for variable '%s' is not one of %s" % (variable_name,", ".join(self.variables["permissible_endianness_values"])),property_template_path)
+
+                    else:
+                        attribute_description = "variable '%s' attribute '%s'" % (variable_name,attribute_name)
+                        if self.check_attribute_for_conformity(
+                            attribute_description,attribute,
+                            property_template_path):
+
+                            self.add_substitution_keys_for_attribute(
+                                attribute_description,attribute,
+                                property_template_path,template_summary)
+
+                            if attribute_name == "missing_value":
                                 missing_value_data_type = attribute["data_type"]
 
-                        if ((attribute_name == "standard_name") or
-                            (attribute_name == "long_name")):
+                    if ((attribute_name == "standard_name") or
+                        (attribute_name == "long_name")):
 
-                            attribute_is_not_available["standard_or_long_name"] = False
-                        elif attribute_name in self.variables["required_variable_attributes"]:
-                            attribute_is_not_available[attribute_name] = False
+                        attribute_is_not_available["standard_or_long_name"] = False
+                    elif attribute_name in attribute_is_not_available:
+                        attribute_is_not_available[attribute_name] = False
 
                 property_index += 1
+#
+            for feature_name in self.variables["required_variable_features"]:
+                if feature_name not in names_of_properties:
+                    self.register_a_template_error("required feature '%s' has not been defined for variable '%s'" % (feature_name,variable_name),template_path)
 
-            for attribute_name in attribute_is_not_available:
+            for attribute_name in self.variables["required_variable_attributes"]:
                 if attribute_is_not_available[attribute_name]:
-                    self.register_a_template_error("required attribute '%s' has not been defined for variable '%s'" % (attribute_name,variable_name))
+                    self.register_a_template_error("required attribute '%s' has not been defined for variable '%s'" % (attribute_name,variable_name),template_path)
 
             if variable_data_type != "":
                 if values_imported_data_type == int:
                     if not variable_data_type.startswith("int"):
-                        self.register_a_template_error("values for variable '%s' are not consistent with the defined data type" % variable_name)
+                        self.register_a_template_error("values for variable '%s' are not consistent with the defined data type" % variable_name,template_path)
                 if values_imported_data_type == float:
                     if not variable_data_type.startswith("float"):
-                        self.register_a_template_error("values for variable '%s' are not consistent with defined data type" % variable_name)
+                        self.register_a_template_error("values for variable '%s' are not consistent with defined data type" % variable_name,template_path)
 
                 if ((missing_value_data_type != "") and
                     (missing_value_data_type != variable_data_type)):
 
-                    self.register_a_template_error("inconsistent data types for variable '%s' and its 'missing_value' attribute" % variable_name)
+                    self.register_a_template_error("inconsistent data types for variable '%s' and its 'missing_value' attribute" % variable_name,template_path)
+
+            if ((number_of_chunk_sizes != -1) and
+                (number_of_chunk_sizes != number_of_dimensions)):
+
+                self.register_a_template_error("the number of chunk sizes for variable '%s' does not match its number of dimensions" % variable_name,template_path)
 
             if number_of_values > 0:
                 if (number_of_dimensions == 0) and (number_of_values != 1):
-                    self.register_a_template_error("dimensionless variable '%s' may have only 1 value" % variable_name)
+                    self.register_a_template_error("dimensionless variable '%s' may have only 1 value" % variable_name,template_path)
                 elif number_of_dimensions > 1:
-                    self.register_a_template_error("variable '%s' has more than 1 dimension" % variable_name)
+                    self.register_a_template_error("variable '%s' has more than 1 dimension" % variable_name,template_path)
+#
+# Add the dimensions of the variable to those of the template.
+#
+            if dimensions_are_valid:
+                if ((number_of_dimensions == 1) and
+                    (dimensions[0] == variable_name)):
+
+                    template_summary["names_of_dimension_variables"].add(
+                        variable_name)
+
+                for dimension_name in dimensions:
+                    if dimension_name not in template_summary["names_of_dimensions"]:
+                        template_summary["names_of_dimensions"].add(
+                            dimension_name)
+                        self.objects["template_being_loaded"]["names_of_dimensions"].append(dimension_name)
+
+                if number_of_values != -1:
+                    template_summary["lengths_of_variables_with_values"][
+                        variable_name] = number_of_values
+                    if not ((variable_name in template_summary[
+                        "names_of_dimension_variables"]) or
+                            (number_of_dimensions == 0)):
+
+                        self.register_a_template_error("cannot specify values for '%s' since it is neither a dimension variable nor a variable with no dimensions" % variable_name,template_path)
 #
 #########
 #
@@ -557,125 +1750,141 @@ class Creator():
 #
 #########
 #
-# Internal function that checks a template in order to identify the
-# dimensions and substitution keys. It checks that all dimensions have
-# and associated dimension variable.
+# Internal function that compiles a (validated) template into a flat creation
+# plan. Everything about a data object that does not depend on the lengths of
+# the dimensions or on the substitution values - i.e. the orders of the
+# global attributes, dimensions, variables, and variable attributes, the data
+# type objects, the values given in the template, and the format strings - is
+# resolved once here, so that create_from_template only needs to run the plan
+# against its input arguments. 
 #
-    def check_template_for_dimensions_and_substitutions(self):
-
-        if self.variables["verbosity_level"] > 2:
-            print "Checking template for dimensions and substitutions"
-            print "  Global attributes"
-
-        number_of_global_attributes = len(
-            self.objects["templates"][-1]["global_attributes"])
-        global_attributes_index = 0
-        while global_attributes_index < number_of_global_attributes:
-            global_attribute_name = self.objects["templates"][-1][
-                "global_attributes"][global_attributes_index].keys()[0]
-            global_attribute = self.objects["templates"][-1]["global_attributes"][global_attributes_index][global_attribute_name]
-
-            if self.variables["verbosity_level"] > 2:
-                print "    %s" % global_attribute_name
-
-            if global_attribute["data_type"] == "str":
-                if "$" in global_attribute["value"]:
-                    self.show_a_warning("'$' based substitution cannot be used for a string value - see global attribute '%s'" % global_attribute_name)
-
-                for text_fragment in self.objects["string_formatter"].parse(
-                    global_attribute["value"]):
-
-                    if ((text_fragment[1] != None) and 
-                        (text_fragment[1] not in self.variables["templates_substitution-keys"][-1])):
-
-                        self.variables["templates_substitution-keys"][-1].append(text_fragment[1])
-                        self.variables["templates_substitution-data-types"][-1].append(global_attribute["data_type"])
-
-            elif type(global_attribute["value"]) == str:
-                substitution_key = global_attribute["value"][1:]
-                if substitution_key not in self.variables[
-                    "templates_substitution-keys"][-1]:
-
-                    self.variables["templates_substitution-keys"][-1].append(substitution_key)
-                    self.variables["templates_substitution-data-types"][-1].append(global_attribute["data_type"])
-
-            global_attributes_index += 1
+# Each attribute is described by a plan entry whose 'substitution_type' is
+#   "format"    - a str value, formatted with the substitutions. Its format
+#                 string is parsed once, here, into 'format_segments', so
+#                 that it can be partially evaluated (see
+#                 return_attribute_creation_plan_with_bound_substitutions)
+#   "numerical" - a numerical value taken from the substitution 'value'
+#   "list"      - a numerical array value, which is converted from the list
+#                 in the template once, here, and held as a read-only array
+#                 (each data object is given a copy of it)
+#   "value"     - the final attribute value, which has already been computed,
+#                 i.e. a numerical constant or a str value without any
+#                 substitution fields
 #
-        if self.variables["verbosity_level"] > 2:
-            print "  Variables"
-
-        names_of_dimension_variables = []
-        lengths_of_variables_with_values = {}
-        number_of_variables = len(self.objects["templates"][-1]["variables"])
-        variables_index = 0
-        while variables_index < number_of_variables:
-            variable_name = self.objects["templates"][-1]["variables"][
-                variables_index].keys()[0]
-            variable = self.objects["templates"][-1]["variables"][
-                variables_index][variable_name]
+    def return_creation_plan_for_template(self,template_entry):
+        template = template_entry["template"]
+        creation_plan = {
+            "data_object_type": template_entry["data_object_type"],
+            "names_of_dimensions": template_entry["names_of_dimensions"],
+            "names_of_unspecified_dimensions": 
+                template_entry["names_of_unspecified_dimensions"],
+            "names_of_unlimited_dimensions": 
+                template_entry["names_of_unlimited_dimensions"],
+            "lengths_of_specified_dimensions": 
+                template_entry["lengths_of_specified_dimensions"],
+            "substitution_keys": template_entry["substitution_keys"],
+            "global_attributes": [],
+            "variables": []}
+
+        for global_attribute_properties in template["global_attributes"]:
+            global_attribute_name = global_attribute_properties.keys()[0]
+            creation_plan["global_attributes"].append(
+                self.return_creation_plan_entry_for_attribute(
+                    global_attribute_name,
+                    global_attribute_properties[global_attribute_name]))
+
+        for variable_properties in template["variables"]:
+            variable_name = variable_properties.keys()[0]
+            variable = variable_properties[variable_name]
             template_locations = self.return_template_locations_for_variable(
                 variable)
-            dimensions_property_index = \
-                template_locations["property_index_for_feature"]["dimensions"]
+            data_type = variable[template_locations[
+                "property_index_for_feature"]["data_type"]]["data_type"]
             values_property_index = \
                 template_locations["property_index_for_feature"]["values"]
 
-            if self.variables["verbosity_level"] > 2:
-                print "    %s" % variable_name
-
-            number_of_dimensions = len(
-                variable[dimensions_property_index]["dimensions"])
-            if ((number_of_dimensions == 1) and
-                (variable[dimensions_property_index]["dimensions"][0] == variable_name)):
-                names_of_dimension_variables.append(variable_name)
-
-            for dimension_name in variable[dimensions_property_index]["dimensions"]:
-                if dimension_name not in self.variables["templates_names-of-dimensions"][-1]:
-                    self.variables["templates_names-of-dimensions"][-1].append(dimension_name)
+            variable_creation_plan = {
+                "name": variable_name,
+                "data_type": data_type,
+                "data_type_object": return_data_type_object(data_type),
+                "dimensions": variable[template_locations[
+                    "property_index_for_feature"]["dimensions"]]["dimensions"],
+                "values": None,
+                "storage_features": {},
+                "attributes": [],
+                "name_of_fill_attribute": "",
+                "fill_value_can_be_added": False}
+
+            for feature_name in self.variables["names_of_storage_features"]:
+                if feature_name in template_locations["property_index_for_feature"]:
+                    variable_creation_plan["storage_features"][feature_name] = \
+                        variable[template_locations["property_index_for_feature"][
+                            feature_name]][feature_name]
 
             if values_property_index != -1:
-                lengths_of_variables_with_values[variable_name] = len(
-                    variable[values_property_index]["values"])
-                if not ((variable_name in names_of_dimension_variables) or
-                        (number_of_dimensions == 0)):
-
-                    self.register_a_template_error("cannot specify values for '%s' since it is neither a dimension variable nor a variable with no dimensions" % variable_name)
+                variable_creation_plan["values"] = numpy.array(
+                    variable[values_property_index]["values"],
+                    variable_creation_plan["data_type_object"])
 
             for attribute_name in template_locations["names_of_attributes"]:
                 property_index = template_locations[
                     "property_index_for_attribute"][attribute_name]
-                attribute = variable[property_index][attribute_name]
-                if attribute["data_type"] == "str":                    
-                    if "$" in attribute["value"]:
-                        self.show_a_warning("'$' based substitution cannot be used for a string value - see variable '%s' attribute '%s'" % (variable_name,attribute_name))
+                variable_creation_plan["attributes"].append(
+                    self.return_creation_plan_entry_for_attribute(
+                        attribute_name,
+                        variable[property_index][attribute_name]))
 
-                    for text_fragment in self.objects["string_formatter"].parse(attribute["value"]):
-                        if ((text_fragment[1] != None) and 
-                            (text_fragment[1] not in self.variables["templates_substitution-keys"][-1])):
+            if "missing_value" in template_locations["names_of_attributes"]:
+                variable_creation_plan["name_of_fill_attribute"] = \
+                    "missing_value"
+                if "_FillValue" not in template_locations["names_of_attributes"]:
+                    variable_creation_plan["fill_value_can_be_added"] = True
 
-                            self.variables["templates_substitution-keys"][-1].append(text_fragment[1])
-                            self.variables["templates_substitution-data-types"][-1].append(attribute["data_type"])
+            elif "_FillValue" in template_locations["names_of_attributes"]:
+                variable_creation_plan["name_of_fill_attribute"] = "_FillValue"
 
-                elif type(attribute["value"]) == str:
-                    substitution_name = attribute["value"][1:]
-                    if substitution_name not in self.variables["templates_substitution-keys"][-1]:
-                        self.variables["templates_substitution-keys"][-1].append(substitution_name)
-                        self.variables["templates_substitution-data-types"][-1].append(attribute["data_type"])
+            creation_plan["variables"].append(variable_creation_plan)
 
-            variables_index += 1
+        return creation_plan
 #
-# Check that all dimension names correspond to dimension variable and compile
-# a list of dimensions whose lengths have not been specified. 
+#########
 #
-        for dimension_name in self.variables["templates_names-of-dimensions"][-1]:
-            if dimension_name not in names_of_dimension_variables:
-                self.register_a_template_error("no variable has been defined for dimension '%s'" % dimension_name)
-
-            if dimension_name in lengths_of_variables_with_values:
-                self.variables["templates_lengths-of-specified-dimensions"][-1][dimension_name] = lengths_of_variables_with_values[dimension_name]
+# Internal sub-function of return_creation_plan_for_template, which returns
+# the creation plan entry for a (global or variable) attribute.
+#
+    def return_creation_plan_entry_for_attribute(self,attribute_name,attribute):
+        attribute_creation_plan = {
+            "name": attribute_name,
+            "data_type": attribute["data_type"],
+            "data_type_object": ()}
 
+        imported_value_data_type = type(attribute["value"])
+        if imported_value_data_type in self.variables["permissible_imported_str_data_types"]:
+            if attribute["data_type"] == "str":
+                attribute_creation_plan["substitution_type"] = "format"
+                attribute_creation_plan["value"] = attribute["value"].rstrip()
+                attribute_creation_plan["format_segments"] = list(
+                    self.objects["string_formatter"].parse(
+                        attribute_creation_plan["value"]))
             else:
-                self.variables["templates_names-of-unspecified-dimensions"][-1].append(dimension_name)
+                attribute_creation_plan["substitution_type"] = "numerical"
+                attribute_creation_plan["value"] = attribute["value"][1:]
+
+        elif imported_value_data_type == list:
+            attribute_creation_plan["substitution_type"] = "list"
+            attribute_creation_plan["value"] = return_array_for_list_value(
+                attribute["value"],attribute["data_type"])
+        else:
+            attribute_creation_plan["substitution_type"] = "value"
+            attribute_creation_plan["value"] = return_data_type_object(
+                attribute["data_type"])(attribute["value"])
+
+        if attribute["data_type"] != "str":
+            attribute_creation_plan["data_type_object"] = \
+                return_data_type_object(attribute["data_type"])
+
+        return return_attribute_creation_plan_with_bound_substitutions(
+            attribute_creation_plan,{})
 #
 #########
 #
@@ -684,14 +1893,12 @@ class Creator():
 #
     def show_templates_available(self):
         print "\nTemplates available"
-        number_of_templates = len(self.objects["templates"])
-        templates_index = 0
-        while templates_index < number_of_templates:
-            print "  %s  [%s]" % (
-                self.variables["templates_data-object-type"][templates_index],
-                self.variables["templates_file-name"][templates_index])
+        with self.objects["templates_lock"]:
+            template_entries = self.objects["templates"].values()
 
-            templates_index += 1
+        for template_entry in template_entries:
+            print "  %s  [%s]" % (
+                template_entry["data_object_type"],template_entry["file_name"])
 #
 #########
 #
@@ -702,22 +1909,20 @@ class Creator():
 #
     def show_details_for_template(self,data_object_type):
         its_okay_to_continue = True
-        if data_object_type not in self.variables["templates_data-object-type"]:
+        template_entry = self.return_template_entry(data_object_type)
+        if template_entry == {}:
             its_okay_to_continue = False
             self.show_a_warning("there is no template for data object type %s" % data_object_type)
-        else:
-            templates_index = self.variables[
-                "templates_data-object-type"].index(data_object_type)
 
         if its_okay_to_continue:
             print "Template of data object for data object type: %s\n" % data_object_type
             print "GLOBAL ATTRIBUTES"
             number_of_global_attributes = len(
-                self.objects["templates"][templates_index]["global_attributes"])
+                template_entry["template"]["global_attributes"])
             global_attributes_index = 0
             while global_attributes_index < number_of_global_attributes:
-                global_attribute_name = self.objects["templates"][templates_index]["global_attributes"][global_attributes_index].keys()[0]
-                global_attribute = self.objects["templates"][templates_index]["global_attributes"][global_attributes_index][global_attribute_name]
+                global_attribute_name = template_entry["template"]["global_attributes"][global_attributes_index].keys()[0]
+                global_attribute = template_entry["template"]["global_attributes"][global_attributes_index][global_attribute_name]
 
                 formatted_attribute_value = self.return_formatted_attribute_value("global",global_attribute)
 
@@ -730,12 +1935,12 @@ class Creator():
 
             print "\nVARIABLES"
             number_of_variables = len(
-                self.objects["templates"][templates_index]["variables"])
+                template_entry["template"]["variables"])
             variables_index = 0
             while variables_index < number_of_variables:
-                variable_name = self.objects["templates"][templates_index][
+                variable_name = template_entry["template"][
                     "variables"][variables_index].keys()[0]
-                variable = self.objects["templates"][templates_index]["variables"][variables_index][variable_name]
+                variable = template_entry["template"]["variables"][variables_index][variable_name]
                 template_locations = \
                     self.return_template_locations_for_variable(variable)
 
@@ -777,67 +1982,34 @@ class Creator():
 #
     def show_requirements_for_template(self,data_object_type):
         its_okay_to_continue = True
-        if data_object_type not in self.variables["templates_data-object-type"]:
+        template_entry = self.return_template_entry(data_object_type)
+        if template_entry == {}:
             its_okay_to_continue = False
             self.show_a_warning("there is no template for data object type %s" % data_object_type)
-        else:
-            templates_index = self.variables[
-                "templates_data-object-type"].index(data_object_type)
 
         if its_okay_to_continue:
-            print "\nData object type: %s" % self.variables["templates_data-object-type"][templates_index]
+            print "\nData object type: %s" % template_entry["data_object_type"]
 
             print "  Required substitutions:"
-            number_of_substitutions = len(
-                self.variables["templates_substitution-keys"][templates_index])
+            number_of_substitutions = len(template_entry["substitution_keys"])
             substitutions_index = 0
             while substitutions_index < number_of_substitutions:
                 print "  %7s - %s" % (
-                    self.variables["templates_substitution-data-types"][
-                        templates_index][substitutions_index],
-                    self.variables["templates_substitution-keys"][
-                        templates_index][substitutions_index])
+                    template_entry["substitution_data_types"][
+                        substitutions_index],
+                    template_entry["substitution_keys"][substitutions_index])
                 substitutions_index += 1
 
             print "\n  Required dimension lengths:"
-            for dimension_name in self.variables[
-                "templates_names-of-unspecified-dimensions"][templates_index]:
-
-                print "    %s" % dimension_name
-#
-#########
-#
-# Internal function to return the value of an attribute after any necessary
-# substitutions have been made.
-# 
-    def return_substituted_attribute_value(self,attribute_name,attribute):
-        imported_value_data_type = type(attribute["value"])
-        if imported_value_data_type in self.variables["permissible_imported_str_data_types"]:
-            if attribute["data_type"] == "str":
-                attribute_value_template = attribute["value"].rstrip()
-                attribute_value = attribute_value_template.format(**self.variables["substitutions"])
+            for dimension_name in template_entry[
+                "names_of_unspecified_dimensions"]:
 
-            else:
-                data_type_object = return_data_type_object(
-                    attribute["data_type"])
-                substitution_key = attribute["value"][1:]
-                attribute_value = data_type_object(
-                    self.variables["substitutions"][substitution_key])
-
-        elif imported_value_data_type == list:
-            data_type_object = return_data_type_object(attribute["data_type"])
-            number_of_values = len(attribute["value"])
-            attribute_value = numpy.zeros([number_of_values],data_type_object)
-            values_index = 0
-            while values_index < number_of_values:
-                attribute_value[values_index] = attribute["value"][values_index]
-                values_index += 1
+                if dimension_name in template_entry[
+                    "names_of_unlimited_dimensions"]:
 
-        else:
-            data_type_object = return_data_type_object(attribute["data_type"])
-            attribute_value = data_type_object(attribute["value"])
-
-        return attribute_value
+                    print "    %s (unlimited)" % dimension_name
+                else:
+                    print "    %s" % dimension_name
 #
 #########
 #
@@ -913,136 +2085,639 @@ class Creator():
 # the variable values arrays will be populated with the missing datum value.
 # This function will return an empty dictionary is any errors are 
 # encountered.
+#
+# The data object is produced by running the creation plan that was compiled
+# for the template when it was loaded.
+#
+# If the optional input argument values_allocation is "deferred" rather than
+# "immediate", the values arrays (other than those given in the template)
+# are only allocated when they are first written to - see the
+# DeferredAllocationValues class. This saves both time and memory when the
+# values of some variables are to be replaced entirely, or are never set.
+#
+# Arrays that the caller already holds can be given in the optional input
+# argument values_buffers, a dictionary keyed by variable name. They are
+# checked against the data types and dimension lengths of the variables, and
+# are then referenced by the data object rather than copied.
 # 
     def create_from_template(
-            self,data_object_type,lengths_of_dimensions,substitutions={},add_fill_value=False):
+            self,data_object_type,lengths_of_dimensions,substitutions={},add_fill_value=False,
+            values_allocation="immediate",values_buffers={}):
 
-        self.variables["no_creation_errors_have_been_encountered"] = True
-        self.variables["substitutions"] = substitutions
+        call_timer = return_call_timer("create_from_template")
+        if call_timer is not None:
+            call_timer.start_a_phase("argument_checking")
+
+        creation_errors = []
         data_object = {}
 
-        if data_object_type not in self.variables["templates_data-object-type"]:
-            self.register_a_creation_error("there is no template for data object type %s" % data_object_type)
-        else:
-            templates_index = self.variables[
-                "templates_data-object-type"].index(data_object_type)
-            for dimension_name in self.variables["templates_names-of-unspecified-dimensions"][templates_index]:
+        template_entry = self.return_template_entry(data_object_type)
+        if values_allocation not in self.variables[
+            "permissible_values_allocations"]:
 
+            self.register_a_creation_error("values allocation %s is not one of %s" % (values_allocation,", ".join(self.variables["permissible_values_allocations"])),creation_errors)
+        elif template_entry == {}:
+            self.register_a_creation_error("there is no template for data object type %s" % data_object_type,creation_errors)
+        else:
+            creation_plan = template_entry["creation_plan"]
+            for dimension_name in creation_plan["names_of_unspecified_dimensions"]:
                 if dimension_name not in lengths_of_dimensions:
-                    self.register_a_creation_error("length of dimension %s has not been specified" % dimension_name)
+                    self.register_a_creation_error("length of dimension %s has not been specified" % dimension_name,creation_errors)
 
-            for substitution_name in self.variables["templates_substitution-keys"][templates_index]:
+            for substitution_name in creation_plan["substitution_keys"]:
                 if substitution_name not in substitutions:
-                    self.register_a_creation_error("substitution %s has not been specified" % substitution_name)
-#
-        if self.variables["no_creation_errors_have_been_encountered"]:
-            data_object["names_of_global_attributes"] = []
-            data_object["names_of_variables"] = []
-            data_object["names_of_dimensions"] = []
-            data_object["global_attributes"] = {}
-            data_object["variables"] = {}
-            data_object["dimensions"] = {}
-
-            for dimension_name in self.variables[
-                "templates_names-of-dimensions"][templates_index]:
-
-                data_object["names_of_dimensions"].append(dimension_name)
-                if dimension_name in lengths_of_dimensions:
-                    data_object["dimensions"][dimension_name] = \
-                        lengths_of_dimensions[dimension_name]
+                    self.register_a_creation_error("substitution %s has not been specified" % substitution_name,creation_errors)
+
+            if creation_errors == []:
+                for error_message in return_errors_for_values_buffers(
+                    creation_plan,lengths_of_dimensions,values_buffers):
+
+                    self.register_a_creation_error(
+                        error_message,creation_errors)
+
+        if creation_errors == []:
+            data_object = return_data_object_for_creation_plan(
+                creation_plan,lengths_of_dimensions,substitutions,
+                add_fill_value,values_allocation,values_buffers,call_timer)
+
+        if call_timer is not None:
+            call_timer.finish()
+
+        return data_object
+#
+#########
+#
+# Main function of Creator class that returns a list of "empty" data objects
+# created from the same template, in the same way as create_from_template.
+# The data object type string (of the template) and a sequence of
+# (lengths_of_dimensions, substitutions) pairs - one for each data object -
+# must be supplied as input. The list of data objects is in the same order
+# as the pairs. An empty dictionary is returned in place of any data object
+# for which the lengths of the dimensions or the substitutions are
+# incomplete. A pair may instead be a (lengths_of_dimensions, substitutions,
+# values_buffers) triple, to supply values buffers as for
+# create_from_template (they are copied to the worker processes, if there
+# are any).
+#
+# The values of all attributes that do not depend on the substitutions are
+# computed only once for the whole batch, and are shared by all of the data
+# objects (numerical array values are therefore made read-only). If
+# number_of_workers is greater than 1, the data objects are created by a
+# pool of worker processes. The optional input argument values_allocation
+# has the same meaning as for create_from_template.
+#
+    def create_many_from_template(
+            self,data_object_type,lengths_and_substitutions,
+            add_fill_value=False,number_of_workers=1,
+            values_allocation="immediate"):
+
+        creation_errors = []
+        data_objects = []
+
+        template_entry = self.return_template_entry(data_object_type)
+        if values_allocation not in self.variables[
+            "permissible_values_allocations"]:
+
+            self.register_a_creation_error("values allocation %s is not one of %s" % (values_allocation,", ".join(self.variables["permissible_values_allocations"])),creation_errors)
+        elif template_entry == {}:
+            self.register_a_creation_error("there is no template for data object type %s" % data_object_type,creation_errors)
+        else:
+            creation_plan = return_creation_plan_with_shared_array_values(
+                template_entry["creation_plan"])
+            names_of_unspecified_dimensions = set(
+                creation_plan["names_of_unspecified_dimensions"])
+            substitution_keys = set(creation_plan["substitution_keys"])
+
+            list_of_arguments = []
+            for lengths_and_substitutions_for_data_object in lengths_and_substitutions:
+                lengths_of_dimensions, substitutions = \
+                    lengths_and_substitutions_for_data_object[:2]
+                values_buffers = {}
+                if len(lengths_and_substitutions_for_data_object) > 2:
+                    values_buffers = lengths_and_substitutions_for_data_object[2]
+
+                arguments_are_complete = True
+                for dimension_name in names_of_unspecified_dimensions.difference(lengths_of_dimensions):
+                    arguments_are_complete = False
+                    self.register_a_creation_error("length of dimension %s has not been specified for data object %i" % (dimension_name,len(list_of_arguments)),creation_errors)
+
+                for substitution_name in substitution_keys.difference(substitutions):
+                    arguments_are_complete = False
+                    self.register_a_creation_error("substitution %s has not been specified for data object %i" % (substitution_name,len(list_of_arguments)),creation_errors)
+
+                if arguments_are_complete:
+                    for error_message in return_errors_for_values_buffers(
+                        creation_plan,lengths_of_dimensions,values_buffers):
+
+                        arguments_are_complete = False
+                        self.register_a_creation_error("%s for data object %i" % (error_message,len(list_of_arguments)),creation_errors)
+
+                if arguments_are_complete:
+                    list_of_arguments.append((
+                        lengths_of_dimensions,substitutions,add_fill_value,
+                        values_allocation,values_buffers))
                 else:
-                    data_object["dimensions"][dimension_name] = self.variables["templates_lengths-of-specified-dimensions"][templates_index][dimension_name]
+                    list_of_arguments.append(None)
+
+            number_of_workers = max(
+                1,min(number_of_workers,len(list_of_arguments)))
+            if number_of_workers == 1:
+                for arguments in list_of_arguments:
+                    data_objects.append(return_data_object_for_creation_arguments(
+                        arguments,creation_plan))
+            else:
+                pool = multiprocessing.Pool(
+                    number_of_workers,set_worker_creation_plan,
+                    (creation_plan,))
+                try:
+                    data_objects = pool.map(
+                        return_data_object_for_creation_arguments,
+                        list_of_arguments)
+                finally:
+                    pool.terminate()
+                    pool.join()
+
+        return data_objects
 #
-            number_of_global_attributes = len(self.objects["templates"][templates_index]["global_attributes"])
-            global_attributes_index = 0
-            while global_attributes_index < number_of_global_attributes:
-                global_attribute_name = self.objects["templates"][templates_index]["global_attributes"][global_attributes_index].keys()[0]
-                global_attribute = self.objects["templates"][templates_index]["global_attributes"][global_attributes_index][global_attribute_name]
-
-                data_object["names_of_global_attributes"].append(
-                    global_attribute_name)
-                data_object["global_attributes"][global_attribute_name] = {
-                    "data_type": global_attribute["data_type"], 
-                    "value": self.return_substituted_attribute_value(global_attribute_name,global_attribute)}
-                                    
-                global_attributes_index += 1
+#########
 #
-            number_of_variables = len(
-                self.objects["templates"][templates_index]["variables"])
+# Function that returns a specialized Creator object for a template, in
+# which the substitutions that are the same for many data objects - e.g.
+# those for a particular site or instrument - have been made once and for
+# all. The specialized Creator holds only this template, under the same data
+# object type, and its creation plan has been partially evaluated: str
+# values whose substitution fields have all been given are final, and the
+# others only format the fields that remain. Its create_from_template and
+# create_many_from_template functions then need only the remaining
+# substitutions, and are correspondingly faster. None is returned if there is
+# no template for the data object type.
+#
+    def return_specialized_creator(self,data_object_type,substitutions):
+        specialized_creator = None
+        creation_errors = []
+        template_entry = self.return_template_entry(data_object_type)
+        if template_entry == {}:
+            self.register_a_creation_error("there is no template for data object type %s" % data_object_type,creation_errors)
+        else:
+            specialized_template_entry = dict(template_entry)
+            specialized_template_entry["bound_substitutions"] = dict(
+                template_entry.get("bound_substitutions",{}))
+            specialized_template_entry["bound_substitutions"].update(
+                substitutions)
+            specialized_template_entry["substitution_keys"] = []
+            specialized_template_entry["substitution_data_types"] = []
+            number_of_substitutions = len(template_entry["substitution_keys"])
+            substitutions_index = 0
+            while substitutions_index < number_of_substitutions:
+                substitution_key = \
+                    template_entry["substitution_keys"][substitutions_index]
+                if substitution_key not in substitutions:
+                    specialized_template_entry["substitution_keys"].append(
+                        substitution_key)
+                    specialized_template_entry[
+                        "substitution_data_types"].append(template_entry[
+                            "substitution_data_types"][substitutions_index])
 
-            variables_index = 0
-            while variables_index < number_of_variables:
-                variable_name = self.objects["templates"][templates_index]["variables"][variables_index].keys()[0]
-                variable = self.objects["templates"][templates_index]["variables"][variables_index][variable_name]
-                
-                template_locations = \
-                    self.return_template_locations_for_variable(variable)
-                data_type_property_index = template_locations[
-                    "property_index_for_feature"]["data_type"]
-                dimensions_property_index = template_locations[
-                    "property_index_for_feature"]["dimensions"]
-                values_property_index = template_locations[
-                    "property_index_for_feature"]["values"]
+                substitutions_index += 1
+
+            specialized_template_entry["creation_plan"] = \
+                return_creation_plan_with_bound_substitutions(
+                    template_entry["creation_plan"],substitutions)
+
+            specialized_creator = Creator(self.variables["verbosity_level"])
+            specialized_creator.objects["templates"][data_object_type] = \
+                specialized_template_entry
+
+        return specialized_creator
+#
+#################
+#
+# Internal sub function of Creator.create_from_template() and
+# create_many_from_template(). It checks the values buffers supplied for a
+# data object - a dictionary of numpy arrays keyed by variable name - and
+# returns a list of error messages (empty if there are none). Each buffer must
+# be for a variable in the template, must have the variable's data type (in
+# either byte order), and must have the shape given by the lengths of its
+# dimensions. A variable without dimensions has a shape of [1].
+#
+def return_errors_for_values_buffers(
+        creation_plan,lengths_of_dimensions,values_buffers):
+
+    errors = []
+    variable_creation_plans = {}
+    if values_buffers != {}:
+        for variable_creation_plan in creation_plan["variables"]:
+            variable_creation_plans[variable_creation_plan["name"]] = \
+                variable_creation_plan
+
+    for variable_name in values_buffers:
+        values = values_buffers[variable_name]
+        if variable_name not in variable_creation_plans:
+            errors.append("a values buffer has been given for variable %s, which is not in the template" % variable_name)
+            continue
+
+        variable_creation_plan = variable_creation_plans[variable_name]
+        values_shape = []
+        for dimension_name in variable_creation_plan["dimensions"]:
+            if dimension_name in lengths_of_dimensions:
+                values_shape.append(lengths_of_dimensions[dimension_name])
+            else:
+                values_shape.append(creation_plan[
+                    "lengths_of_specified_dimensions"][dimension_name])
+        if values_shape == []:
+            values_shape = [1]
+
+        if not isinstance(values,numpy.ndarray):
+            errors.append("the values buffer for variable %s is not a numpy array" % variable_name)
+        elif variable_creation_plan["data_type"] == "str":
+            if values.dtype.kind not in ["S", "U"]:
+                errors.append("the values buffer for variable %s has data type %s rather than str" % (variable_name,values.dtype))
+        elif (values.dtype.newbyteorder("=") !=
+              numpy.dtype(variable_creation_plan["data_type_object"])):
+
+            errors.append("the values buffer for variable %s has data type %s rather than %s" % (variable_name,values.dtype,variable_creation_plan["data_type"]))
+
+        if (isinstance(values,numpy.ndarray) and
+            (list(values.shape) != values_shape)):
+
+            errors.append("the values buffer for variable %s has shape %s rather than %s" % (variable_name,list(values.shape),values_shape))
+
+    return errors
+#
+#################
+#
+# Internal function that runs a creation plan - compiled by
+# Creator.return_creation_plan_for_template - against the lengths of the
+# dimensions and the substitution values in order to return a data object.
+# The presence of all of the required dimension lengths and substitution
+# keys must already have been checked.
+#
+# Each values array is allocated in a single step: it is filled with the
+# missing value (or _FillValue) where there is one, it is a copy of the
+# values given in the template where there are any, and it is otherwise
+# filled with zeros. If values_allocation is "deferred", the arrays of the
+# variables without values in the template are not allocated at all - a
+# DeferredAllocationValues object stands in for each of them until it is
+# first written to. No array is allocated for a variable whose values are
+# given in values_buffers, which are used as they are (i.e. not copied) and
+# must already have been checked by return_errors_for_values_buffers(). The
+# attribute formatting and allocation are timed if a call timer is given.
+#
+def return_data_object_for_creation_plan(
+        creation_plan,lengths_of_dimensions,substitutions,add_fill_value,
+        values_allocation="immediate",values_buffers={},call_timer=None):
+
+    if call_timer is not None:
+        call_timer.start_a_phase("attribute_formatting")
+
+    data_object = {
+        "names_of_global_attributes": [],
+        "names_of_variables": [],
+        "names_of_dimensions": list(creation_plan["names_of_dimensions"]),
+        "names_of_unlimited_dimensions": 
+            list(creation_plan["names_of_unlimited_dimensions"]),
+        "global_attributes": {},
+        "variables": {},
+        "dimensions": {}}
+
+    for dimension_name in creation_plan["names_of_dimensions"]:
+        if dimension_name in lengths_of_dimensions:
+            data_object["dimensions"][dimension_name] = \
+                lengths_of_dimensions[dimension_name]
+        else:
+            data_object["dimensions"][dimension_name] = creation_plan[
+                "lengths_of_specified_dimensions"][dimension_name]
 
-                data_type_object = return_data_type_object(
-                    variable[data_type_property_index]["data_type"])
-                values_shape = []
-                for dimension_name in variable[dimensions_property_index]["dimensions"]:
-                    values_shape.append(data_object["dimensions"][dimension_name])
+    for attribute_creation_plan in creation_plan["global_attributes"]:
+        if attribute_creation_plan["substitution_type"] == "value":
+            attribute_value = attribute_creation_plan["value"]
+        else:
+            attribute_value = return_attribute_value_for_creation_plan_entry(
+                attribute_creation_plan,substitutions)
+        data_object["names_of_global_attributes"].append(
+            attribute_creation_plan["name"])
+        data_object["global_attributes"][attribute_creation_plan["name"]] = {
+            "data_type": attribute_creation_plan["data_type"],
+            "value": attribute_value}
+
+    for variable_creation_plan in creation_plan["variables"]:
+        values_shape = []
+        for dimension_name in variable_creation_plan["dimensions"]:
+            values_shape.append(data_object["dimensions"][dimension_name])
 #
 # Note that a variable without dimensions is expected to have only one value
 #
-                if values_shape == []:
-                    values_shape = [1]
+        if values_shape == []:
+            values_shape = [1]
 
-                data_object["names_of_variables"].append(variable_name)
-                data_object["variables"][variable_name] = {
-                    "data_type": variable[data_type_property_index]["data_type"],
-                    "dimensions": variable[dimensions_property_index]["dimensions"],
-                    "values": numpy.zeros(values_shape,data_type_object),
-                    "names_of_attributes": []}
+        variable = {
+            "data_type": variable_creation_plan["data_type"],
+            "dimensions": list(variable_creation_plan["dimensions"]),
+            "names_of_attributes": []}
 
-                for attribute_name in template_locations["names_of_attributes"]:
-                    data_object["variables"][variable_name][
-                        "names_of_attributes"].append(attribute_name)
+        for feature_name in variable_creation_plan["storage_features"]:
+            variable[feature_name] = copy.copy(
+                variable_creation_plan["storage_features"][feature_name])
 
-                    property_index = template_locations[
-                        "property_index_for_attribute"][attribute_name]
-                    attribute = variable[property_index][attribute_name]
+        for attribute_creation_plan in variable_creation_plan["attributes"]:
+            if attribute_creation_plan["substitution_type"] == "value":
+                attribute_value = attribute_creation_plan["value"]
+            else:
+                attribute_value = \
+                    return_attribute_value_for_creation_plan_entry(
+                        attribute_creation_plan,substitutions)
+            variable["names_of_attributes"].append(
+                attribute_creation_plan["name"])
+            variable[attribute_creation_plan["name"]] = {
+                "data_type": attribute_creation_plan["data_type"],
+                "value": attribute_value}
+
+            if (add_fill_value and
+                variable_creation_plan["fill_value_can_be_added"] and
+                (attribute_creation_plan["name"] == "missing_value")):
+
+                variable["names_of_attributes"].append("_FillValue")
+                variable["_FillValue"] = {
+                    "data_type": attribute_creation_plan["data_type"],
+                    "value": return_attribute_value_for_creation_plan_entry(
+                        attribute_creation_plan,substitutions)}
+
+        fill_value = None
+        if variable_creation_plan["name_of_fill_attribute"] != "":
+            fill_value = variable[
+                variable_creation_plan["name_of_fill_attribute"]]["value"]
+
+        if call_timer is not None:
+            call_timer.start_a_phase("allocation")
+
+        if variable_creation_plan["name"] in values_buffers:
+            variable["values"] = values_buffers[variable_creation_plan["name"]]
+
+        elif variable_creation_plan["values"] is not None:
+            if list(variable_creation_plan["values"].shape) == values_shape:
+                variable["values"] = variable_creation_plan["values"].copy()
+            else:
+                variable["values"] = numpy.zeros(
+                    values_shape,variable_creation_plan["data_type_object"])
+                variable["values"][:len(variable_creation_plan["values"])] = \
+                    variable_creation_plan["values"]
+
+        elif values_allocation == "deferred":
+            variable["values"] = DeferredAllocationValues(
+                values_shape,variable_creation_plan["data_type_object"],
+                fill_value)
+
+        elif fill_value is not None:
+            variable["values"] = numpy.full(
+                values_shape,fill_value,
+                variable_creation_plan["data_type_object"])
+        else:
+            variable["values"] = numpy.zeros(
+                values_shape,variable_creation_plan["data_type_object"])
+#
+# Values buffers and deferred allocations do not move any bytes here
+#
+        if call_timer is not None:
+            if ((variable_creation_plan["name"] not in values_buffers) and
+                isinstance(variable["values"],numpy.ndarray)):
 
-                    data_object["variables"][variable_name][attribute_name] = {
-                        "data_type": attribute["data_type"],
-                        "value": self.return_substituted_attribute_value(
-                            attribute_name,attribute)}
+                call_timer.add_bytes_for_variable(
+                    variable_creation_plan["name"],variable["values"].nbytes)
+            else:
+                call_timer.add_bytes_for_variable(
+                    variable_creation_plan["name"],0)
+
+            call_timer.start_a_phase("attribute_formatting")
 
-                    if (add_fill_value and
-                        (attribute_name == "missing_value") and 
-                        ("_FillValue" not in template_locations["names_of_attributes"])):
+        data_object["names_of_variables"].append(variable_creation_plan["name"])
+        data_object["variables"][variable_creation_plan["name"]] = variable
+
+    return data_object
+#
+#################
+#
+# Internal sub function of Creator.create_many_from_template(). It returns a
+# copy of a creation plan in which each numerical array value is given by a
+# plan entry of substitution type "value", so that the read-only array held
+# by the creation plan is shared by all of the data objects in a batch rather
+# than copied for each of them. Every other attribute value that does not
+# depend on the substitutions is already held by a "value" entry.
+#
+def return_creation_plan_with_shared_array_values(creation_plan):
+    return return_creation_plan_with_mapped_attributes(
+        creation_plan,return_attribute_creation_plan_with_shared_array_value)
 
-                        data_object["variables"][variable_name]["names_of_attributes"].append("_FillValue")
-                        data_object["variables"][variable_name]["_FillValue"] = {
-                            "data_type": attribute["data_type"],
-                            "value": self.return_substituted_attribute_value(attribute_name,attribute)}
+def return_attribute_creation_plan_with_shared_array_value(
+        attribute_creation_plan):
 
-                if values_property_index != -1:
-                    values_index = 0
-                    while values_index < len(variable[values_property_index]["values"]):
-                        data_object["variables"][variable_name]["values"][values_index] = variable[values_property_index]["values"][values_index]
-                        values_index += 1
+    if attribute_creation_plan["substitution_type"] == "list":
+        attribute_creation_plan = dict(attribute_creation_plan)
+        attribute_creation_plan["substitution_type"] = "value"
 
-                elif "missing_value" in data_object["variables"][variable_name]["names_of_attributes"]:
+    return attribute_creation_plan
+#
+#################
+#
+# Internal sub function of Creator.return_specialized_creator(). It returns a
+# copy of a creation plan in which the given substitutions have been made
+# (see return_attribute_creation_plan_with_bound_substitutions), and whose
+# substitution keys are only those that remain to be given.
+#
+def return_creation_plan_with_bound_substitutions(creation_plan,substitutions):
+    bound_creation_plan = return_creation_plan_with_mapped_attributes(
+        creation_plan,
+        lambda attribute_creation_plan:
+            return_attribute_creation_plan_with_bound_substitutions(
+                attribute_creation_plan,substitutions))
+
+    bound_creation_plan["substitution_keys"] = []
+    for substitution_key in creation_plan["substitution_keys"]:
+        if substitution_key not in substitutions:
+            bound_creation_plan["substitution_keys"].append(substitution_key)
+
+    return bound_creation_plan
+#
+#################
+#
+# Internal sub function of return_creation_plan_with_shared_array_values()
+# and return_creation_plan_with_bound_substitutions(). It returns a copy of a
+# creation plan in which the plan entry of each (global or variable)
+# attribute has been replaced by the one returned for it by a function. The
+# rest of the plan is shared with the original.
+#
+def return_creation_plan_with_mapped_attributes(
+        creation_plan,return_mapped_attribute_creation_plan):
+
+    mapped_creation_plan = dict(creation_plan)
+    mapped_creation_plan["global_attributes"] = []
+    for attribute_creation_plan in creation_plan["global_attributes"]:
+        mapped_creation_plan["global_attributes"].append(
+            return_mapped_attribute_creation_plan(attribute_creation_plan))
+
+    mapped_creation_plan["variables"] = []
+    for variable_creation_plan in creation_plan["variables"]:
+        mapped_variable_creation_plan = dict(variable_creation_plan)
+        mapped_variable_creation_plan["attributes"] = []
+        for attribute_creation_plan in variable_creation_plan["attributes"]:
+            mapped_variable_creation_plan["attributes"].append(
+                return_mapped_attribute_creation_plan(attribute_creation_plan))
+
+        mapped_creation_plan["variables"].append(mapped_variable_creation_plan)
+
+    return mapped_creation_plan
+#
+#################
+#
+# Internal function that returns a copy of the creation plan entry of an
+# attribute in which the given substitutions have been made, i.e. its value
+# has been partially evaluated. A "numerical" entry whose substitution has
+# been given becomes a "value" entry. In the case of a "format" entry, the
+# fields whose substitutions have been given (along with those of any fields
+# nested in their format specifications) are formatted into the text
+# (with any braces in it doubled), leaving a format string that only
+# contains the fields still to be substituted. The given substitutions that
+# the remaining fields still refer to (e.g. "reading" in
+# "{reading:{width}}" when "width" has not been given) are kept in the
+# entry, as "bound_substitutions", to be used when it is formatted. If no
+# fields remain, it becomes a "value" entry holding the final str value.
+# With no substitutions, this constant-folds a str value without any
+# fields.
+#
+def return_attribute_creation_plan_with_bound_substitutions(
+        attribute_creation_plan,substitutions):
+
+    substitution_type = attribute_creation_plan["substitution_type"]
+    bound_attribute_creation_plan = dict(attribute_creation_plan)
+    if substitution_type == "numerical":
+        if attribute_creation_plan["value"] in substitutions:
+            bound_attribute_creation_plan["substitution_type"] = "value"
+            bound_attribute_creation_plan["value"] = \
+                attribute_creation_plan["data_type_object"](
+                    substitutions[attribute_creation_plan["value"]])
+
+    elif substitution_type == "format":
+        if "bound_substitutions" in attribute_creation_plan:
+            bound_substitutions = dict(
+                attribute_creation_plan["bound_substitutions"])
+            bound_substitutions.update(substitutions)
+            substitutions = bound_substitutions
+
+        format_string_elements = []
+        for literal_text, field_name, format_spec, conversion in \
+            attribute_creation_plan["format_segments"]:
+
+            format_string_elements.append(
+                literal_text.replace("{","{{").replace("}","}}"))
+            if field_name is not None:
+                field_string_elements = ["{", field_name]
+                if conversion is not None:
+                    field_string_elements.extend(["!", conversion])
+                if format_spec != "":
+                    field_string_elements.extend([":", format_spec])
+                field_string_elements.append("}")
+                field_string = "".join(field_string_elements)
+
+                field_can_be_bound = field_name in substitutions
+                for nested_format_segment in string.Formatter().parse(
+                    format_spec):
+
+                    if (nested_format_segment[1] is not None and
+                        nested_format_segment[1] not in substitutions):
+
+                        field_can_be_bound = False
+
+                if field_can_be_bound:
+                    format_string_elements.append(field_string.format(
+                        **substitutions).replace("{","{{").replace("}","}}"))
+                else:
+                    format_string_elements.append(field_string)
+
+        format_string = "".join(format_string_elements)
+        format_segments = list(string.Formatter().parse(format_string))
+        fields_remain = False
+        names_of_remaining_fields = []
+        for format_segment in format_segments:
+            if format_segment[1] is not None:
+                fields_remain = True
+                names_of_remaining_fields.append(format_segment[1])
+                for nested_format_segment in string.Formatter().parse(
+                    format_segment[2]):
+
+                    if nested_format_segment[1] is not None:
+                        names_of_remaining_fields.append(
+                            nested_format_segment[1])
+
+        if fields_remain:
+            bound_attribute_creation_plan["value"] = format_string
+            bound_attribute_creation_plan["format_segments"] = format_segments
+            bound_attribute_creation_plan.pop("bound_substitutions",None)
+            for field_name in names_of_remaining_fields:
+                if field_name in substitutions:
+                    bound_attribute_creation_plan.setdefault(
+                        "bound_substitutions",{})[field_name] = \
+                        substitutions[field_name]
+        else:
+            bound_attribute_creation_plan["substitution_type"] = "value"
+            bound_attribute_creation_plan["value"] = format_string.format()
+            del bound_attribute_creation_plan["format_segments"]
+            bound_attribute_creation_plan.pop("bound_substitutions",None)
 
-                    data_object["variables"][variable_name]["values"][:] = \
-                        data_object["variables"][variable_name]["missing_value"]["value"]
+    return bound_attribute_creation_plan
+#
+#################
+#
+# Internal sub functions of Creator.create_many_from_template(). The creation
+# plan is passed to each worker process once, when the pool is started,
+# rather than with every set of arguments. The arguments are None for a data
+# object whose lengths of dimensions or substitutions are incomplete.
+#
+worker_creation_plan = {}
 
-                elif "_FillValue" in data_object["variables"][variable_name]["names_of_attributes"]:
+def set_worker_creation_plan(creation_plan):
+    global worker_creation_plan
+    worker_creation_plan = creation_plan
 
-                    data_object["variables"][variable_name]["values"][:] = \
-                        data_object["variables"][variable_name]["_FillValue"]["value"]
+def return_data_object_for_creation_arguments(arguments,creation_plan=None):
+    data_object = {}
+    if creation_plan is None:
+        creation_plan = worker_creation_plan
 
-                variables_index += 1
+    if arguments is not None:
+        lengths_of_dimensions, substitutions, add_fill_value, \
+            values_allocation, values_buffers = arguments
+        data_object = return_data_object_for_creation_plan(
+            creation_plan,lengths_of_dimensions,substitutions,add_fill_value,
+            values_allocation,values_buffers)
 
-        return data_object
+    return data_object
+#
+#################
+#
+# Internal sub function of return_data_object_for_creation_plan(). It returns
+# the value of an attribute, described by its creation plan entry, after any
+# necessary substitutions have been made.
+#
+def return_attribute_value_for_creation_plan_entry(
+        attribute_creation_plan,substitutions):
+
+    substitution_type = attribute_creation_plan["substitution_type"]
+    if substitution_type == "value":
+        attribute_value = attribute_creation_plan["value"]
+    elif substitution_type == "format":
+        if "bound_substitutions" in attribute_creation_plan:
+            bound_substitutions = dict(substitutions)
+            bound_substitutions.update(
+                attribute_creation_plan["bound_substitutions"])
+            substitutions = bound_substitutions
+        attribute_value = attribute_creation_plan["value"].format(
+            **substitutions)
+    elif substitution_type == "numerical":
+        attribute_value = attribute_creation_plan["data_type_object"](
+            substitutions[attribute_creation_plan["value"]])
+    else:
+        attribute_value = attribute_creation_plan["value"].copy()
+
+    return attribute_value
 #
 #################
 #
@@ -1057,49 +2732,359 @@ def return_data_type_for_value(value):
 
     return data_type
 #
+#################
+#
+# Internal sub function of extract_from_netcdf_file(). It returns the data
+# type (string) of a netCDF variable without reading any of its values.
+#
+def return_data_type_for_netcdf_variable(netcdf_variable):
+    if netcdf_variable.dtype is str:
+        data_type = "str"
+    else:
+        data_type = str(netcdf_variable.dtype)
+
+    return data_type
+#
+#################
+#
+# Internal sub function of extract_from_netcdf_file(). It returns the numpy
+# data type of the values that are read from a netCDF variable, without
+# reading any of them. For a packed variable, i.e. one with a numerical
+# scale_factor or add_offset attribute, this is the data type of the unpacked
+# values rather than that stored in the file. The netCDF4 module's unpacking
+# is applied to a single zero, so that the data type follows the same rules
+# (e.g. a scale_factor of 1 leaves the values packed).
+#
+def return_unpacked_dtype_for_netcdf_variable(netcdf_variable):
+    dtype = netcdf_variable.dtype
+    names_of_attributes = netcdf_variable.ncattrs()
+    packing_attributes = {}
+    for attribute_name in ["scale_factor", "add_offset"]:
+        if attribute_name in names_of_attributes:
+            packing_attributes[attribute_name] = netcdf_variable.getncattr(
+                attribute_name)
+
+    if ((dtype is not str) and (packing_attributes != {})):
+        packing_attributes_are_numerical = True
+        for attribute_value in packing_attributes.values():
+            if numpy.asarray(attribute_value).dtype.kind not in "iuf":
+                packing_attributes_are_numerical = False
+
+        if packing_attributes_are_numerical:
+            unpacked_value = numpy.zeros([1] * netcdf_variable.ndim,dtype)
+            scale_factor = packing_attributes.get("scale_factor",1.0)
+            add_offset = packing_attributes.get("add_offset",0.0)
+            if ((len(packing_attributes) == 2) and
+                ((add_offset != 0.0) or (scale_factor != 1.0))):
+
+                unpacked_value = unpacked_value * scale_factor + add_offset
+            elif scale_factor != 1.0:
+                unpacked_value = unpacked_value * scale_factor
+            elif add_offset != 0.0:
+                unpacked_value = unpacked_value + add_offset
+            dtype = unpacked_value.dtype
+
+    return dtype
+#
+#################
+#
+# Internal sub function of extract_from_netcdf_file(). It adds the storage
+# features of a netCDF 4 variable (see return_storage_keywords_for_variable)
+# to the variable in a data object, so that a data object extracted from a
+# compressed file is written back in the same way.
+#
+def add_storage_features_to_variable(variable,netcdf_variable):
+    filters = netcdf_variable.filters()
+    if filters is not None:
+        if filters.get("zlib",False):
+            variable["compression_level"] = filters["complevel"]
+        if filters.get("shuffle",False):
+            variable["shuffle"] = True
+        elif filters.get("zlib",False):
+            variable["shuffle"] = False
+
+    chunking = netcdf_variable.chunking()
+    if (chunking != "contiguous") and (chunking is not None):
+        variable["chunk_sizes"] = list(chunking)
+
+    if netcdf_variable.endian() != "native":
+        variable["endianness"] = netcdf_variable.endian()
+#
+#######################
+#
+# Internal sub function of extract_from_netcdf_file(). It returns a
+# dictionary of the slices to be read along the dimensions that have been
+# given index or value ranges, together with a list of error messages (which
+# is empty if the variables and ranges are all valid for the file).
+#
+# An index range is a (start, stop) pair with the same meaning as for a
+# python slice, i.e. either may be None or negative, and stop is excluded. A
+# value range is an inclusive (minimum, maximum) pair of values of the
+# coordinate variable of the dimension, i.e. the 1-dimensional variable with
+# the same name, whose values must be monotonic. If the coordinate variable
+# has a units attribute, the limits may be given as datetime objects. Each
+# slice is contiguous, and is normalised so that its start and stop are
+# indexes within the dimension.
+#
+def return_slices_for_dimension_ranges(
+        netcdf_file,names_of_variables,index_ranges,value_ranges):
+
+    slices_of_dimensions = {}
+    error_messages = []
+    if names_of_variables is not None:
+        for variable_name in names_of_variables:
+            if variable_name not in netcdf_file.variables:
+                error_messages.append("there is no variable %s in the netcdf file" % variable_name)
+
+    names_of_dimensions_with_ranges = index_ranges.keys()
+    for dimension_name in value_ranges:
+        if dimension_name not in index_ranges:
+            names_of_dimensions_with_ranges.append(dimension_name)
+
+    for dimension_name in names_of_dimensions_with_ranges:
+        if dimension_name not in netcdf_file.dimensions:
+            error_messages.append("there is no dimension %s in the netcdf file" % dimension_name)
+        elif ((dimension_name in index_ranges) and
+              (dimension_name in value_ranges)):
+
+            error_messages.append("both an index range and a value range have been given for dimension %s" % dimension_name)
+        else:
+            length_of_dimension = len(netcdf_file.dimensions[dimension_name])
+            if dimension_name in index_ranges:
+                dimension_range = index_ranges[dimension_name]
+            else:
+                dimension_range = value_ranges[dimension_name]
+
+            if ((type(dimension_range) not in [list, tuple]) or
+                (len(dimension_range) != 2)):
+
+                error_messages.append("the range for dimension %s is not a (start, stop) or (minimum, maximum) pair" % dimension_name)
+
+            elif dimension_name in index_ranges:
+                if ((not isinstance(dimension_range[0],
+                                    (int, long, numpy.integer, type(None)))) or
+                    (not isinstance(dimension_range[1],
+                                    (int, long, numpy.integer, type(None))))):
+
+                    error_messages.append("the index range for dimension %s is not given by integers (or None)" % dimension_name)
+                else:
+                    start_index, stop_index, step = slice(
+                        dimension_range[0],dimension_range[1]).indices(
+                            length_of_dimension)
+                    slices_of_dimensions[dimension_name] = slice(
+                        start_index,max(start_index,stop_index))
+
+            elif ((dimension_name not in netcdf_file.variables) or
+                  (netcdf_file.variables[dimension_name].dimensions !=
+                   (dimension_name,))):
+
+                error_messages.append("dimension %s has no coordinate variable for its value range" % dimension_name)
+            else:
+                coordinate_variable = netcdf_file.variables[dimension_name]
+                coordinate_values = numpy.ma.getdata(coordinate_variable[:])
+                limits = list(dimension_range)
+                limits_are_valid = True
+                limits_index = 0
+                while limits_index < len(limits):
+                    if isinstance(limits[limits_index],datetime.datetime):
+                        if "units" not in coordinate_variable.ncattrs():
+                            limits_are_valid = False
+                            error_messages.append("the value range for dimension %s is given as datetimes but its coordinate variable has no units" % dimension_name)
+                        else:
+                            limits[limits_index] = netCDF4.date2num(
+                                limits[limits_index],
+                                coordinate_variable.getncattr("units"),
+                                getattr(coordinate_variable,"calendar",
+                                        "standard"))
+                    limits_index += 1
+
+                coordinate_differences = numpy.diff(coordinate_values)
+                if ((not numpy.all(coordinate_differences >= 0)) and
+                    (not numpy.all(coordinate_differences <= 0))):
+
+                    error_messages.append("the coordinate variable of dimension %s is not monotonic" % dimension_name)
+                elif limits_are_valid:
+                    indexes_within_range = numpy.flatnonzero(
+                        (coordinate_values >= limits[0]) &
+                        (coordinate_values <= limits[1]))
+                    if len(indexes_within_range) == 0:
+                        slices_of_dimensions[dimension_name] = slice(0,0)
+                    else:
+                        slices_of_dimensions[dimension_name] = slice(
+                            indexes_within_range[0],
+                            indexes_within_range[-1] + 1)
+
+    return slices_of_dimensions, error_messages
+#
 #######################
 #
 # Main function that extracts - and returns - a data object from a netCDF
 # file. 
 #
+# If the value of optional input argument defer_reading_values is set to
+# True, the values of the variables are not read from the file. Instead, the
+# "values" entry for each variable is a DeferredValues object, which only
+# reads the values (or a slice of them) when they are first accessed. In the
+# case of uncompressed netCDF 3 files, the values are read through a memory
+# map provided that prevent_masked_arrays is also True and that no automatic
+# scaling applies to the variable.
+#
+# If the value of optional input argument metadata_only is set to True, no
+# values are read at all and the "values" entry for each variable is None.
+# The data type of each variable is then taken from the netCDF variable
+# itself (for a packed variable, it is the data type of the unpacked values,
+# as when they are read). This is the fastest way of scanning files for their
+# metadata.
+#
+# Only the variables listed in optional input argument names_of_variables
+# are extracted, if it is given (they keep the order of the file). Optional
+# input arguments index_ranges and value_ranges are dictionaries, keyed by
+# dimension name, of the (start, stop) indexes or of the (minimum, maximum)
+# coordinate values of the part of each dimension to be extracted (see
+# return_slices_for_dimension_ranges()), e.g. {"time": (-360, None)} for the
+# last 360 times. Only those hyperslabs of the variables are then read, and
+# the lengths of the dimensions in the data object are those of the
+# hyperslabs. An empty dictionary is returned if any of the variables or
+# dimensions is not in the file, or if any of the ranges is invalid.
+#
 def extract_from_netcdf_file(
-        netcdf_file_path,verbosity_level=1,prevent_masked_arrays=False):
+        netcdf_file_path,verbosity_level=1,prevent_masked_arrays=False,
+        defer_reading_values=False,metadata_only=False,names_of_variables=None,
+        index_ranges={},value_ranges={}):
 
+    call_timer = return_call_timer("extract_from_netcdf_file")
     data_object = {}
     if not os.path.isfile(netcdf_file_path):
         if verbosity_level > 0:
             print "ERROR: %s.extract_from_netcdf_file()" % __file__
             print "  netcdf file path is invalid: %s" % netcdf_file_path
     else:
-        if verbosity_level >= 2:
-            print "Extracting contents from netcdf file %s" % netcdf_file_path
-            print "  Global attributes"
+        if call_timer is not None:
+            call_timer.start_a_phase("file_opening")
 
         netcdf_file = netCDF4.Dataset(netcdf_file_path)
-        if prevent_masked_arrays:
-            netcdf_file.set_auto_mask(False)
-
-        data_object["names_of_global_attributes"] = []
-        data_object["global_attributes"] = {}
-        for global_attribute_name in netcdf_file.ncattrs():
-            data_object["names_of_global_attributes"].append(
-                global_attribute_name)
-            data_object["global_attributes"][global_attribute_name] = {
-                "value": netcdf_file.getncattr(global_attribute_name)}
-            data_object["global_attributes"][global_attribute_name]["data_type"] = return_data_type_for_value(data_object["global_attributes"][global_attribute_name]["value"])
+        data_object = return_data_object_for_netcdf_dataset(
+            netcdf_file,netcdf_file_path,"extract_from_netcdf_file",
+            verbosity_level,prevent_masked_arrays,defer_reading_values,
+            metadata_only,names_of_variables,index_ranges,value_ranges,
+            call_timer)
 
-            if verbosity_level >= 2:
-                print "    %s" % global_attribute_name
+    if call_timer is not None:
+        call_timer.finish()
 
-        if verbosity_level >= 2:
-            print "\n  Dimensions"
+    return data_object
+#
+#######################
+#
+# Main function that extracts - and returns - a data object from the
+# contents of a netCDF file given as a string of bytes, e.g. as received from
+# a client or as returned by write_to_netcdf_bytes(). Nothing is read from or
+# written to the filesystem. The optional input arguments are as for
+# extract_from_netcdf_file(), except that the values are always read (or not
+# at all if metadata_only is True) since deferred reading needs a file. An
+# empty dictionary is returned if the bytes are not those of a netCDF file,
+# or if the installed netCDF library cannot open files in memory.
+#
+def extract_from_netcdf_bytes(
+        netcdf_bytes,verbosity_level=1,prevent_masked_arrays=False,
+        metadata_only=False,names_of_variables=None,index_ranges={},
+        value_ranges={}):
 
-        data_object["names_of_dimensions"] = []
+    call_timer = return_call_timer("extract_from_netcdf_bytes")
+    data_object = {}
+    if not getattr(netCDF4,"__has_nc_open_mem__",False):
+        if verbosity_level > 0:
+            print "ERROR: %s.extract_from_netcdf_bytes()" % __file__
+            print "  the installed netCDF library (version %s) cannot open files in memory" % netCDF4.__netcdf4libversion__
+    else:
+        if call_timer is not None:
+            call_timer.start_a_phase("file_opening")
+
+        try:
+            netcdf_file = netCDF4.Dataset("in_memory.nc",memory=netcdf_bytes)
+        except (IOError, TypeError, ValueError) as error:
+            netcdf_file = None
+            if verbosity_level > 0:
+                print "ERROR: %s.extract_from_netcdf_bytes()" % __file__
+                print "  the supplied bytes could not be opened as a netcdf file: %s" % error
+
+        if netcdf_file is not None:
+            data_object = return_data_object_for_netcdf_dataset(
+                netcdf_file,None,"extract_from_netcdf_bytes",verbosity_level,
+                prevent_masked_arrays,False,metadata_only,names_of_variables,
+                index_ranges,value_ranges,call_timer)
+
+    if call_timer is not None:
+        call_timer.finish()
+
+    return data_object
+#
+#######################
+#
+# Internal sub function of extract_from_netcdf_file() and
+# extract_from_netcdf_bytes(). It returns a data object for an open netCDF
+# dataset, which it closes. The netCDF file path is None for a dataset in
+# memory. An empty dictionary is returned if any of the variables or
+# dimension ranges is not valid for the dataset.
+#
+def return_data_object_for_netcdf_dataset(
+        netcdf_file,netcdf_file_path,name_of_calling_function,
+        verbosity_level,prevent_masked_arrays,defer_reading_values,
+        metadata_only,names_of_variables,index_ranges,value_ranges,
+        call_timer):
+
+    data_object = {}
+    if prevent_masked_arrays:
+        netcdf_file.set_auto_mask(False)
+
+    if call_timer is not None:
+        call_timer.start_a_phase("metadata_reading")
+
+    slices_of_dimensions, error_messages = return_slices_for_dimension_ranges(
+        netcdf_file,names_of_variables,index_ranges,value_ranges)
+    if error_messages != []:
+        if verbosity_level > 0:
+            print "ERROR: %s.%s()" % (__file__,name_of_calling_function)
+            for error_message in error_messages:
+                print "  %s" % error_message
+    else:
+        if verbosity_level >= 2:
+            if netcdf_file_path is None:
+                print "Extracting contents from netcdf bytes"
+            else:
+                print "Extracting contents from netcdf file %s" % netcdf_file_path
+            print "  Global attributes"
+
+        data_object["names_of_global_attributes"] = []
+        data_object["global_attributes"] = {}
+        for global_attribute_name in netcdf_file.ncattrs():
+            data_object["names_of_global_attributes"].append(
+                global_attribute_name)
+            data_object["global_attributes"][global_attribute_name] = {
+                "value": netcdf_file.getncattr(global_attribute_name)}
+            data_object["global_attributes"][global_attribute_name]["data_type"] = return_data_type_for_value(data_object["global_attributes"][global_attribute_name]["value"])
+
+            if verbosity_level >= 2:
+                print "    %s" % global_attribute_name
+
+        if verbosity_level >= 2:
+            print "\n  Dimensions"
+
+        data_object["names_of_dimensions"] = []
+        data_object["names_of_unlimited_dimensions"] = []
         data_object["dimensions"] = {}
         for dimension_name in netcdf_file.dimensions:
             data_object["names_of_dimensions"].append(dimension_name)
-            data_object["dimensions"][dimension_name] = len(
-                netcdf_file.dimensions[dimension_name])
+            if dimension_name in slices_of_dimensions:
+                data_object["dimensions"][dimension_name] = \
+                    slices_of_dimensions[dimension_name].stop - \
+                    slices_of_dimensions[dimension_name].start
+            else:
+                data_object["dimensions"][dimension_name] = len(
+                    netcdf_file.dimensions[dimension_name])
+            if netcdf_file.dimensions[dimension_name].isunlimited():
+                data_object["names_of_unlimited_dimensions"].append(
+                    dimension_name)
 
             if verbosity_level >= 2:
                 print "    %s" % dimension_name
@@ -1107,19 +3092,92 @@ def extract_from_netcdf_file(
         if verbosity_level >= 2:
             print "\n  Variables"
 
+        netcdf3_variable_layouts = {}
+        if (defer_reading_values and prevent_masked_arrays and
+            netcdf_file.data_model.startswith("NETCDF3")):
+
+            netcdf3_variable_layouts = return_netcdf3_variable_layouts(
+                netcdf_file_path)
+
         data_object["names_of_variables"] = []
         data_object["variables"] = {}
         for variable_name in netcdf_file.variables:
+            if ((names_of_variables is not None) and
+                (variable_name not in names_of_variables)):
+
+                continue
+
             if verbosity_level >= 2:
                 print "    %s" % variable_name
 
+            netcdf_variable = netcdf_file.variables[variable_name]
+            hyperslab = None
+            shape = netcdf_variable.shape
+            if not set(netcdf_variable.dimensions).isdisjoint(
+                slices_of_dimensions):
+
+                hyperslab = tuple([
+                    slices_of_dimensions.get(dimension_name,slice(None))
+                    for dimension_name in netcdf_variable.dimensions])
+                shape = tuple([
+                    data_object["dimensions"][dimension_name]
+                    for dimension_name in netcdf_variable.dimensions])
+
+            if metadata_only:
+                values = None
+            elif defer_reading_values:
+                netcdf3_variable_layout = {}
+                if ((variable_name in netcdf3_variable_layouts) and
+                    ("scale_factor" not in netcdf_variable.ncattrs()) and
+                    ("add_offset" not in netcdf_variable.ncattrs())):
+
+                    netcdf3_variable_layout = \
+                        netcdf3_variable_layouts[variable_name]
+
+                values = DeferredValues(
+                    netcdf_file_path,variable_name,shape,
+                    return_unpacked_dtype_for_netcdf_variable(
+                        netcdf_variable),
+                    prevent_masked_arrays,netcdf3_variable_layout,hyperslab)
+            else:
+                if call_timer is not None:
+                    call_timer.start_a_phase("data_transfer")
+
+                if hyperslab is None:
+                    values = netcdf_variable[:]
+                else:
+                    values = netcdf_variable[hyperslab]
+                if call_timer is not None:
+                    call_timer.start_a_phase("metadata_reading")
+
+            if call_timer is not None:
+                if isinstance(values,numpy.ndarray):
+                    call_timer.add_bytes_for_variable(
+                        variable_name,values.nbytes)
+                else:
+                    call_timer.add_bytes_for_variable(variable_name,0)
+
             data_object["names_of_variables"].append(variable_name)
             data_object["variables"][variable_name] = {
-                "values": netcdf_file.variables[variable_name][:],
+                "values": values,
                 "dimensions": [],
                 "names_of_attributes": []}
 
-            data_object["variables"][variable_name]["data_type"] = return_data_type_for_value(data_object["variables"][variable_name]["values"])
+#
+# Packed variables are described by the data type of their unpacked values,
+# as read in full
+#
+            if metadata_only or defer_reading_values:
+                unpacked_dtype = return_unpacked_dtype_for_netcdf_variable(
+                    netcdf_variable)
+                if unpacked_dtype is str:
+                    data_object["variables"][variable_name]["data_type"] = \
+                        "str"
+                else:
+                    data_object["variables"][variable_name]["data_type"] = \
+                        str(unpacked_dtype)
+            else:
+                data_object["variables"][variable_name]["data_type"] = return_data_type_for_value(data_object["variables"][variable_name]["values"])
 
             for dimension_name in netcdf_file.variables[
                 variable_name].dimensions:
@@ -1127,6 +3185,21 @@ def extract_from_netcdf_file(
                 data_object["variables"][variable_name]["dimensions"].append(
                     dimension_name)
 
+            if netcdf_file.data_model.startswith("NETCDF4"):
+                add_storage_features_to_variable(
+                    data_object["variables"][variable_name],netcdf_variable)
+#
+# Chunks may not be longer than the (fixed) dimensions of a hyperslab
+#
+                if ((hyperslab is not None) and
+                    ("chunk_sizes" in data_object["variables"][variable_name])):
+
+                    data_object["variables"][variable_name]["chunk_sizes"] = [
+                        max(1,min(chunk_size,length_of_dimension))
+                        for chunk_size, length_of_dimension in zip(
+                            data_object["variables"][variable_name][
+                                "chunk_sizes"],shape)]
+
             for attribute_name in netcdf_file.variables[variable_name].ncattrs():
                 data_object["variables"][variable_name][
                     "names_of_attributes"].append(attribute_name)
@@ -1137,85 +3210,1227 @@ def extract_from_netcdf_file(
                 if verbosity_level >= 3:
                     print "      %s" % attribute_name
 
-        netcdf_file.close()
+    netcdf_file.close()
 
     return data_object
 #
+#######################
+#
+# Main function that extracts data objects from many netCDF files, using a
+# pool of worker processes. The files are given either as a list of paths or
+# as a glob pattern string, e.g. "/archive/2017/08/*.nc". The number of
+# worker processes defaults to the number of CPUs; a value of 1 means that
+# the files are extracted one after another within the calling process. The
+# optional input arguments prevent_masked_arrays, metadata_only,
+# names_of_variables, index_ranges, and value_ranges are passed on to
+# extract_from_netcdf_file() (deferred reading is not available since the
+# data objects are returned from other processes).
+#
+# This is a generator, which yields a result for each file as soon as it has
+# been extracted, so results are not in the order of the input paths. Each
+# result is a dictionary containing the keys "netcdf_file_path",
+# "data_object", and "error_message". If extraction of a file fails, its
+# data object is an empty dictionary and the reason is given by the error
+# message, which is otherwise an empty string. No messages are shown, and a
+# bad file does not stop the remaining files from being extracted.
+#
+def extract_from_netcdf_files(
+        netcdf_file_paths,number_of_workers=None,prevent_masked_arrays=False,
+        metadata_only=False,names_of_variables=None,index_ranges={},
+        value_ranges={}):
+
+    if type(netcdf_file_paths) in [str, unicode]:
+        netcdf_file_paths = sorted(glob.glob(netcdf_file_paths))
+
+    list_of_arguments = []
+    for netcdf_file_path in netcdf_file_paths:
+        list_of_arguments.append(
+            (netcdf_file_path,prevent_masked_arrays,metadata_only,
+             names_of_variables,index_ranges,value_ranges))
+
+    if number_of_workers is None:
+        number_of_workers = multiprocessing.cpu_count()
+    number_of_workers = max(1,min(number_of_workers,len(list_of_arguments)))
+
+    if number_of_workers == 1:
+        for arguments in list_of_arguments:
+            yield return_extraction_result(arguments)
+    else:
+        pool = multiprocessing.Pool(number_of_workers)
+        try:
+            for extraction_result in pool.imap_unordered(
+                return_extraction_result,list_of_arguments):
+
+                yield extraction_result
+        finally:
+            pool.terminate()
+            pool.join()
+#
+#######################
+#
+# Internal sub function of extract_from_netcdf_files(), which is run by the
+# worker processes. It extracts a data object from a single netCDF file and
+# returns it within an extraction result dictionary, capturing any error
+# rather than showing it.
+#
+def return_extraction_result(arguments):
+    (netcdf_file_path, prevent_masked_arrays, metadata_only,
+     names_of_variables, index_ranges, value_ranges) = arguments
+    extraction_result = {
+        "netcdf_file_path": netcdf_file_path,
+        "data_object": {},
+        "error_message": ""}
+
+    if not os.path.isfile(netcdf_file_path):
+        extraction_result["error_message"] = \
+            "netcdf file path is invalid: %s" % netcdf_file_path
+    else:
+        try:
+            extraction_result["data_object"] = extract_from_netcdf_file(
+                netcdf_file_path,verbosity_level=0,
+                prevent_masked_arrays=prevent_masked_arrays,
+                metadata_only=metadata_only,
+                names_of_variables=names_of_variables,
+                index_ranges=index_ranges,value_ranges=value_ranges)
+            if extraction_result["data_object"] == {}:
+                extraction_result["error_message"] = "the variables or dimension ranges are not valid for the file"
+        except Exception:
+            extraction_result["error_message"] = \
+                traceback.format_exc().strip().splitlines()[-1]
+
+    return extraction_result
+#
+#######################
+#
+# Main function that concatenates many data objects along one of their
+# dimensions (typically time), e.g. to build a daily file from one-minute
+# files, and returns the result as a new data object. The inputs are given
+# either as a list, whose entries may be data objects or netCDF file paths
+# (or a mixture of both), or as a glob pattern string, and are concatenated
+# in the order given. They must share a structure: the same dimensions (with
+# the same lengths, apart from the one concatenated along), the same global
+# attributes, and the same variables with the same dimensions, data types,
+# and attributes. The values of the attributes must also agree, except for
+# those named in optional input argument names_of_attributes_that_may_differ
+# (e.g. ["history"]), whose values are taken from the first input. The
+# values of variables without the dimension are taken from the first input.
+#
+# The netCDF files are first scanned for their metadata only, so that the
+# values array of each concatenated variable can be allocated once at its
+# full length. It is allocated with the data type of the values as read
+# (e.g. floats for a packed variable with scale_factor and add_offset
+# attributes, rather than its packed integer type). The values of the inputs
+# are then copied into place one input at a time, so that no more than one
+# netCDF file is held in memory at once. The values arrays are masked arrays
+# if those of any of the inputs are, which is the case for netCDF files
+# unless prevent_masked_arrays is True. An empty dictionary is returned if
+# the inputs cannot be concatenated, including if the values of an input
+# do not have the shape given by its dimensions, or could only be stored in
+# the allocated array by changing them (e.g. floats, or integers too large
+# for the data type, in a data object whose data type is int32).
+#
+def concatenate_data_objects(
+        data_objects_and_paths,dimension_name,verbosity_level=1,
+        prevent_masked_arrays=False,names_of_attributes_that_may_differ=[]):
+
+    call_timer = return_call_timer("concatenate_data_objects")
+    concatenated_data_object = {}
+    error_messages = []
+
+    if type(data_objects_and_paths) in [str, unicode]:
+        data_objects_and_paths = sorted(glob.glob(data_objects_and_paths))
+
+    if call_timer is not None:
+        call_timer.start_a_phase("metadata_reading")
+
+    descriptions_of_inputs = []
+    metadata_of_inputs = []
+    for data_object_or_path in data_objects_and_paths:
+        if type(data_object_or_path) in [str, unicode]:
+            descriptions_of_inputs.append(
+                "netcdf file %s" % data_object_or_path)
+            metadata_of_inputs.append(extract_from_netcdf_file(
+                data_object_or_path,verbosity_level=0,metadata_only=True))
+            if metadata_of_inputs[-1] == {}:
+                error_messages.append("%s could not be read" % descriptions_of_inputs[-1])
+        else:
+            descriptions_of_inputs.append(
+                "data object %i" % len(descriptions_of_inputs))
+            metadata_of_inputs.append(data_object_or_path)
+            for variable_name in data_object_or_path.get(
+                "names_of_variables",[]):
+
+                if data_object_or_path["variables"][variable_name].get(
+                    "values") is None:
+
+                    error_messages.append("%s has no values for variable '%s'" % (descriptions_of_inputs[-1],variable_name))
+#
+    if metadata_of_inputs == []:
+        error_messages.append("no data objects or netcdf files have been given")
+    elif error_messages == []:
+        first_metadata = metadata_of_inputs[0]
+        if dimension_name not in first_metadata["dimensions"]:
+            error_messages.append("there is no dimension '%s' in %s" % (dimension_name,descriptions_of_inputs[0]))
+        else:
+            inputs_index = 1
+            while inputs_index < len(metadata_of_inputs):
+                for difference in return_differences_from_data_object_structure(
+                    first_metadata,metadata_of_inputs[inputs_index],
+                    dimension_name,names_of_attributes_that_may_differ):
+
+                    error_messages.append("%s differs from %s: %s" % (descriptions_of_inputs[inputs_index],descriptions_of_inputs[0],difference))
+                inputs_index += 1
+
+    if error_messages != []:
+        if verbosity_level > 0:
+            print "ERROR: %s.concatenate_data_objects()" % __file__
+            for error_message in error_messages:
+                print "  %s" % error_message
+#
+    else:
+        if call_timer is not None:
+            call_timer.start_a_phase("allocation")
+
+        first_metadata = metadata_of_inputs[0]
+        for key in first_metadata:
+            if key != "variables":
+                concatenated_data_object[key] = copy.deepcopy(
+                    first_metadata[key])
+
+        lengths_of_inputs = []
+        for metadata in metadata_of_inputs:
+            lengths_of_inputs.append(metadata["dimensions"][dimension_name])
+        concatenated_data_object["dimensions"][dimension_name] = \
+            sum(lengths_of_inputs)
+
+        names_of_concatenated_variables = []
+        masks_of_variables = {}
+        concatenated_data_object["variables"] = {}
+        for variable_name in first_metadata["names_of_variables"]:
+            variable = first_metadata["variables"][variable_name]
+            concatenated_variable = {}
+            for key in variable:
+                if key != "values":
+                    concatenated_variable[key] = copy.deepcopy(variable[key])
+            concatenated_variable["values"] = None
+
+            if dimension_name in variable["dimensions"]:
+                names_of_concatenated_variables.append(variable_name)
+                shape = []
+                for name_of_dimension in variable["dimensions"]:
+                    shape.append(concatenated_data_object["dimensions"][
+                        name_of_dimension])
+                if variable["data_type"] == "str":
+                    data_type_object = object
+                else:
+                    data_type_object = variable["data_type"]
+                concatenated_variable["values"] = numpy.empty(
+                    shape,data_type_object)
+
+            concatenated_data_object["variables"][variable_name] = \
+                concatenated_variable
+
+        if call_timer is not None:
+            call_timer.start_a_phase("data_transfer")
+
+        start_index = 0
+        inputs_index = 0
+        while inputs_index < len(metadata_of_inputs):
+            if inputs_index == 0:
+                names_of_variables = first_metadata["names_of_variables"]
+            else:
+                names_of_variables = names_of_concatenated_variables
+
+#
+# The values are read straight from each netCDF file, since its attributes
+# have already been read
+#
+            values_of_variables = {}
+            data_object_or_path = data_objects_and_paths[inputs_index]
+            if type(data_object_or_path) in [str, unicode]:
+                netcdf_file = netCDF4.Dataset(data_object_or_path)
+                if prevent_masked_arrays:
+                    netcdf_file.set_auto_mask(False)
+                for variable_name in names_of_variables:
+                    values_of_variables[variable_name] = \
+                        netcdf_file.variables[variable_name][:]
+                netcdf_file.close()
+            else:
+                for variable_name in names_of_variables:
+                    values_of_variables[variable_name] = \
+                        data_object_or_path["variables"][variable_name][
+                            "values"]
+
+            stop_index = start_index + lengths_of_inputs[inputs_index]
+            for variable_name in names_of_variables:
+                values = values_of_variables[variable_name]
+                if not isinstance(values,numpy.ndarray):
+                    values = numpy.asarray(values)
+
+                concatenated_variable = \
+                    concatenated_data_object["variables"][variable_name]
+                if variable_name not in names_of_concatenated_variables:
+                    concatenated_variable["values"] = values.copy()
+                else:
+                    hyperslab = [slice(None)] * len(
+                        concatenated_variable["dimensions"])
+                    hyperslab[concatenated_variable["dimensions"].index(
+                        dimension_name)] = slice(start_index,stop_index)
+                    hyperslab = tuple(hyperslab)
+                    expected_shape = concatenated_variable["values"][
+                        hyperslab].shape
+                    if values.shape != expected_shape:
+                        error_message = "the values of variable '%s' in %s have shape %s rather than %s" % (variable_name,descriptions_of_inputs[inputs_index],values.shape,expected_shape)
+                    elif not values_can_be_stored_unchanged(
+                        values,concatenated_variable["values"].dtype):
+
+                        error_message = "the values of variable '%s' in %s (%s) cannot be stored as %s without being changed" % (variable_name,descriptions_of_inputs[inputs_index],values.dtype,concatenated_variable["values"].dtype)
+                    else:
+                        error_message = ""
+
+                    if error_message != "":
+                        if verbosity_level > 0:
+                            print "ERROR: %s.concatenate_data_objects()" % __file__
+                            print "  %s" % error_message
+                        concatenated_data_object = {}
+                        break
+                    concatenated_variable["values"][hyperslab] = \
+                        numpy.ma.getdata(values)
+
+                    if isinstance(values,numpy.ma.MaskedArray):
+                        if variable_name not in masks_of_variables:
+                            masks_of_variables[variable_name] = numpy.zeros(
+                                concatenated_variable["values"].shape,bool)
+                        masks_of_variables[variable_name][hyperslab] = \
+                            numpy.ma.getmaskarray(values)
+
+                if call_timer is not None:
+                    call_timer.add_bytes_for_variable(
+                        variable_name,values.nbytes)
+
+            values_of_variables = None
+            if concatenated_data_object == {}:
+                break
+            start_index = stop_index
+            inputs_index += 1
+
+        if concatenated_data_object == {}:
+            masks_of_variables = {}
+        for variable_name in masks_of_variables:
+            concatenated_variable = \
+                concatenated_data_object["variables"][variable_name]
+            concatenated_variable["values"] = numpy.ma.MaskedArray(
+                concatenated_variable["values"],
+                mask=masks_of_variables[variable_name])
+
+    if call_timer is not None:
+        call_timer.finish()
+
+    return concatenated_data_object
+#
+#######################
+#
+# Internal sub function of concatenate_data_objects(). It returns True if a
+# values array can be stored in an array of the given data type without any
+# of its values being changed, and False otherwise. Casts that numpy deems
+# safe are always allowed, and casts between kinds (e.g. floats to integers)
+# never are. Otherwise the values are compared with their cast copy:
+# integers must be unchanged, and floats must be unchanged to within the
+# precision of the data type, so that e.g. float64 values may be stored as
+# float32 unless they overflow it.
+#
+def values_can_be_stored_unchanged(values,data_type_object):
+    data_type_object = numpy.dtype(data_type_object)
+    values = numpy.ma.getdata(values)
+
+    if numpy.can_cast(values.dtype,data_type_object,"safe"):
+        return True
+    elif not numpy.can_cast(values.dtype,data_type_object,"same_kind"):
+        return False
+    elif values.dtype.kind not in "biufc":
+        return False
+
+    cast_values = values.astype(data_type_object)
+    if data_type_object.kind in "fc":
+        return bool(numpy.all(
+            numpy.isclose(
+                cast_values,values,rtol=numpy.finfo(data_type_object).eps,
+                atol=0,equal_nan=True) |
+            (cast_values == values)))
+    else:
+        return bool(numpy.all(cast_values == values))
+#
+#######################
+#
+# Internal sub function of concatenate_data_objects(). It returns a list of
+# descriptions of the ways in which the metadata of a data object differs
+# from that of another, which is empty if they match. They must have the
+# same dimensions, with the same lengths apart from the one being
+# concatenated along, the same global attributes, and the same variables,
+# with the same dimensions, data types, and attributes. Attributes must have
+# the same data types and values unless they are named in
+# names_of_attributes_that_may_differ. The order of the dimensions,
+# attributes, and variables is not compared.
+#
+def return_differences_from_data_object_structure(
+        data_object,other_data_object,name_of_concatenated_dimension,
+        names_of_attributes_that_may_differ):
+
+    differences = []
+
+    if (sorted(data_object["names_of_dimensions"]) !=
+        sorted(other_data_object["names_of_dimensions"])):
+
+        differences.append("it has dimensions %s rather than %s" % (other_data_object["names_of_dimensions"],data_object["names_of_dimensions"]))
+    else:
+        for dimension_name in data_object["names_of_dimensions"]:
+            if ((dimension_name != name_of_concatenated_dimension) and
+                (data_object["dimensions"][dimension_name] !=
+                 other_data_object["dimensions"][dimension_name])):
+
+                differences.append("dimension '%s' has length %i rather than %i" % (dimension_name,other_data_object["dimensions"][dimension_name],data_object["dimensions"][dimension_name]))
+
+    differences.extend(return_differences_between_attributes(
+        data_object,other_data_object,"names_of_global_attributes",
+        data_object["global_attributes"],
+        other_data_object["global_attributes"],None,
+        names_of_attributes_that_may_differ))
+#
+    if (sorted(data_object["names_of_variables"]) !=
+        sorted(other_data_object["names_of_variables"])):
+
+        differences.append("it has variables %s rather than %s" % (other_data_object["names_of_variables"],data_object["names_of_variables"]))
+    else:
+        for variable_name in data_object["names_of_variables"]:
+            variable = data_object["variables"][variable_name]
+            other_variable = other_data_object["variables"][variable_name]
+            if list(variable["dimensions"]) != list(other_variable["dimensions"]):
+                differences.append("variable '%s' has dimensions %s rather than %s" % (variable_name,list(other_variable["dimensions"]),list(variable["dimensions"])))
+
+            if variable["data_type"] != other_variable["data_type"]:
+                differences.append("variable '%s' has data type %s rather than %s" % (variable_name,other_variable["data_type"],variable["data_type"]))
+
+            differences.extend(return_differences_between_attributes(
+                variable,other_variable,"names_of_attributes",variable,
+                other_variable,variable_name,
+                names_of_attributes_that_may_differ))
+
+    return differences
+#
+#######################
+#
+# Internal sub function of return_differences_from_data_object_structure().
+# It returns a list of descriptions of the ways in which the global
+# attributes (if the variable name is None), or the attributes of a
+# variable, differ between two data objects. The names of the attributes are
+# listed under the given key of each container, and the attributes
+# themselves are in each dictionary.
+#
+def return_differences_between_attributes(
+        container,other_container,key_of_names,attributes,other_attributes,
+        variable_name,names_of_attributes_that_may_differ):
+
+    differences = []
+    if variable_name is None:
+        description_of_attributes = "global attributes"
+        description_of_attribute = "global attribute '%s'"
+    else:
+        description_of_attributes = \
+            "attributes of variable '%s'" % variable_name
+        description_of_attribute = \
+            "attribute '%%s' of variable '%s'" % variable_name
+
+    if sorted(container[key_of_names]) != sorted(other_container[key_of_names]):
+        differences.append("the %s are %s rather than %s" % (description_of_attributes,other_container[key_of_names],container[key_of_names]))
+    else:
+        for attribute_name in container[key_of_names]:
+            if attribute_name in names_of_attributes_that_may_differ:
+                continue
+
+            attribute = attributes[attribute_name]
+            other_attribute = other_attributes[attribute_name]
+            if attribute["data_type"] != other_attribute["data_type"]:
+                differences.append("%s has data type %s rather than %s" % (description_of_attribute % attribute_name,other_attribute["data_type"],attribute["data_type"]))
+            elif not attribute_values_are_equal(
+                attribute["value"],other_attribute["value"]):
+
+                differences.append("%s has value %s rather than %s" % (description_of_attribute % attribute_name,repr(other_attribute["value"]),repr(attribute["value"])))
+
+    return differences
+#
+#######################
+#
+# Internal sub function of return_differences_between_attributes(). It
+# returns True if two attribute values (which may be numpy arrays) are equal,
+# counting NaNs as equal to each other, and False otherwise.
+#
+def attribute_values_are_equal(value,other_value):
+    if ((type(value) in [str, unicode]) and
+        (type(other_value) in [str, unicode])):
+
+        values_are_equal = (value == other_value)
+    elif numpy.shape(value) != numpy.shape(other_value):
+        values_are_equal = False
+    else:
+        value = numpy.asarray(value)
+        other_value = numpy.asarray(other_value)
+        if (value.dtype.kind in "fc") and (other_value.dtype.kind in "fc"):
+            values_are_equal = bool(numpy.all(
+                (value == other_value) |
+                (numpy.isnan(value) & numpy.isnan(other_value))))
+        else:
+            values_are_equal = bool(numpy.all(value == other_value))
+
+    return values_are_equal
+#
+#######################
+#
+# Internal sub function of extract_from_netcdf_file(). It reads the header of
+# a netCDF 3 file (in either the classic or the 64-bit offset format) and
+# returns a dictionary, whose keys are the names of the non-character
+# variables, describing where the values of each variable are stored. Each
+# entry contains the byte offset of the values, their (big-endian) numpy data
+# type, their shape, and - for record variables, whose values are interleaved
+# record by record - the number of bytes between consecutive records. An empty
+# dictionary is returned if the file is not in a format that can be read in
+# this way.
+#
+def return_netcdf3_variable_layouts(netcdf_file_path):
+    netcdf3_variable_layouts = {}
+    file_size = os.path.getsize(netcdf_file_path)
+    number_of_header_bytes = 65536
+    header_has_been_read = False
+
+    while not header_has_been_read:
+        netcdf_file = file(netcdf_file_path,"rb")
+        header_bytes = netcdf_file.read(number_of_header_bytes)
+        netcdf_file.close()
+        try:
+            netcdf3_variable_layouts = \
+                return_netcdf3_variable_layouts_from_header(header_bytes)
+            header_has_been_read = True
+        except struct.error:
+            if number_of_header_bytes >= file_size:
+                header_has_been_read = True
+            number_of_header_bytes *= 4
+
+    return netcdf3_variable_layouts
+#
+#######################
+#
+# Internal sub function of return_netcdf3_variable_layouts(), which parses
+# the header bytes of a netCDF 3 file. A struct.error is raised if the header
+# bytes are incomplete. Refer to the netCDF classic and 64-bit offset format
+# specifications for the header layout.
+#
+def return_netcdf3_variable_layouts_from_header(header_bytes):
+    netcdf3_data_types = {
+        1: numpy.dtype(">i1"), 2: numpy.dtype("S1"), 3: numpy.dtype(">i2"),
+        4: numpy.dtype(">i4"), 5: numpy.dtype(">f4"), 6: numpy.dtype(">f8")}
+    netcdf3_variable_layouts = {}
+
+    if ((header_bytes[:3] != "CDF") or
+        (header_bytes[3:4] not in ["\x01", "\x02"]) or
+        (header_bytes[4:8] == "\xff\xff\xff\xff")):
+
+        return netcdf3_variable_layouts
+#
+# A 64-bit offset file stores the offsets of the values in 8 bytes rather
+# than 4. The dimension, global attribute, and variable lists are each
+# preceded by a tag and a number of elements.
+#
+    if header_bytes[3:4] == "\x01":
+        offset_format = ">i"
+    else:
+        offset_format = ">q"
+
+    number_of_records = struct.unpack_from(">i",header_bytes,4)[0]
+    position = 8
+
+    number_of_dimensions = struct.unpack_from(">i",header_bytes,position + 4)[0]
+    position += 8
+    lengths_of_dimensions = []
+    dimensions_index = 0
+    while dimensions_index < number_of_dimensions:
+        position = return_position_after_netcdf3_name(header_bytes,position)
+        lengths_of_dimensions.append(
+            struct.unpack_from(">i",header_bytes,position)[0])
+        position += 4
+        dimensions_index += 1
+
+    position = return_position_after_netcdf3_attributes(
+        header_bytes,position,netcdf3_data_types)
+
+    number_of_variables = struct.unpack_from(">i",header_bytes,position + 4)[0]
+    position += 8
+    variables = []
+    variables_index = 0
+    while variables_index < number_of_variables:
+        name_length = struct.unpack_from(">i",header_bytes,position)[0]
+        variable = {"name": header_bytes[
+            position + 4:position + 4 + name_length].decode("utf-8")}
+        position = return_position_after_netcdf3_name(header_bytes,position)
+
+        number_of_variable_dimensions = struct.unpack_from(
+            ">i",header_bytes,position)[0]
+        variable["shape"] = []
+        for dimension_id in struct.unpack_from(
+            ">%ii" % number_of_variable_dimensions,header_bytes,position + 4):
+
+            variable["shape"].append(lengths_of_dimensions[dimension_id])
+        position += 4 + 4 * number_of_variable_dimensions
+
+        position = return_position_after_netcdf3_attributes(
+            header_bytes,position,netcdf3_data_types)
+        data_type_number = struct.unpack_from(">i",header_bytes,position)[0]
+        if data_type_number not in netcdf3_data_types:
+            raise struct.error("invalid netcdf 3 data type")
+        variable["data_type"] = netcdf3_data_types[data_type_number]
+        variable["offset"] = struct.unpack_from(
+            offset_format,header_bytes,position + 8)[0]
+        position += 8 + struct.calcsize(offset_format)
+
+        variable["is_record_variable"] = (
+            (len(variable["shape"]) > 0) and (variable["shape"][0] == 0))
+        if variable["is_record_variable"]:
+            variable["shape"][0] = number_of_records
+
+        variables.append(variable)
+        variables_index += 1
+#
+# The number of bytes per record is the sum of the (padded) sizes of the
+# record variables, except that no padding is used when there is only one
+# record variable.
+#
+    number_of_bytes_per_record = 0
+    number_of_record_variables = 0
+    for variable in variables:
+        if variable["is_record_variable"]:
+            number_of_record_variables += 1
+            variable["number_of_bytes_per_record"] = \
+                variable["data_type"].itemsize
+            for length_of_dimension in variable["shape"][1:]:
+                variable["number_of_bytes_per_record"] *= length_of_dimension
+            number_of_bytes_per_record += \
+                variable["number_of_bytes_per_record"] + \
+                (-variable["number_of_bytes_per_record"] % 4)
+
+            if number_of_record_variables == 1:
+                number_of_bytes_per_record_without_padding = \
+                    variable["number_of_bytes_per_record"]
+
+    if number_of_record_variables == 1:
+        number_of_bytes_per_record = number_of_bytes_per_record_without_padding
+
+    for variable in variables:
+        if variable["data_type"] != netcdf3_data_types[2]:
+            netcdf3_variable_layouts[variable["name"]] = {
+                "offset": variable["offset"],
+                "data_type": variable["data_type"],
+                "shape": tuple(variable["shape"]),
+                "number_of_bytes_per_record": 0}
+            if variable["is_record_variable"]:
+                netcdf3_variable_layouts[variable["name"]][
+                    "number_of_bytes_per_record"] = number_of_bytes_per_record
+
+    return netcdf3_variable_layouts
+#
+#######################
+#
+# Internal sub functions of return_netcdf3_variable_layouts_from_header(),
+# which return the position in the header bytes immediately after a name or
+# after a list of attributes, respectively. Names and attribute values are
+# padded to a multiple of 4 bytes.
+#
+def return_position_after_netcdf3_name(header_bytes,position):
+    name_length = struct.unpack_from(">i",header_bytes,position)[0]
+    return position + 4 + name_length + (-name_length % 4)
+
+def return_position_after_netcdf3_attributes(
+        header_bytes,position,netcdf3_data_types):
+
+    number_of_attributes = struct.unpack_from(">i",header_bytes,position + 4)[0]
+    position += 8
+    attributes_index = 0
+    while attributes_index < number_of_attributes:
+        position = return_position_after_netcdf3_name(header_bytes,position)
+        data_type_number, number_of_values = struct.unpack_from(
+            ">ii",header_bytes,position)
+        if data_type_number not in netcdf3_data_types:
+            raise struct.error("invalid netcdf 3 data type")
+        number_of_bytes = \
+            number_of_values * netcdf3_data_types[data_type_number].itemsize
+        position += 8 + number_of_bytes + (-number_of_bytes % 4)
+        attributes_index += 1
+
+    return position
+#
+######################################
+#
+# Class for the deferred values of a variable, which is used by
+# extract_from_netcdf_file() in place of a numpy array when the reading of
+# values is deferred. It behaves like a read-only array: it has shape, dtype,
+# ndim, and size attributes, it can be sliced - in which case only the slice
+# is read from the netCDF file - and it is converted to a numpy array (e.g. by
+# numpy.asarray) by reading all of its values, which are then kept. 
+#
+# If a netCDF 3 variable layout (see return_netcdf3_variable_layouts) is
+# supplied, the values are read through a memory map of the file, so that 
+# slicing does not copy the values and only the pages touched are read.
+# The values are then big-endian, as stored in the file. Otherwise each read
+# opens the netCDF file using the netCDF4 module.
+#
+# If a hyperslab (a tuple of contiguous slices, one for each dimension) is
+# supplied, the object stands in for only that part of the variable's
+# values, and its shape is the shape of the hyperslab. Slices of it are
+# translated into slices of the variable, so that they are still read on
+# their own.
+#
+class DeferredValues():
+    def __init__(
+            self,netcdf_file_path,variable_name,shape,dtype,
+            prevent_masked_arrays=False,netcdf3_variable_layout={},
+            hyperslab=None):
+
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.ndim = len(self.shape)
+        self.size = int(numpy.prod(self.shape))
+        self.variables = {
+            "netcdf_file_path": netcdf_file_path,
+            "variable_name": variable_name,
+            "prevent_masked_arrays": prevent_masked_arrays,
+            "netcdf3_variable_layout": netcdf3_variable_layout,
+            "hyperslab": hyperslab}
+        self.objects = {
+            "values": None,
+            "memory_mapped_values": None}
+#
+#########
+#
+# Internal function that returns a memory mapped array of the values. The
+# memory map is created on first use.
+#
+    def return_memory_mapped_values(self):
+        if self.objects["memory_mapped_values"] is None:
+            layout = self.variables["netcdf3_variable_layout"]
+            strides = None
+            if layout["number_of_bytes_per_record"] > 0:
+                strides = [layout["number_of_bytes_per_record"]]
+                number_of_bytes = layout["data_type"].itemsize
+                for length_of_dimension in reversed(layout["shape"][1:]):
+                    strides.insert(1,number_of_bytes)
+                    number_of_bytes *= length_of_dimension
+                strides = tuple(strides)
+
+            if self.size == 0:
+                self.objects["memory_mapped_values"] = numpy.zeros(
+                    layout["shape"],layout["data_type"])
+            else:
+                memory_map = numpy.memmap(
+                    self.variables["netcdf_file_path"],dtype=numpy.uint8,
+                    mode="r")
+                self.objects["memory_mapped_values"] = numpy.ndarray(
+                    layout["shape"],layout["data_type"],memory_map,
+                    layout["offset"],strides)
+
+            if self.variables["hyperslab"] is not None:
+                self.objects["memory_mapped_values"] = \
+                    self.objects["memory_mapped_values"][
+                        self.variables["hyperslab"]]
+
+        return self.objects["memory_mapped_values"]
+#
+#########
+#
+# Internal function that reads the values, or a slice of them, using the
+# netCDF4 module.
+#
+    def return_values_read_from_netcdf_file(self,key):
+        netcdf_file = netCDF4.Dataset(self.variables["netcdf_file_path"])
+        if self.variables["prevent_masked_arrays"]:
+            netcdf_file.set_auto_mask(False)
+        netcdf_variable = netcdf_file.variables[self.variables["variable_name"]]
+        if self.variables["hyperslab"] is None:
+            values = netcdf_variable[key]
+        else:
+            key_within_variable = self.return_key_within_variable(key)
+            if key_within_variable is None:
+                values = netcdf_variable[self.variables["hyperslab"]][key]
+            else:
+                values = netcdf_variable[key_within_variable]
+        netcdf_file.close()
+
+        return values
+#
+#########
+#
+# Internal function that translates a key into the hyperslab (made up of
+# integers and of slices with a positive step) into the equivalent key into
+# the whole variable. None is returned for any other key, which is then
+# applied to the hyperslab once it has been read.
+#
+    def return_key_within_variable(self,key):
+        if type(key) is not tuple:
+            key = (key,)
+
+        key_within_variable = None
+        if len(key) <= self.ndim:
+            key_within_variable = []
+            dimensions_index = 0
+            while ((dimensions_index < self.ndim) and
+                   (key_within_variable is not None)):
+
+                hyperslab_start = \
+                    self.variables["hyperslab"][dimensions_index].start or 0
+                length_of_dimension = self.shape[dimensions_index]
+                if dimensions_index >= len(key):
+                    key_within_variable.append(slice(
+                        hyperslab_start,
+                        hyperslab_start + length_of_dimension))
+
+                elif isinstance(key[dimensions_index],(int, long, numpy.integer)):
+                    index = int(key[dimensions_index])
+                    if index < 0:
+                        index += length_of_dimension
+                    if (index < 0) or (index >= length_of_dimension):
+                        key_within_variable = None
+                    else:
+                        key_within_variable.append(hyperslab_start + index)
+
+                elif ((type(key[dimensions_index]) is slice) and
+                      (key[dimensions_index].step in [None, 1])):
+
+                    start_index, stop_index, step = \
+                        key[dimensions_index].indices(length_of_dimension)
+                    key_within_variable.append(slice(
+                        hyperslab_start + start_index,
+                        hyperslab_start + max(start_index,stop_index)))
+                else:
+                    key_within_variable = None
+
+                dimensions_index += 1
+
+        if key_within_variable is not None:
+            key_within_variable = tuple(key_within_variable)
+
+        return key_within_variable
+#
+#########
+#
+# Function that returns all of the values, reading them on first use.
+#
+    def return_values(self):
+        if self.objects["values"] is None:
+            if self.variables["netcdf3_variable_layout"] != {}:
+                self.objects["values"] = self.return_memory_mapped_values()
+            else:
+                self.objects["values"] = \
+                    self.return_values_read_from_netcdf_file(slice(None))
+
+        return self.objects["values"]
+
+    def __getitem__(self,key):
+        if self.objects["values"] is not None:
+            values = self.objects["values"][key]
+        elif self.variables["netcdf3_variable_layout"] != {}:
+            values = self.return_memory_mapped_values()[key]
+        else:
+            values = self.return_values_read_from_netcdf_file(key)
+
+        return values
+
+    def __array__(self,dtype=None):
+        return numpy.asarray(self.return_values(),dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return "DeferredValues(%s, %s, shape=%s, dtype=%s)" % (
+            self.variables["netcdf_file_path"],
+            self.variables["variable_name"],self.shape,self.dtype)
+#
+######################################
+#
+# Class for the values of a variable whose array has not yet been allocated,
+# which is used by return_data_object_for_creation_plan() in place of a numpy
+# array when values_allocation is "deferred". It has shape, dtype, ndim, and
+# size attributes. Reading it - by slicing, or by converting it to a numpy
+# array - before it has been written to gives the fill value (zero if there
+# is none) without allocating the array, since the values read are a
+# read-only broadcast of a single value. The array is allocated, already
+# filled, when the values are first written to, i.e. by assigning to a slice
+# such as values[:] or values[index,:].
+#
+class DeferredAllocationValues():
+    def __init__(self,shape,dtype,fill_value=None):
+        self.shape = tuple(shape)
+        self.dtype = numpy.dtype(dtype)
+        self.ndim = len(self.shape)
+        self.size = int(numpy.prod(self.shape))
+        if fill_value is None:
+            fill_value = numpy.zeros((),self.dtype)
+        self.variables = {
+            "fill_value": numpy.array(fill_value,self.dtype)}
+        self.objects = {
+            "values": None}
+#
+#########
+#
+# Function that returns all of the values, allocating them on first use.
+#
+    def return_values(self):
+        if self.objects["values"] is None:
+            self.objects["values"] = numpy.full(
+                self.shape,self.variables["fill_value"],self.dtype)
+
+        return self.objects["values"]
+#
+#########
+#
+# Function that returns True once the array of values has been allocated.
+#
+    def values_have_been_allocated(self):
+        return self.objects["values"] is not None
+
+    def __getitem__(self,key):
+        if self.objects["values"] is not None:
+            values = self.objects["values"][key]
+        else:
+            values = numpy.broadcast_to(
+                self.variables["fill_value"],self.shape)[key]
+
+        return values
+
+    def __setitem__(self,key,values):
+        self.return_values()[key] = values
+
+    def __array__(self,dtype=None):
+        if self.objects["values"] is not None:
+            values = self.objects["values"]
+        else:
+            values = numpy.broadcast_to(
+                self.variables["fill_value"],self.shape)
+
+        return numpy.asarray(values,dtype)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __repr__(self):
+        return "DeferredAllocationValues(shape=%s, dtype=%s, allocated=%s)" % (
+            self.shape,self.dtype,self.values_have_been_allocated())
+#
 ########################################################################
 #
-# Main function - writes a data object to a netCDF file. It currently only
-# permits netCDF 3 classic files to be created. 
+# Main function - writes a data object to a netCDF file. By default a netCDF
+# 3 classic file is created; the value of optional input argument
+# netcdf_format may instead be "NETCDF3_64BIT_OFFSET", "NETCDF4_CLASSIC", or
+# "NETCDF4". In the case of the last two, the compression level, shuffle,
+# chunk sizes, and endianness of each variable are taken from the data object
+# (where they have been given in the template) - see
+# create_netcdf_file_structure(). The values of each variable are transferred
+# in slabs along its first dimension, so that any temporary copies made during
+# the transfer are limited in size.
+#
+# If the value of optional input argument write_atomically is set to True,
+# the file is written under a temporary name in the same directory, flushed
+# to the disk, and only then renamed to the given path (replacing any
+# existing file). A reader of the path therefore only ever sees a complete
+# file, even if the writing process crashes or is killed part way through,
+# in which case the temporary file is left behind (it starts with "." and
+# ends with ".tmp" so that it doesn't match "*.nc").
 #
 def write_to_netcdf_file(
-        data_object,netcdf_file_path,automatically_update_history=False):
+        data_object,netcdf_file_path,automatically_update_history=False,
+        netcdf_format="NETCDF3_CLASSIC",write_atomically=False):
 
-    no_errors_have_been_encountered = True
+    call_timer = return_call_timer("write_to_netcdf_file")
+    no_errors_have_been_encountered = check_arguments_for_writing_netcdf_file(
+        data_object,netcdf_file_path,automatically_update_history,
+        netcdf_format,write_atomically)
+#
+    if no_errors_have_been_encountered:
+        if call_timer is not None:
+            call_timer.start_a_phase("file_opening")
 
-    directory_path = os.path.dirname(netcdf_file_path)
-    if not ((directory_path == "") or os.path.isdir(directory_path)):
-        no_errors_have_been_encountered = False
-        print "ERROR: %s.write_to_netcdf_file()" % __file__
-        print "  directory part of netcdf file path (%s) is invalid" % directory_path
+        if write_atomically:
+            writing_netcdf_file_path = return_temporary_netcdf_file_path(
+                netcdf_file_path)
+        else:
+            writing_netcdf_file_path = netcdf_file_path
 
-    if not netcdf_file_path.endswith(".nc"):
-        no_errors_have_been_encountered = False
-        print "ERROR: %s.write_to_netcdf_file()" % __file__
-        print "  supplied netcdf file path does not have an 'nc' extensionvalid: %s" % netcdf_file_path
+        try:
+            netcdf_file = netCDF4.Dataset(
+                writing_netcdf_file_path,"w",format=netcdf_format)
 
-    if automatically_update_history not in [True, False]:
+            write_data_object_to_netcdf_dataset(
+                netcdf_file,data_object,automatically_update_history,
+                call_timer)
+
+            if call_timer is not None:
+                call_timer.start_a_phase("file_closing")
+
+            netcdf_file.close()
+            if write_atomically:
+                replace_netcdf_file_with_temporary_file(
+                    writing_netcdf_file_path,netcdf_file_path)
+        finally:
+            if (write_atomically and
+                os.path.isfile(writing_netcdf_file_path)):
+
+                os.remove(writing_netcdf_file_path)
+
+    if call_timer is not None:
+        call_timer.finish()
+#
+    if no_errors_have_been_encountered:
+        return 0
+    else:
+        return 1
+#
+#######################
+#
+# Main function that writes a data object to netCDF in memory, and returns
+# the contents of the resulting netCDF file as a string of bytes, e.g. to be
+# sent to a client or stored in a database. Nothing is written to the
+# filesystem. The optional input arguments are as for write_to_netcdf_file().
+# The bytes make up a netCDF file with content equivalent to that of the
+# file that write_to_netcdf_file() would write, but they need not be
+# identical to it byte for byte (e.g. the padding at the end of a netCDF 3
+# file can differ). Before version 4.7 of the netCDF library, the variables
+# of a netCDF 4 file created in memory are listed in alphabetical order when
+# it is read, rather than in the order of the data object. An empty string
+# is returned if the data object cannot be written, or if the installed
+# netCDF library cannot create files in memory (version 4.6.2 or later is
+# needed).
+#
+def write_to_netcdf_bytes(
+        data_object,automatically_update_history=False,
+        netcdf_format="NETCDF3_CLASSIC"):
+
+    call_timer = return_call_timer("write_to_netcdf_bytes")
+    netcdf_bytes = ""
+    no_errors_have_been_encountered = check_arguments_for_writing_netcdf(
+        data_object,automatically_update_history,netcdf_format,
+        "write_to_netcdf_bytes")
+
+    if not getattr(netCDF4,"__has_nc_create_mem__",False):
         no_errors_have_been_encountered = False
-        print "ERROR: %s.write_to_netcdf_file()" % __file__
-        print "  the supplied value of 'automatically_update_history' was neither True nor False"
+        print "ERROR: %s.write_to_netcdf_bytes()" % __file__
+        print "  the installed netCDF library (version %s) cannot create files in memory" % netCDF4.__netcdf4libversion__
 #
     if no_errors_have_been_encountered:
+        if call_timer is not None:
+            call_timer.start_a_phase("file_opening")
+#
+# The name is only used by the netCDF library in its messages. An initial
+# size of 0 lets the library grow its buffer as needed, so that the size of
+# a netCDF 3 file is not rounded up to the initial size
+#
         netcdf_file = netCDF4.Dataset(
-            netcdf_file_path,"w",format="NETCDF3_CLASSIC")
+            "in_memory.nc","w",format=netcdf_format,memory=0)
 
-        for dimension_name in data_object["names_of_dimensions"]:
-            dimension = netcdf_file.createDimension(
-                dimension_name,data_object["dimensions"][dimension_name])
+        write_data_object_to_netcdf_dataset(
+            netcdf_file,data_object,automatically_update_history,call_timer)
+
+        if call_timer is not None:
+            call_timer.start_a_phase("file_closing")
+
+        netcdf_bytes = netcdf_file.close().tobytes()
+
+    if call_timer is not None:
+        call_timer.finish()
+
+    return netcdf_bytes
+#
+#######################
 #
-# Create a "history" global attribute if one doesn't already exist, and 
-# update it with the current date/time for file creation.
+# Internal sub function of write_to_netcdf_file() and
+# write_to_netcdf_bytes(). It checks the netCDF format, the unlimited
+# dimensions of the data object for that format, and the value of
+# automatically_update_history, registering an error message for the named
+# calling function for each problem found (see register_a_writing_error()).
+# It returns True if they are all valid and False otherwise.
 #
-        if automatically_update_history:
-            line_break = ""
-            if "history" in data_object["names_of_global_attributes"]:
-                if ((len(data_object["global_attributes"]["history"]["value"]) > 0) and
-                    not(data_object["global_attributes"]["history"]["value"].endswith("\n"))):
-                    line_break = "\n"
-            else:
-                data_object["names_of_global_attributes"].append("history")
-                data_object["global_attributes"]["history"] = {
-                    "data_type": "str", "value": ""}
-              
-            new_history_element = \
-                "%s%s - netcdf file created on computer %s ." % (
-                    line_break,
-                    datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
-                    platform.node())
-            data_object["global_attributes"]["history"]["value"] += new_history_element
-#    
-        for attribute_name in data_object["names_of_global_attributes"]:
-            netcdf_file.setncattr(
-                attribute_name,
-                data_object["global_attributes"][attribute_name]["value"])
+def check_arguments_for_writing_netcdf(
+        data_object,automatically_update_history,netcdf_format,
+        name_of_calling_function,error_messages=None):
+
+    arguments_are_valid = True
+
+    if netcdf_format not in permissible_netcdf_formats:
+        arguments_are_valid = False
+        register_a_writing_error("the supplied netcdf format (%s) is not one of %s" % (netcdf_format,", ".join(permissible_netcdf_formats)),name_of_calling_function,error_messages)
+
+    elif not check_unlimited_dimensions_for_netcdf_format(
+        data_object,netcdf_format,name_of_calling_function,error_messages):
+
+        arguments_are_valid = False
+
+    if automatically_update_history not in [True, False]:
+        arguments_are_valid = False
+        register_a_writing_error("the supplied value of 'automatically_update_history' was neither True nor False",name_of_calling_function,error_messages)
+
+    return arguments_are_valid
 #
-        for variable_name in data_object["names_of_variables"]:
-            data_type_object = return_data_type_object(
-                data_object["variables"][variable_name]["data_type"])
-            netcdf_variable = netcdf_file.createVariable(
-                variable_name,
-                data_type_object,
-                data_object["variables"][variable_name]["dimensions"])
-
-            netcdf_variable[:] = data_object[
-                "variables"][variable_name]["values"][:]
-
-            for attribute_name in data_object["variables"][variable_name]["names_of_attributes"]:
-                netcdf_variable.setncattr(
-                    attribute_name,
-                    data_object["variables"][variable_name][attribute_name]["value"])
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and write_to_netcdf_files().
+# It checks all of the arguments of write_to_netcdf_file(), registering an
+# error message for each problem found, and returns True if they are all
+# valid and False otherwise.
+#
+def check_arguments_for_writing_netcdf_file(
+        data_object,netcdf_file_path,automatically_update_history,
+        netcdf_format,write_atomically,error_messages=None):
+
+    arguments_are_valid = check_netcdf_file_path(
+        netcdf_file_path,"write_to_netcdf_file",error_messages)
+
+    if not check_arguments_for_writing_netcdf(
+        data_object,automatically_update_history,netcdf_format,
+        "write_to_netcdf_file",error_messages):
+
+        arguments_are_valid = False
+
+    if write_atomically not in [True, False]:
+        arguments_are_valid = False
+        register_a_writing_error("the supplied value of 'write_atomically' was neither True nor False","write_to_netcdf_file",error_messages)
+
+    return arguments_are_valid
+#
+#######################
+#
+# Internal sub function of the functions that check the arguments for
+# writing netCDF. An error message is appended to error_messages if a list
+# is given, so that the caller can report it (e.g. in the status of a write
+# by write_to_netcdf_files()), and is otherwise shown for the named calling
+# function.
+#
+def register_a_writing_error(
+        error_message,name_of_calling_function,error_messages):
+
+    if error_messages is None:
+        print "ERROR: %s.%s()" % (__file__,name_of_calling_function)
+        print "  %s" % error_message
+    else:
+        error_messages.append(error_message)
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and
+# write_to_netcdf_bytes(). It writes a data object to an open netCDF dataset
+# (which is left open), updating the history global attribute first if
+# requested. The values of each variable are transferred in slabs along its
+# first dimension.
+#
+def write_data_object_to_netcdf_dataset(
+        netcdf_file,data_object,automatically_update_history,call_timer):
+
+    if automatically_update_history:
+        update_history_global_attribute(data_object)
+
+    if call_timer is not None:
+        call_timer.start_a_phase("dimension_and_variable_creation")
+
+    netcdf_variables = create_netcdf_file_structure(netcdf_file,data_object)
+
+    if call_timer is not None:
+        call_timer.start_a_phase("data_transfer")
+
+    for variable_name in data_object["names_of_variables"]:
+        values = data_object["variables"][variable_name]["values"]
+        if len(netcdf_variables[variable_name].dimensions) == 0:
+            netcdf_variables[variable_name][:] = values
+            if call_timer is not None:
+                call_timer.add_bytes_for_variable(
+                    variable_name,numpy.asarray(values).nbytes)
+        else:
+            for start_index, values_chunk in return_chunks_of_values(
+                values,maximum_number_of_bytes_per_chunk):
+
+                netcdf_variables[variable_name][
+                    start_index:start_index + len(values_chunk)] = \
+                    values_chunk
+                if call_timer is not None:
+                    call_timer.add_bytes_for_variable(
+                        variable_name,numpy.asarray(values_chunk).nbytes)
+#
+#######################
+#
+# Main function that appends the values in a data object to an existing
+# netCDF file along one of its unlimited dimensions, without rewriting any of
+# the data already in the file. The data object is normally created from the
+# same template as the file, with the length of the unlimited dimension set
+# to the number of new records. Only the variables that have the unlimited
+# dimension are written; the values of all other variables are already in the
+# file and are left unchanged, as are the global and variable attributes.
+#
+# The name of the unlimited dimension only needs to be given if the data
+# object has more than one. Before anything is written, the metadata of the
+# file is checked against the data object (see
+# return_differences_from_netcdf_file_structure()), so that records are never
+# appended to a file created from a different or modified template. The
+# function returns an exit code of 0 if the values are successfully appended
+# and 1 otherwise.
+#
+def append_to_netcdf_file(data_object,netcdf_file_path,dimension_name=None):
+    no_errors_have_been_encountered = True
+    names_of_unlimited_dimensions = data_object.get(
+        "names_of_unlimited_dimensions",[])
+
+    if not os.path.isfile(netcdf_file_path):
+        no_errors_have_been_encountered = False
+        print "ERROR: %s.append_to_netcdf_file()" % __file__
+        print "  netcdf file path is invalid: %s" % netcdf_file_path
+    elif dimension_name is None:
+        if len(names_of_unlimited_dimensions) != 1:
+            no_errors_have_been_encountered = False
+            print "ERROR: %s.append_to_netcdf_file()" % __file__
+            print "  the data object has %i unlimited dimensions, so the name of the dimension to append along must be given" % len(names_of_unlimited_dimensions)
+        else:
+            dimension_name = names_of_unlimited_dimensions[0]
+    elif dimension_name not in names_of_unlimited_dimensions:
+        no_errors_have_been_encountered = False
+        print "ERROR: %s.append_to_netcdf_file()" % __file__
+        print "  '%s' is not an unlimited dimension of the data object" % dimension_name
+#
+    if no_errors_have_been_encountered:
+        netcdf_file = netCDF4.Dataset(netcdf_file_path,"a")
+        differences = return_differences_from_netcdf_file_structure(
+            netcdf_file,data_object,dimension_name)
+        if differences != []:
+            no_errors_have_been_encountered = False
+            print "ERROR: %s.append_to_netcdf_file()" % __file__
+            print "  the metadata of the netcdf file (%s) does not match the data object" % netcdf_file_path
+            for difference in differences:
+                print "    %s" % difference
+        else:
+            start_index = len(netcdf_file.dimensions[dimension_name])
+            for variable_name in data_object["names_of_variables"]:
+                dimensions = data_object["variables"][variable_name]["dimensions"]
+                if dimension_name in dimensions:
+                    values = data_object["variables"][variable_name]["values"]
+                    netcdf_variable = netcdf_file.variables[variable_name]
+                    dimension_index = dimensions.index(dimension_name)
+                    if dimension_index == 0:
+                        for chunk_start_index, values_chunk in \
+                            return_chunks_of_values(
+                                values,maximum_number_of_bytes_per_chunk):
+
+                            netcdf_variable[
+                                start_index + chunk_start_index:
+                                start_index + chunk_start_index +
+                                len(values_chunk)] = values_chunk
+                    else:
+                        slices = [slice(None)] * len(dimensions)
+                        slices[dimension_index] = slice(
+                            start_index,
+                            start_index + numpy.shape(values)[dimension_index])
+                        netcdf_variable[tuple(slices)] = values
+
         netcdf_file.close()
 #
     if no_errors_have_been_encountered:
@@ -1225,3 +4440,768 @@ def write_to_netcdf_file(
 #
 #######################
 #
+# Internal sub function of append_to_netcdf_file(). It returns a list of
+# descriptions of the ways in which the metadata of an open netCDF file
+# differs from that of a data object, which is empty if they match. The file
+# and the data object must have the same dimensions, with the same ones
+# unlimited and the same lengths for the others, and the same variables,
+# with the same dimensions, data types, and names of attributes. The global
+# attributes of the data object must all be present in the file, which may
+# also have others (e.g. a history attribute added when it was written).
+# Attribute values are not compared, since those that depend on the
+# substitutions may legitimately differ. The values of each variable in the
+# data object that has the dimension being appended along must also have the
+# shape given by its dimensions.
+#
+def return_differences_from_netcdf_file_structure(
+        netcdf_file,data_object,name_of_appended_dimension):
+    differences = []
+    names_of_unlimited_dimensions = data_object.get(
+        "names_of_unlimited_dimensions",[])
+
+    for dimension_name in netcdf_file.dimensions:
+        if dimension_name not in data_object["dimensions"]:
+            differences.append("dimension '%s' is not in the data object" % dimension_name)
+
+    for dimension_name in data_object["names_of_dimensions"]:
+        if dimension_name not in netcdf_file.dimensions:
+            differences.append("dimension '%s' is not in the file" % dimension_name)
+        elif (netcdf_file.dimensions[dimension_name].isunlimited() !=
+              (dimension_name in names_of_unlimited_dimensions)):
+
+            differences.append("dimension '%s' is unlimited in only one of the file and the data object" % dimension_name)
+        elif ((dimension_name not in names_of_unlimited_dimensions) and
+              (len(netcdf_file.dimensions[dimension_name]) !=
+               data_object["dimensions"][dimension_name])):
+
+            differences.append("dimension '%s' has length %i in the file but %i in the data object" % (dimension_name,len(netcdf_file.dimensions[dimension_name]),data_object["dimensions"][dimension_name]))
+
+    names_of_global_attributes = netcdf_file.ncattrs()
+    for global_attribute_name in data_object["names_of_global_attributes"]:
+        if global_attribute_name not in names_of_global_attributes:
+            differences.append("global attribute '%s' is not in the file" % global_attribute_name)
+#
+    for variable_name in netcdf_file.variables:
+        if variable_name not in data_object["variables"]:
+            differences.append("variable '%s' is not in the data object" % variable_name)
+
+    for variable_name in data_object["names_of_variables"]:
+        variable = data_object["variables"][variable_name]
+        if variable_name not in netcdf_file.variables:
+            differences.append("variable '%s' is not in the file" % variable_name)
+        else:
+            netcdf_variable = netcdf_file.variables[variable_name]
+            if list(netcdf_variable.dimensions) != list(variable["dimensions"]):
+                differences.append("variable '%s' has dimensions %s in the file but %s in the data object" % (variable_name,list(netcdf_variable.dimensions),list(variable["dimensions"])))
+
+            data_type = return_data_type_for_netcdf_variable(netcdf_variable)
+            if data_type != variable["data_type"]:
+                differences.append("variable '%s' has data type %s in the file but %s in the data object" % (variable_name,data_type,variable["data_type"]))
+
+            if (sorted(netcdf_variable.ncattrs()) !=
+                sorted(variable["names_of_attributes"])):
+
+                differences.append("variable '%s' has attributes %s in the file but %s in the data object" % (variable_name,netcdf_variable.ncattrs(),variable["names_of_attributes"]))
+
+        if name_of_appended_dimension in variable["dimensions"]:
+            shape = []
+            for dimension_name in variable["dimensions"]:
+                shape.append(data_object["dimensions"].get(dimension_name))
+            if list(numpy.shape(variable["values"])) != shape:
+                    differences.append("the values of variable '%s' have shape %s rather than %s" % (variable_name,list(numpy.shape(variable["values"])),shape))
+
+    return differences
+#
+#######################
+#
+# Main function that writes many data objects to netCDF files concurrently.
+# The (data_object, path) pairs are supplied either as a sequence (which may
+# be a generator) or as a Queue.Queue, in which case pairs are taken from the
+# queue until a value of None is received. The pairs are written by a pool
+# of number_of_workers workers. At most maximum_number_of_pending_writes
+# pairs (by default, twice the number of workers) are taken on before any of
+# them have been written, so that the memory used by data objects waiting to
+# be written stays bounded however quickly they are produced.
+#
+# By default the workers are processes. Threads (use_processes=False) avoid
+# copying the data objects, but only overlap where the netCDF4 module
+# releases the global interpreter lock, and the underlying netCDF library is
+# not guaranteed to be thread-safe.
+#
+# A list of status dictionaries is returned, in the order in which the files
+# were completed. Each contains the keys "netcdf_file_path", "exit_code" (as
+# returned by write_to_netcdf_file), "seconds_taken", and "error_message",
+# which is an empty string unless the file could not be written. It then
+# holds the reasons (e.g. an invalid directory part of the path) or the
+# exception raised, including when the data object could not be passed to a
+# worker (e.g. because it could not be pickled), and the exit code is 1.
+# The workers show no messages.
+#
+def write_to_netcdf_files(
+        data_objects_and_paths,number_of_workers=4,
+        maximum_number_of_pending_writes=None,
+        automatically_update_history=False,use_processes=True,
+        netcdf_format="NETCDF3_CLASSIC",write_atomically=False):
+
+    if (hasattr(data_objects_and_paths,"get") and
+        hasattr(data_objects_and_paths,"put")):
+
+        data_objects_and_paths = iter(data_objects_and_paths.get,None)
+
+    if maximum_number_of_pending_writes is None:
+        maximum_number_of_pending_writes = 2 * number_of_workers
+    maximum_number_of_pending_writes = max(1,maximum_number_of_pending_writes)
+#
+# The status of a successful write is registered by the callback, as soon as
+# it finishes. A write that fails outside return_status_for_writing_netcdf_file
+# (e.g. because its data object cannot be pickled for a worker process) never
+# calls the callback, so its status is registered when its result is found
+# to be ready but unsuccessful.
+#
+    statuses = []
+    pending_writes = []
+
+    def register_finished_writes(maximum_number_of_remaining_writes):
+        while True:
+            remaining_writes = []
+            for netcdf_file_path, asynchronous_result in pending_writes:
+                if not asynchronous_result.ready():
+                    remaining_writes.append(
+                        (netcdf_file_path,asynchronous_result))
+                elif not asynchronous_result.successful():
+                    try:
+                        asynchronous_result.get()
+                    except Exception:
+                        statuses.append(return_status_for_failed_write(
+                            netcdf_file_path))
+
+            pending_writes[:] = remaining_writes
+            if len(pending_writes) <= maximum_number_of_remaining_writes:
+                break
+
+            pending_writes[0][1].wait(0.1)
+
+    if use_processes:
+        pool = multiprocessing.Pool(number_of_workers)
+    else:
+        pool = multiprocessing.pool.ThreadPool(number_of_workers)
+
+    try:
+        for data_object, netcdf_file_path in data_objects_and_paths:
+            register_finished_writes(maximum_number_of_pending_writes - 1)
+            try:
+                pending_writes.append((netcdf_file_path,pool.apply_async(
+                    return_status_for_writing_netcdf_file,
+                    (data_object,netcdf_file_path,
+                     automatically_update_history,netcdf_format,
+                     write_atomically),
+                    callback=statuses.append)))
+            except Exception:
+                statuses.append(return_status_for_failed_write(
+                    netcdf_file_path))
+
+        pool.close()
+        register_finished_writes(0)
+        pool.join()
+    finally:
+        pool.terminate()
+
+    return statuses
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_files(). It returns the status
+# dictionary for a write that could not be run, e.g. because its data object
+# could not be passed to a worker process, while the exception is being
+# handled.
+#
+def return_status_for_failed_write(netcdf_file_path):
+    return {
+        "netcdf_file_path": netcdf_file_path,
+        "exit_code": 1,
+        "seconds_taken": 0.0,
+        "error_message": traceback.format_exc().strip().splitlines()[-1]}
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_files(), which is run by the
+# workers. It writes a data object to a netCDF file and returns a status
+# dictionary, capturing any error rather than showing it: the arguments are
+# checked first, so that the reasons for which the file cannot be written
+# are returned in the error message instead of being shown by
+# write_to_netcdf_file(), and any exception is captured rather than raised.
+#
+def return_status_for_writing_netcdf_file(
+        data_object,netcdf_file_path,automatically_update_history,
+        netcdf_format,write_atomically):
+
+    status = {
+        "netcdf_file_path": netcdf_file_path,
+        "exit_code": 1,
+        "seconds_taken": 0.0,
+        "error_message": ""}
+
+    start_time = time.time()
+    error_messages = []
+    try:
+        if check_arguments_for_writing_netcdf_file(
+            data_object,netcdf_file_path,automatically_update_history,
+            netcdf_format,write_atomically,error_messages):
+
+            status["exit_code"] = write_to_netcdf_file(
+                data_object,netcdf_file_path,automatically_update_history,
+                netcdf_format,write_atomically)
+        else:
+            status["error_message"] = "; ".join(error_messages)
+    except Exception:
+        status["error_message"] = \
+            traceback.format_exc().strip().splitlines()[-1]
+    status["seconds_taken"] = time.time() - start_time
+
+    return status
+#
+#######################
+#
+# Upper limit on the size of the slabs in which write_to_netcdf_file()
+# transfers the values of a variable to a netCDF file.
+#
+maximum_number_of_bytes_per_chunk = 64 * 1024 * 1024
+#
+# The netCDF file formats that may be written, and the target size of the
+# chunks used for storing a (netCDF 4) variable whose chunk sizes have not
+# been given in the template.
+#
+permissible_netcdf_formats = [
+    "NETCDF3_CLASSIC", "NETCDF3_64BIT_OFFSET", "NETCDF4_CLASSIC", "NETCDF4"]
+
+target_number_of_bytes_per_storage_chunk = 1024 * 1024
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and the StreamingWriter
+# class. It creates an empty temporary file in the same directory as a
+# netCDF file path (so that it can be renamed to the path without copying)
+# and returns its path. The temporary file is given the permissions of an
+# existing file at the path, or else those of a newly created file, rather
+# than the owner-only permissions of tempfile.mkstemp(). It is created with
+# a mode of 0666, to which the operating system applies the file mode
+# creation mask of the process, so the mask never needs to be read (which
+# would mean briefly changing it, and is unsafe while other threads may be
+# creating files).
+#
+def return_temporary_netcdf_file_path(netcdf_file_path):
+    directory_path, netcdf_file_name = os.path.split(netcdf_file_path)
+
+    while True:
+        temporary_netcdf_file_path = os.path.join(
+            directory_path,".%s.%s.tmp" % (
+                netcdf_file_name,os.urandom(6).encode("hex")))
+        try:
+            file_descriptor = os.open(
+                temporary_netcdf_file_path,
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL,0666)
+        except OSError as error:
+            if error.errno == errno.EEXIST:
+                continue
+            raise
+        os.close(file_descriptor)
+        break
+
+    if os.path.isfile(netcdf_file_path):
+        os.chmod(
+            temporary_netcdf_file_path,
+            os.stat(netcdf_file_path).st_mode & 0777)
+
+    return temporary_netcdf_file_path
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and the StreamingWriter
+# class. It flushes a closed temporary netCDF file to the disk and renames it
+# to the netCDF file path, which atomically replaces any existing file (on
+# POSIX systems). The directory is then flushed too, so that the rename
+# itself survives a crash of the operating system.
+#
+def replace_netcdf_file_with_temporary_file(
+        temporary_netcdf_file_path,netcdf_file_path):
+
+    file_descriptor = os.open(temporary_netcdf_file_path,os.O_RDWR)
+    try:
+        os.fsync(file_descriptor)
+    finally:
+        os.close(file_descriptor)
+
+    os.rename(temporary_netcdf_file_path,netcdf_file_path)
+
+    if hasattr(os,"O_DIRECTORY"):
+        file_descriptor = os.open(
+            os.path.dirname(netcdf_file_path) or ".",
+            os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(file_descriptor)
+        finally:
+            os.close(file_descriptor)
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and the StreamingWriter
+# class. It checks that a netCDF file path has a valid directory part and an
+# 'nc' extension, registering an error message for the named calling
+# function if not. It returns True if the path is valid and False otherwise.
+#
+def check_netcdf_file_path(
+        netcdf_file_path,name_of_calling_function,error_messages=None):
+
+    netcdf_file_path_is_valid = True
+
+    directory_path = os.path.dirname(netcdf_file_path)
+    if not ((directory_path == "") or os.path.isdir(directory_path)):
+        netcdf_file_path_is_valid = False
+        register_a_writing_error("directory part of netcdf file path (%s) is invalid" % directory_path,name_of_calling_function,error_messages)
+
+    if not netcdf_file_path.endswith(".nc"):
+        netcdf_file_path_is_valid = False
+        register_a_writing_error("supplied netcdf file path does not have an 'nc' extensionvalid: %s" % netcdf_file_path,name_of_calling_function,error_messages)
+
+    return netcdf_file_path_is_valid
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and the StreamingWriter
+# class. It checks that the unlimited dimensions of a data object can be
+# stored in a netCDF file of the given format. A netCDF 3 file may have only
+# one unlimited dimension, which must be the first dimension of every
+# variable that uses it.
+#
+def check_unlimited_dimensions_for_netcdf_format(
+        data_object,netcdf_format,name_of_calling_function,
+        error_messages=None):
+
+    unlimited_dimensions_are_valid = True
+    names_of_unlimited_dimensions = data_object.get(
+        "names_of_unlimited_dimensions",[])
+
+    if netcdf_format.startswith("NETCDF3"):
+        if len(names_of_unlimited_dimensions) > 1:
+            unlimited_dimensions_are_valid = False
+            register_a_writing_error("a %s file may only have one unlimited dimension, not %i" % (netcdf_format,len(names_of_unlimited_dimensions)),name_of_calling_function,error_messages)
+        else:
+            for variable_name in data_object["names_of_variables"]:
+                dimensions = data_object["variables"][variable_name]["dimensions"]
+                for dimension_name in dimensions[1:]:
+                    if dimension_name in names_of_unlimited_dimensions:
+                        unlimited_dimensions_are_valid = False
+                        register_a_writing_error("unlimited dimension '%s' is not the first dimension of variable '%s', as a %s file requires" % (dimension_name,variable_name,netcdf_format),name_of_calling_function,error_messages)
+
+    return unlimited_dimensions_are_valid
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and the StreamingWriter
+# class. It creates a "history" global attribute in a data object if one
+# doesn't already exist, and updates it with the current date/time for file
+# creation.
+#
+def update_history_global_attribute(data_object):
+    line_break = ""
+    if "history" in data_object["names_of_global_attributes"]:
+        if ((len(data_object["global_attributes"]["history"]["value"]) > 0) and
+            not(data_object["global_attributes"]["history"]["value"].endswith("\n"))):
+            line_break = "\n"
+    else:
+        data_object["names_of_global_attributes"].append("history")
+        data_object["global_attributes"]["history"] = {
+            "data_type": "str", "value": ""}
+      
+    new_history_element = \
+        "%s%s - netcdf file created on computer %s ." % (
+            line_break,
+            datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%S"),
+            platform.node())
+    data_object["global_attributes"]["history"]["value"] += new_history_element
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file() and the StreamingWriter
+# class. It creates the dimensions, global attributes, variables, and
+# variable attributes of a data object within an open netCDF file, without
+# transferring any variable values. All of the metadata is defined before any
+# values are written, so that the file does not have to be switched back into
+# define mode (and its header rewritten) for each variable. It returns a
+# dictionary of the netCDF variables, whose keys are the variable names.
+#
+def create_netcdf_file_structure(netcdf_file,data_object):
+    for dimension_name in data_object["names_of_dimensions"]:
+        if dimension_name in data_object.get(
+            "names_of_unlimited_dimensions",[]):
+
+            netcdf_file.createDimension(dimension_name,None)
+        else:
+            netcdf_file.createDimension(
+                dimension_name,data_object["dimensions"][dimension_name])
+#    
+    global_attributes = collections.OrderedDict()
+    for attribute_name in data_object["names_of_global_attributes"]:
+        global_attributes[attribute_name] = \
+            data_object["global_attributes"][attribute_name]["value"]
+    netcdf_file.setncatts(global_attributes)
+#
+# The attributes are set with setncatts() rather than one at a time with
+# setncattr(), because for netCDF 3 files the netCDF4 module switches into
+# and out of define mode on every call, which rewrites the header (and moves
+# any data already in the file) for each attribute.
+#
+# Note that the netCDF4 module only allows a _FillValue attribute to be
+# defined when the variable is created.
+#
+# The storage features of a variable (see return_storage_keywords_for_variable)
+# are only used for netCDF 4 files.
+#
+    netcdf_variables = {}
+    for variable_name in data_object["names_of_variables"]:
+        data_type_object = return_data_type_object(
+            data_object["variables"][variable_name]["data_type"])
+        fill_value = None
+        if "_FillValue" in data_object["variables"][variable_name]["names_of_attributes"]:
+            fill_value = \
+                data_object["variables"][variable_name]["_FillValue"]["value"]
+
+        storage_keywords = {}
+        if netcdf_file.data_model.startswith("NETCDF4"):
+            storage_keywords = return_storage_keywords_for_variable(
+                data_object,variable_name)
+
+        netcdf_variable = netcdf_file.createVariable(
+            variable_name,
+            data_type_object,
+            data_object["variables"][variable_name]["dimensions"],
+            fill_value=fill_value,
+            **storage_keywords)
+
+        variable_attributes = collections.OrderedDict()
+        for attribute_name in data_object["variables"][variable_name]["names_of_attributes"]:
+            if attribute_name != "_FillValue":
+                variable_attributes[attribute_name] = \
+                    data_object["variables"][variable_name][attribute_name]["value"]
+        netcdf_variable.setncatts(variable_attributes)
+
+        netcdf_variables[variable_name] = netcdf_variable
+
+    return netcdf_variables
+#
+#######################
+#
+# Internal sub function of create_netcdf_file_structure(). It returns the
+# keyword arguments for the netCDF4 createVariable function that set how a
+# variable is stored in a netCDF 4 file, based on the optional storage
+# features of the variable in the data object:
+#   compression_level - zlib compression level from 0 (none) to 9
+#   shuffle           - whether the shuffle filter is applied before
+#                       compression (which is the case by default)
+#   chunk_sizes       - list of chunk lengths, one for each dimension
+#   endianness        - "native", "little", or "big"
+# A compressed variable must be stored in chunks. If its chunk sizes are not
+# given, they are chosen by return_default_chunk_sizes(). Chunks may not be
+# longer than the fixed dimensions of the variable, so chunk sizes given in
+# the template are limited to the actual lengths of those dimensions.
+#
+def return_storage_keywords_for_variable(data_object,variable_name):
+    variable = data_object["variables"][variable_name]
+    storage_keywords = {}
+
+    if variable.get("compression_level",0) > 0:
+        storage_keywords["zlib"] = True
+        storage_keywords["complevel"] = variable["compression_level"]
+        storage_keywords["shuffle"] = variable.get("shuffle",True)
+    elif "shuffle" in variable:
+        storage_keywords["shuffle"] = variable["shuffle"]
+
+    if "endianness" in variable:
+        storage_keywords["endian"] = variable["endianness"]
+
+    if len(variable["dimensions"]) > 0:
+        if "chunk_sizes" in variable:
+            storage_keywords["contiguous"] = False
+            storage_keywords["chunksizes"] = []
+            for chunk_size, dimension_name in zip(
+                variable["chunk_sizes"],variable["dimensions"]):
+
+                if dimension_name not in data_object.get(
+                    "names_of_unlimited_dimensions",[]):
+
+                    chunk_size = max(1,min(
+                        chunk_size,data_object["dimensions"][dimension_name]))
+                storage_keywords["chunksizes"].append(chunk_size)
+        elif storage_keywords.get("zlib",False):
+            shape = []
+            for dimension_name in variable["dimensions"]:
+                shape.append(data_object["dimensions"][dimension_name])
+            storage_keywords["chunksizes"] = return_default_chunk_sizes(
+                shape,return_data_type_object(variable["data_type"])().itemsize)
+
+    return storage_keywords
+#
+#######################
+#
+# Internal sub function of return_storage_keywords_for_variable(). It returns
+# default chunk sizes for a variable of a given shape, i.e. the whole variable
+# unless that is larger than the target size of a storage chunk, in which
+# case the longest chunk length is repeatedly halved until it fits.
+#
+def return_default_chunk_sizes(shape,number_of_bytes_per_value):
+    chunk_sizes = []
+    for length_of_dimension in shape:
+        chunk_sizes.append(max(1,length_of_dimension))
+
+    number_of_bytes_per_chunk = number_of_bytes_per_value * \
+        int(numpy.prod(chunk_sizes))
+    while ((number_of_bytes_per_chunk >
+            target_number_of_bytes_per_storage_chunk) and
+           (max(chunk_sizes) > 1)):
+
+        dimension_index = chunk_sizes.index(max(chunk_sizes))
+        chunk_sizes[dimension_index] = (chunk_sizes[dimension_index] + 1) // 2
+        number_of_bytes_per_chunk = number_of_bytes_per_value * \
+            int(numpy.prod(chunk_sizes))
+
+    return chunk_sizes
+#
+#######################
+#
+# Internal sub function of write_to_netcdf_file(). It is a generator that
+# splits a values array into slabs along its first dimension, each of which
+# occupies no more than the maximum number of bytes (but contains at least
+# one element of the first dimension). It yields the start index of each slab
+# together with the slab itself, which is a view rather than a copy.
+#
+def return_chunks_of_values(values,maximum_number_of_bytes):
+    if not hasattr(values,"dtype"):
+        values = numpy.asanyarray(values)
+
+    number_of_bytes_per_index = values.dtype.itemsize
+    for length_of_dimension in values.shape[1:]:
+        number_of_bytes_per_index *= length_of_dimension
+
+    number_of_indices_per_chunk = max(
+        1,maximum_number_of_bytes // max(1,number_of_bytes_per_index))
+    start_index = 0
+    while start_index < values.shape[0]:
+        yield start_index, values[
+            start_index:start_index + number_of_indices_per_chunk]
+        start_index += number_of_indices_per_chunk
+#
+######################################
+#
+# Class for writing a data object to a netCDF file one piece at a time, so
+# that the values arrays for its variables never need to be held in memory in
+# their entirety. On creation, the netCDF file is opened and its dimensions,
+# variables, and attributes are defined from the metadata of the data object.
+# The "values" entries of the data object are not used, and so may be
+# omitted. The values of each variable are then supplied in chunks, using the
+# write_values or write_chunks functions, before the file is closed using
+# the close function. The peak memory used is therefore set by the size of
+# the chunks rather than by the size of the file. For example
+#
+#   streaming_writer = module_data_object.StreamingWriter(
+#       data_object,"example_netcdf_file.nc")
+#   streaming_writer.write_chunks("time",generator_of_time_chunks)
+#   streaming_writer.close()
+#
+# or, so that the file is aborted if writing the chunks raises an exception,
+#
+#   with module_data_object.StreamingWriter(
+#       data_object,"example_netcdf_file.nc",
+#       write_atomically=True) as streaming_writer:
+#       streaming_writer.write_chunks("time",generator_of_time_chunks)
+#
+# The netCDF file format is chosen, and the file may be written atomically,
+# in the same way as for write_to_netcdf_file(); when writing atomically, the
+# file only appears at its path once it has been closed. Each function
+# returns an exit code of 0 if it succeeds and 1 otherwise. The verbosity
+# level is an optional input argument. The default value of 1 causes error
+# messages to be shown. A value of 0 means that no messages are shown.
+#
+class StreamingWriter():
+    def __init__(
+            self,data_object,netcdf_file_path,
+            automatically_update_history=False,verbosity_level=1,
+            netcdf_format="NETCDF3_CLASSIC",write_atomically=False):
+
+        self.variables = {
+            "verbosity_level": verbosity_level,
+            "netcdf_file_path": netcdf_file_path,
+            "writing_netcdf_file_path": netcdf_file_path,
+            "write_atomically": write_atomically,
+            "file_is_open": False,
+            "dimensions_of_variables": {}}
+        self.objects = {
+            "netcdf_file": None,
+            "netcdf_variables": {}}
+
+        if netcdf_format not in permissible_netcdf_formats:
+            self.show_an_error("__init__","the supplied netcdf format (%s) is not one of %s" % (netcdf_format,", ".join(permissible_netcdf_formats)))
+        elif write_atomically not in [True, False]:
+            self.show_an_error("__init__","the supplied value of 'write_atomically' was neither True nor False")
+        elif (check_netcdf_file_path(netcdf_file_path,"StreamingWriter") and
+              check_unlimited_dimensions_for_netcdf_format(
+                  data_object,netcdf_format,"StreamingWriter")):
+            if write_atomically:
+                self.variables["writing_netcdf_file_path"] = \
+                    return_temporary_netcdf_file_path(netcdf_file_path)
+
+            self.objects["netcdf_file"] = netCDF4.Dataset(
+                self.variables["writing_netcdf_file_path"],"w",
+                format=netcdf_format)
+            self.variables["file_is_open"] = True
+
+            if automatically_update_history:
+                update_history_global_attribute(data_object)
+
+            self.objects["netcdf_variables"] = create_netcdf_file_structure(
+                self.objects["netcdf_file"],data_object)
+            for variable_name in data_object["names_of_variables"]:
+                self.variables["dimensions_of_variables"][variable_name] = \
+                    list(data_object["variables"][variable_name]["dimensions"])
+#
+#########
+#
+# Internal function to show an error message
+#
+    def show_an_error(self,name_of_function,error_message):
+        if self.variables["verbosity_level"] > 0:
+            print "ERROR: %s.%s()" % (self.__class__,name_of_function)
+            print "  %s" % error_message
+#
+#########
+#
+# Function to write a chunk of the values of a variable. The chunk is placed
+# along the named dimension (the variable's first dimension by default)
+# starting at the given index, and must span the full lengths of all of the
+# variable's other dimensions. The values of a variable without dimensions
+# are written in a single call, for which the dimension name and start index
+# are ignored.
+#
+    def write_values(
+            self,variable_name,values,dimension_name=None,start_index=0):
+
+        exit_code = 1
+        if not self.variables["file_is_open"]:
+            self.show_an_error("write_values","the netcdf file is not open")
+        elif variable_name not in self.variables["dimensions_of_variables"]:
+            self.show_an_error("write_values","there is no variable '%s'" % variable_name)
+        else:
+            dimensions = self.variables["dimensions_of_variables"][variable_name]
+            netcdf_variable = self.objects["netcdf_variables"][variable_name]
+            if dimensions == []:
+                netcdf_variable[:] = values
+                exit_code = 0
+            else:
+                if dimension_name is None:
+                    dimension_name = dimensions[0]
+
+                if dimension_name not in dimensions:
+                    self.show_an_error("write_values","variable '%s' does not have a dimension '%s'" % (variable_name,dimension_name))
+                elif numpy.ndim(values) != len(dimensions):
+                    self.show_an_error("write_values","the chunk of values for variable '%s' does not have %i dimensions" % (variable_name,len(dimensions)))
+                else:
+                    dimension_index = dimensions.index(dimension_name)
+                    slices = [slice(None)] * len(dimensions)
+                    slices[dimension_index] = slice(
+                        start_index,
+                        start_index + numpy.shape(values)[dimension_index])
+                    netcdf_variable[tuple(slices)] = values
+                    exit_code = 0
+
+        return exit_code
+#
+#########
+#
+# Function to write the values of a variable from a sequence of chunks, which
+# may be supplied by a generator. The chunks are placed consecutively along
+# the named dimension (the variable's first dimension by default), starting
+# at the given index.
+#
+    def write_chunks(
+            self,variable_name,chunks,dimension_name=None,start_index=0):
+
+        exit_code = 0
+        if ((dimension_name is None) and
+            (variable_name in self.variables["dimensions_of_variables"]) and
+            (self.variables["dimensions_of_variables"][variable_name] != [])):
+
+            dimension_name = \
+                self.variables["dimensions_of_variables"][variable_name][0]
+
+        for values in chunks:
+            exit_code = self.write_values(
+                variable_name,values,dimension_name,start_index)
+            if exit_code != 0:
+                break
+
+            if dimension_name is not None:
+                start_index += numpy.shape(values)[self.variables[
+                    "dimensions_of_variables"][variable_name].index(
+                        dimension_name)]
+
+        return exit_code
+#
+#########
+#
+# Function to close the netCDF file once all of the values have been written.
+# If it is being written atomically, it is then renamed to its path.
+#
+    def close(self):
+        exit_code = 1
+        if self.variables["file_is_open"]:
+            self.objects["netcdf_file"].close()
+            self.variables["file_is_open"] = False
+            if self.variables["write_atomically"]:
+                replace_netcdf_file_with_temporary_file(
+                    self.variables["writing_netcdf_file_path"],
+                    self.variables["netcdf_file_path"])
+            exit_code = 0
+
+        return exit_code
+#
+#########
+#
+# Function to abandon the netCDF file, e.g. when the values could not all be
+# written. The file is closed and, if it is being written atomically, its
+# temporary file is removed, so nothing is left behind and any existing file
+# at the path is untouched. A file that is not being written atomically is
+# left as it is.
+#
+    def abort(self):
+        exit_code = 1
+        if self.variables["file_is_open"]:
+            self.variables["file_is_open"] = False
+            try:
+                self.objects["netcdf_file"].close()
+            finally:
+                if (self.variables["write_atomically"] and
+                    os.path.exists(self.variables["writing_netcdf_file_path"])):
+
+                    os.remove(self.variables["writing_netcdf_file_path"])
+            exit_code = 0
+
+        return exit_code
+#
+#########
+#
+# Functions that allow a StreamingWriter to be used in a with statement, which
+# closes the netCDF file if the block completes and aborts it if the block
+# raises an exception (which is not suppressed).
+#
+    def __enter__(self):
+        return self
+
+    def __exit__(self,exception_type,exception_value,exception_traceback):
+        if exception_type is None:
+            self.close()
+        else:
+            self.abort()
+
+        return False
+#
+#######################
+#
@@ -0,0 +1,1261 @@
+# module_data_object_benchmark.py
+#
+# Benchmarks for David Hooper's module_data_object. Run it from the directory
+# that contains module_data_object.py, e.g.
+#
+#   python module_data_object_benchmark.py
+#
+# Each benchmark prints the time taken per call (the best of several
+# repeats) for the code paths being compared. The exit status is 1 if the
+# concurrent creation stress test finds any failures.
+#
+import datetime, multiprocessing, numpy, os, shutil, sys, tempfile, threading, time, timeit, yaml
+import module_data_object
+#
+#########
+#
+# The example template file and a set of substitutions that are valid for it.
+#
+example_template_file_path = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "module_data_object_example_template.yaml")
+
+example_lengths_of_dimensions = {
+    "time": 280,
+    "altitude": 130}
+
+example_substitutions = {
+    "observation_date": datetime.datetime(2017,8,1),
+    "observation_year": 2017,
+    "observation_month": 8,
+    "observation_day": 1,
+    "observation_start_time": datetime.datetime(2017,8,1,0,3,53),
+    "observation_end_time": datetime.datetime(2017,8,1,23,57,3),
+    "observation_range_resolution_string": "300",
+    "observation_range_resolution_number": 2,
+    "observation_bottom_range_gate_number": 18,
+    "observation_top_range_gate_number": 147,
+    "processing_nominal_smoothing_period_minutes": 33}
+#
+#########
+#
+# Returns the best time per call (in seconds) of a function taking no input
+# arguments.
+#
+def return_seconds_per_call(function,number_of_calls,number_of_repeats=5):
+    return min(timeit.repeat(
+        function,number=number_of_calls,repeat=number_of_repeats)) / \
+        number_of_calls
+#
+#########
+#
+# Prints a comparison of the times taken by two code paths.
+#
+def show_comparison(description,reference_name,reference_seconds,
+                    candidate_name,candidate_seconds):
+    print "\n%s" % description
+    print "  %-28s %10.3f ms" % (reference_name,reference_seconds * 1000.0)
+    print "  %-28s %10.3f ms" % (candidate_name,candidate_seconds * 1000.0)
+    print "  speed-up                     %10.2f x" % (
+        reference_seconds / candidate_seconds)
+#
+#########
+#
+# Reference implementation of Creator.create_from_template, which creates a
+# data object by walking the template itself (as the module did before
+# templates were compiled into creation plans) rather than by running the
+# template's creation plan. The creation plan is checked and benchmarked
+# against it. Only the default behaviour of create_from_template is covered,
+# i.e. the values arrays are allocated and filled immediately, and values
+# buffers are not supported.
+#
+def create_from_template_by_walking_the_template(
+        creator,data_object_type,lengths_of_dimensions,substitutions={},add_fill_value=False):
+
+    creation_errors = []
+    data_object = {}
+
+    template_entry = creator.return_template_entry(data_object_type)
+    if template_entry == {}:
+        creator.register_a_creation_error("there is no template for data object type %s" % data_object_type,creation_errors)
+    else:
+        for dimension_name in template_entry["names_of_unspecified_dimensions"]:
+            if dimension_name not in lengths_of_dimensions:
+                creator.register_a_creation_error("length of dimension %s has not been specified" % dimension_name,creation_errors)
+
+        for substitution_name in template_entry["substitution_keys"]:
+            if substitution_name not in substitutions:
+                creator.register_a_creation_error("substitution %s has not been specified" % substitution_name,creation_errors)
+
+        if "bound_substitutions" in template_entry:
+            bound_substitutions = substitutions
+            substitutions = dict(template_entry["bound_substitutions"])
+            substitutions.update(bound_substitutions)
+#
+    if creation_errors == []:
+        data_object["names_of_global_attributes"] = []
+        data_object["names_of_variables"] = []
+        data_object["names_of_dimensions"] = []
+        data_object["names_of_unlimited_dimensions"] = list(template_entry["names_of_unlimited_dimensions"])
+        data_object["global_attributes"] = {}
+        data_object["variables"] = {}
+        data_object["dimensions"] = {}
+
+        for dimension_name in template_entry["names_of_dimensions"]:
+            data_object["names_of_dimensions"].append(dimension_name)
+            if dimension_name in lengths_of_dimensions:
+                data_object["dimensions"][dimension_name] = \
+                    lengths_of_dimensions[dimension_name]
+            else:
+                data_object["dimensions"][dimension_name] = template_entry["lengths_of_specified_dimensions"][dimension_name]
+#
+        number_of_global_attributes = len(template_entry["template"]["global_attributes"])
+        global_attributes_index = 0
+        while global_attributes_index < number_of_global_attributes:
+            global_attribute_name = template_entry["template"]["global_attributes"][global_attributes_index].keys()[0]
+            global_attribute = template_entry["template"]["global_attributes"][global_attributes_index][global_attribute_name]
+
+            data_object["names_of_global_attributes"].append(
+                global_attribute_name)
+            data_object["global_attributes"][global_attribute_name] = {
+                "data_type": global_attribute["data_type"], 
+                "value": return_substituted_attribute_value(creator,global_attribute_name,global_attribute,substitutions)}
+                                
+            global_attributes_index += 1
+#
+        number_of_variables = len(
+            template_entry["template"]["variables"])
+
+        variables_index = 0
+        while variables_index < number_of_variables:
+            variable_name = template_entry["template"]["variables"][variables_index].keys()[0]
+            variable = template_entry["template"]["variables"][variables_index][variable_name]
+            
+            template_locations = \
+                creator.return_template_locations_for_variable(variable)
+            data_type_property_index = template_locations[
+                "property_index_for_feature"]["data_type"]
+            dimensions_property_index = template_locations[
+                "property_index_for_feature"]["dimensions"]
+            values_property_index = template_locations[
+                "property_index_for_feature"]["values"]
+
+            data_type_object = module_data_object.return_data_type_object(
+                variable[data_type_property_index]["data_type"])
+            values_shape = []
+            for dimension_name in variable[dimensions_property_index]["dimensions"]:
+                values_shape.append(data_object["dimensions"][dimension_name])
+#
+# Note that a variable without dimensions is expected to have only one value
+#
+            if values_shape == []:
+                values_shape = [1]
+
+            data_object["names_of_variables"].append(variable_name)
+            data_object["variables"][variable_name] = {
+                "data_type": variable[data_type_property_index]["data_type"],
+                "dimensions": variable[dimensions_property_index]["dimensions"],
+                "values": numpy.zeros(values_shape,data_type_object),
+                "names_of_attributes": []}
+
+            for feature_name in creator.variables["names_of_storage_features"]:
+                if feature_name in template_locations["property_index_for_feature"]:
+                    data_object["variables"][variable_name][feature_name] = variable[template_locations["property_index_for_feature"][feature_name]][feature_name]
+
+            for attribute_name in template_locations["names_of_attributes"]:
+                data_object["variables"][variable_name][
+                    "names_of_attributes"].append(attribute_name)
+
+                property_index = template_locations[
+                    "property_index_for_attribute"][attribute_name]
+                attribute = variable[property_index][attribute_name]
+
+                data_object["variables"][variable_name][attribute_name] = {
+                    "data_type": attribute["data_type"],
+                    "value": return_substituted_attribute_value(creator,
+                        attribute_name,attribute,substitutions)}
+
+                if (add_fill_value and
+                    (attribute_name == "missing_value") and 
+                    ("_FillValue" not in template_locations["names_of_attributes"])):
+
+                    data_object["variables"][variable_name]["names_of_attributes"].append("_FillValue")
+                    data_object["variables"][variable_name]["_FillValue"] = {
+                        "data_type": attribute["data_type"],
+                        "value": return_substituted_attribute_value(creator,attribute_name,attribute,substitutions)}
+
+            if values_property_index != -1:
+                values_index = 0
+                while values_index < len(variable[values_property_index]["values"]):
+                    data_object["variables"][variable_name]["values"][values_index] = variable[values_property_index]["values"][values_index]
+                    values_index += 1
+
+            elif "missing_value" in data_object["variables"][variable_name]["names_of_attributes"]:
+
+                data_object["variables"][variable_name]["values"][:] = \
+                    data_object["variables"][variable_name]["missing_value"]["value"]
+
+            elif "_FillValue" in data_object["variables"][variable_name]["names_of_attributes"]:
+
+                data_object["variables"][variable_name]["values"][:] = \
+                    data_object["variables"][variable_name]["_FillValue"]["value"]
+
+            variables_index += 1
+
+    return data_object
+#
+#########
+#
+# Internal sub function of create_from_template_by_walking_the_template(),
+# which returns the value of an attribute after any necessary substitutions
+# have been made.
+#
+def return_substituted_attribute_value(
+        creator,attribute_name,attribute,substitutions):
+    imported_value_data_type = type(attribute["value"])
+    if imported_value_data_type in creator.variables["permissible_imported_str_data_types"]:
+        if attribute["data_type"] == "str":
+            attribute_value_template = attribute["value"].rstrip()
+            attribute_value = attribute_value_template.format(**substitutions)
+
+        else:
+            data_type_object = module_data_object.return_data_type_object(
+                attribute["data_type"])
+            substitution_key = attribute["value"][1:]
+            attribute_value = data_type_object(
+                substitutions[substitution_key])
+
+    elif imported_value_data_type == list:
+        attribute_value = module_data_object.return_array_for_list_value(
+            attribute["value"],attribute["data_type"]).copy()
+
+    else:
+        data_type_object = module_data_object.return_data_type_object(attribute["data_type"])
+        attribute_value = data_type_object(attribute["value"])
+
+    return attribute_value
+#
+#########
+#
+# Compares Creator.create_from_template, which runs the creation plan compiled
+# when the template was loaded, with the original approach of walking the
+# template on every call.
+#
+def benchmark_creation_plan(number_of_calls=200):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+
+    walking_seconds = return_seconds_per_call(
+        lambda: create_from_template_by_walking_the_template(
+            creator,data_object_type,example_lengths_of_dimensions,
+            example_substitutions),
+        number_of_calls)
+    plan_seconds = return_seconds_per_call(
+        lambda: creator.create_from_template(
+            data_object_type,example_lengths_of_dimensions,
+            example_substitutions),
+        number_of_calls)
+
+    show_comparison(
+        "Creator.create_from_template (example template)",
+        "walking the template",walking_seconds,
+        "running the creation plan",plan_seconds)
+#
+#########
+#
+# Compares Creator.create_from_template with the create_from_template
+# function of a specialized Creator, in which the substitutions that are the
+# same for a site (all but those for the date and times of the observations)
+# have been made once. The dimensions are given lengths of 1, so that the
+# times are those taken to create the metadata.
+#
+def benchmark_specialized_creator(number_of_calls=2000):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    lengths_of_dimensions = {"time": 1, "altitude": 1}
+
+    site_substitutions = {}
+    observation_substitutions = {}
+    for substitution_key in example_substitutions:
+        if (substitution_key.startswith("observation_") and
+            not substitution_key.startswith("observation_range") and
+            not substitution_key.endswith("_range_gate_number")):
+
+            observation_substitutions[substitution_key] = \
+                example_substitutions[substitution_key]
+        else:
+            site_substitutions[substitution_key] = \
+                example_substitutions[substitution_key]
+
+    specialized_creator = creator.return_specialized_creator(
+        data_object_type,site_substitutions)
+
+    creator_seconds = return_seconds_per_call(
+        lambda: creator.create_from_template(
+            data_object_type,lengths_of_dimensions,example_substitutions),
+        number_of_calls)
+    specialized_creator_seconds = return_seconds_per_call(
+        lambda: specialized_creator.create_from_template(
+            data_object_type,lengths_of_dimensions,observation_substitutions),
+        number_of_calls)
+
+    show_comparison(
+        "Creator.create_from_template (example template metadata)",
+        "all substitutions per call",creator_seconds,
+        "site substitutions bound",specialized_creator_seconds)
+#
+#########
+#
+# Returns True if two data objects have the same dimensions, attributes, and
+# values arrays of the same shape and data type (the values themselves are
+# not compared, since they have not been filled).
+#
+def data_objects_are_equal(data_object,other_data_object):
+    data_objects_are_equal = (
+        (data_object["names_of_global_attributes"] ==
+         other_data_object["names_of_global_attributes"]) and
+        (data_object["names_of_variables"] ==
+         other_data_object["names_of_variables"]) and
+        (data_object["dimensions"] == other_data_object["dimensions"]))
+
+    if data_objects_are_equal:
+        for attribute_name in data_object["names_of_global_attributes"]:
+            if not numpy.array_equal(
+                data_object["global_attributes"][attribute_name]["value"],
+                other_data_object["global_attributes"][attribute_name]["value"]):
+
+                data_objects_are_equal = False
+
+        for variable_name in data_object["names_of_variables"]:
+            variable = data_object["variables"][variable_name]
+            other_variable = other_data_object["variables"][variable_name]
+            if ((variable["names_of_attributes"] !=
+                 other_variable["names_of_attributes"]) or
+                (variable["values"].shape != other_variable["values"].shape) or
+                (variable["values"].dtype != other_variable["values"].dtype)):
+
+                data_objects_are_equal = False
+            else:
+                for attribute_name in variable["names_of_attributes"]:
+                    if not numpy.array_equal(
+                        variable[attribute_name]["value"],
+                        other_variable[attribute_name]["value"]):
+
+                        data_objects_are_equal = False
+
+    return data_objects_are_equal
+#
+#########
+#
+# Stress test of concurrent data object creation, in which many threads share
+# one Creator. Each call is made with one of a set of lengths of dimensions
+# and substitutions (e.g. for different dates), alternately with
+# create_from_template and with the reference implementation that walks the
+# template, and its data object is checked against one created beforehand in
+# a single thread. Every fifth call leaves out a substitution, so that it
+# fails while other threads' calls are succeeding. Meanwhile another thread
+# keeps reloading the template. Any data object that is wrong, any call that
+# fails when it should succeed (or vice versa), and any call that raises an
+# exception is counted as a failure. The rate of creation is compared with
+# that of a single thread. The first few failures are shown, and the list of
+# failures is returned, so that a failing stress test can fail the run.
+#
+def benchmark_concurrent_creation(
+        number_of_threads=8,number_of_calls_per_thread=300):
+
+    creator = module_data_object.Creator(verbosity_level=0)
+    data_object_type = creator.load_a_template(example_template_file_path)
+
+    list_of_arguments = []
+    days_index = 0
+    while days_index < 16:
+        substitutions = dict(example_substitutions)
+        substitutions["observation_date"] = datetime.datetime(
+            2017,8,1) + datetime.timedelta(days=days_index)
+        substitutions["observation_day"] = substitutions["observation_date"].day
+        substitutions["observation_start_time"] = \
+            substitutions["observation_date"] + datetime.timedelta(
+                seconds=days_index)
+        lengths_of_dimensions = {
+            "time": 10 + days_index,
+            "altitude": 20 + 3 * days_index}
+        list_of_arguments.append((
+            lengths_of_dimensions,substitutions,
+            creator.create_from_template(
+                data_object_type,lengths_of_dimensions,substitutions)))
+        days_index += 1
+
+    incomplete_substitutions = dict(example_substitutions)
+    del incomplete_substitutions["observation_date"]
+    failures = []
+
+    def make_calls(thread_index):
+        calls_index = 0
+        while calls_index < number_of_calls_per_thread:
+            lengths_of_dimensions, substitutions, expected_data_object = \
+                list_of_arguments[
+                    (thread_index * 7 + calls_index) % len(list_of_arguments)]
+            if calls_index % 5 == 4:
+                substitutions = incomplete_substitutions
+                expected_data_object = {}
+
+            failure = ""
+            try:
+                if calls_index % 2 == 0:
+                    data_object = creator.create_from_template(
+                        data_object_type,lengths_of_dimensions,substitutions)
+                else:
+                    data_object = create_from_template_by_walking_the_template(
+                        creator,data_object_type,lengths_of_dimensions,substitutions)
+            except Exception, error:
+                data_object = None
+                failure = "raised %s" % repr(error)
+
+            if data_object is None:
+                pass
+            elif expected_data_object == {}:
+                if data_object != {}:
+                    failure = "should have failed"
+            elif data_object == {}:
+                failure = "failed"
+            elif not data_objects_are_equal(data_object,expected_data_object):
+                failure = "returned a data object that differs"
+
+            if failure != "":
+                failures.append("thread %i call %i (lengths of dimensions %s): %s" % (thread_index,calls_index,lengths_of_dimensions,failure))
+            calls_index += 1
+
+    stop_event = threading.Event()
+
+    def keep_reloading_the_template():
+        while not stop_event.is_set():
+            creator.reload_a_template(example_template_file_path)
+
+    single_thread_start_time = time.time()
+    make_calls(0)
+    single_thread_seconds = time.time() - single_thread_start_time
+
+    reloading_thread = threading.Thread(target=keep_reloading_the_template)
+    reloading_thread.start()
+    threads = []
+    threads_index = 0
+    while threads_index < number_of_threads:
+        threads.append(threading.Thread(
+            target=make_calls,args=(threads_index,)))
+        threads_index += 1
+
+    start_time = time.time()
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        stop_event.set()
+        reloading_thread.join()
+    threads_seconds = time.time() - start_time
+
+    show_comparison(
+        "Concurrent creation with one Creator (example template, %i calls per thread)" % number_of_calls_per_thread,
+        "calls from 1 thread",
+        single_thread_seconds / number_of_calls_per_thread,
+        "calls from %i threads" % number_of_threads,
+        threads_seconds / (number_of_threads * number_of_calls_per_thread))
+    print "  %-28s %10i" % ("number of failures",len(failures))
+    for failure in failures[:5]:
+        print "    %s" % failure
+
+    return failures
+#
+#########
+#
+# Writes a netCDF file from the example template, with the given lengths of
+# dimensions, into a directory and returns its path.
+#
+def return_example_netcdf_file_path(directory_path,lengths_of_dimensions):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    data_object = creator.create_from_template(
+        data_object_type,lengths_of_dimensions,example_substitutions)
+    netcdf_file_path = os.path.join(directory_path,"example_netcdf_file.nc")
+    module_data_object.write_to_netcdf_file(data_object,netcdf_file_path)
+
+    return netcdf_file_path
+#
+#########
+#
+# Compares extract_from_netcdf_file reading all of the values with the
+# metadata only path, for a day of 10 second data from the example template.
+#
+def benchmark_metadata_only_extraction(number_of_calls=20):
+    directory_path = tempfile.mkdtemp()
+    try:
+        netcdf_file_path = return_example_netcdf_file_path(
+            directory_path,{"time": 8640, "altitude": 130})
+
+        full_seconds = return_seconds_per_call(
+            lambda: module_data_object.extract_from_netcdf_file(
+                netcdf_file_path),
+            number_of_calls)
+        metadata_only_seconds = return_seconds_per_call(
+            lambda: module_data_object.extract_from_netcdf_file(
+                netcdf_file_path,metadata_only=True),
+            number_of_calls)
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "extract_from_netcdf_file (example template, 8640 x 130)",
+        "reading all values",full_seconds,
+        "metadata only",metadata_only_seconds)
+#
+#########
+#
+# Compares extract_from_netcdf_file reading all of the values of a large
+# synthetic netCDF 3 file (a day of 10 second data for many variables) with
+# reading only the last hour, as for a quick-look plot. The times taken to
+# read the last hour of a single variable (with its coordinates), selected
+# by a value range of the time coordinate, are also shown. The file is read
+# from the operating system's page cache, so reading from the disk would
+# favour the hyperslab even more.
+#
+def benchmark_hyperslab_extraction(number_of_variables=40,number_of_calls=5):
+    directory_path = tempfile.mkdtemp()
+    try:
+        template_file_path = os.path.join(
+            directory_path,"synthetic_template.yaml")
+        file(template_file_path,"w").write(
+            return_synthetic_template_contents(number_of_variables))
+        creator = module_data_object.Creator()
+        data_object_type = creator.load_a_template(template_file_path)
+        lengths_of_dimensions = {"time": 8640, "altitude": 130}
+        data_object = creator.create_from_template(
+            data_object_type,lengths_of_dimensions,
+            {"number_of_variables": number_of_variables})
+        data_object["variables"]["time"]["values"][:] = numpy.arange(
+            lengths_of_dimensions["time"]) * 10.0
+        variables_index = 0
+        while variables_index < number_of_variables:
+            data_object["variables"]["variable_%i" % variables_index][
+                "values"][:] = numpy.random.rand(
+                    lengths_of_dimensions["time"],
+                    lengths_of_dimensions["altitude"])
+            variables_index += 1
+
+        netcdf_file_path = os.path.join(directory_path,"synthetic_file.nc")
+        module_data_object.write_to_netcdf_file(data_object,netcdf_file_path)
+        number_of_megabytes = os.path.getsize(netcdf_file_path) / 1.0e6
+
+        full_seconds = return_seconds_per_call(
+            lambda: module_data_object.extract_from_netcdf_file(
+                netcdf_file_path),
+            number_of_calls)
+        last_hour_seconds = return_seconds_per_call(
+            lambda: module_data_object.extract_from_netcdf_file(
+                netcdf_file_path,index_ranges={"time": (-360,None)}),
+            number_of_calls)
+        one_variable_seconds = return_seconds_per_call(
+            lambda: module_data_object.extract_from_netcdf_file(
+                netcdf_file_path,
+                names_of_variables=["time", "altitude", "variable_0"],
+                value_ranges={"time": (82800.0,86400.0)}),
+            number_of_calls)
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "extract_from_netcdf_file (%i variables of %i x %i values, %.0f MB)" % (
+            number_of_variables,lengths_of_dimensions["time"],
+            lengths_of_dimensions["altitude"],number_of_megabytes),
+        "reading all values",full_seconds,
+        "reading the last hour",last_hour_seconds)
+    print "  %-28s %10.3f ms" % (
+        "last hour of one variable",one_variable_seconds * 1000.0)
+#
+#########
+#
+# Compares the size of, and the rate of writing, a netCDF file from the
+# example template in netCDF 3 classic format and in netCDF 4 format, both
+# uncompressed and with zlib compression (level 4, with shuffle) declared for
+# every variable. The 2-dimensional variables are filled with smoothly
+# varying values and a block of missing data, which is more representative
+# of real data than either zeros or random noise.
+#
+def benchmark_netcdf_formats(number_of_calls=3):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    lengths_of_dimensions = {"time": 8640, "altitude": 130}
+    data_object = creator.create_from_template(
+        data_object_type,lengths_of_dimensions,example_substitutions)
+
+    time_values, altitude_values = numpy.meshgrid(
+        numpy.arange(lengths_of_dimensions["time"]),
+        numpy.arange(lengths_of_dimensions["altitude"]),indexing="ij")
+    number_of_bytes = 0
+    for variable_name in data_object["names_of_variables"]:
+        variable = data_object["variables"][variable_name]
+        if len(variable["dimensions"]) == 2:
+            variable["values"][:] = 10.0 * numpy.sin(
+                time_values / 500.0 + altitude_values / 20.0)
+            variable["values"][:, 100:] = -99999.0
+        number_of_bytes += variable["values"].nbytes
+
+    print "\nwrite_to_netcdf_file (example template, 8640 x 130, %.1f MB of values)" % (number_of_bytes / 1.0e6)
+    print "  %-28s %10s %10s %10s" % ("format","size (MB)","time (ms)","MB/s")
+    directory_path = tempfile.mkdtemp()
+    try:
+        netcdf_file_path = os.path.join(directory_path,"example_netcdf_file.nc")
+        for description, netcdf_format, compression_level in [
+            ("NETCDF3_CLASSIC", "NETCDF3_CLASSIC", 0),
+            ("NETCDF4", "NETCDF4", 0),
+            ("NETCDF4, zlib level 4", "NETCDF4", 4),
+            ("NETCDF4_CLASSIC, zlib level 4", "NETCDF4_CLASSIC", 4)]:
+
+            for variable_name in data_object["names_of_variables"]:
+                data_object["variables"][variable_name][
+                    "compression_level"] = compression_level
+
+            write_seconds = return_seconds_per_call(
+                lambda: module_data_object.write_to_netcdf_file(
+                    data_object,netcdf_file_path,netcdf_format=netcdf_format),
+                number_of_calls,1)
+            print "  %-28s %10.2f %10.1f %10.1f" % (
+                description,os.path.getsize(netcdf_file_path) / 1.0e6,
+                write_seconds * 1000.0,
+                number_of_bytes / 1.0e6 / write_seconds)
+    finally:
+        shutil.rmtree(directory_path)
+#
+#########
+#
+# Compares the ways of turning a data object into netCDF bytes to be sent
+# to a client, and back again, for a day of 10 second data from the example
+# template: going through a temporary file (writing it, reading it back and
+# deleting it), and using the netCDF library's in-memory files. The
+# temporary files are usually in the operating system's page cache, so the
+# in-memory path saves even more when the disk is busy.
+#
+def benchmark_in_memory_netcdf(number_of_calls=5):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    data_object = creator.create_from_template(
+        data_object_type,{"time": 8640, "altitude": 130},
+        example_substitutions)
+    netcdf_bytes = module_data_object.write_to_netcdf_bytes(data_object)
+
+    directory_path = tempfile.mkdtemp()
+    netcdf_file_path = os.path.join(directory_path,"example_netcdf_file.nc")
+
+    def return_bytes_through_temporary_file():
+        module_data_object.write_to_netcdf_file(data_object,netcdf_file_path)
+        netcdf_file = open(netcdf_file_path,"rb")
+        netcdf_bytes = netcdf_file.read()
+        netcdf_file.close()
+        os.remove(netcdf_file_path)
+
+        return netcdf_bytes
+
+    def return_data_object_through_temporary_file():
+        netcdf_file = open(netcdf_file_path,"wb")
+        netcdf_file.write(netcdf_bytes)
+        netcdf_file.close()
+        data_object = module_data_object.extract_from_netcdf_file(
+            netcdf_file_path)
+        os.remove(netcdf_file_path)
+
+        return data_object
+
+    try:
+        temporary_file_write_seconds = return_seconds_per_call(
+            return_bytes_through_temporary_file,number_of_calls)
+        in_memory_write_seconds = return_seconds_per_call(
+            lambda: module_data_object.write_to_netcdf_bytes(data_object),
+            number_of_calls)
+        temporary_file_extract_seconds = return_seconds_per_call(
+            return_data_object_through_temporary_file,number_of_calls)
+        in_memory_extract_seconds = return_seconds_per_call(
+            lambda: module_data_object.extract_from_netcdf_bytes(
+                netcdf_bytes),
+            number_of_calls)
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "data object to netCDF bytes (example template, 8640 x 130, %.1f MB)" % (len(netcdf_bytes) / 1.0e6),
+        "through a temporary file",temporary_file_write_seconds,
+        "write_to_netcdf_bytes",in_memory_write_seconds)
+    show_comparison(
+        "netCDF bytes to data object (example template, 8640 x 130, %.1f MB)" % (len(netcdf_bytes) / 1.0e6),
+        "through a temporary file",temporary_file_extract_seconds,
+        "extract_from_netcdf_bytes",in_memory_extract_seconds)
+#
+#########
+#
+# Compares writing a day of 10 second data from the example template and
+# then verifying the file by reading it all back (as done to catch files
+# truncated by a crash) with writing it atomically, which makes that check
+# unnecessary. The writes are then repeated in processes that are killed
+# part way through, counting how often a file is left at the path.
+#
+def benchmark_atomic_writing(number_of_calls=5,number_of_kills=5):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    data_object = creator.create_from_template(
+        data_object_type,{"time": 8640, "altitude": 130},
+        example_substitutions)
+
+    def write_and_verify(netcdf_file_path):
+        module_data_object.write_to_netcdf_file(data_object,netcdf_file_path)
+        module_data_object.extract_from_netcdf_file(
+            netcdf_file_path,prevent_masked_arrays=True)
+
+    directory_path = tempfile.mkdtemp()
+    try:
+        netcdf_file_path = os.path.join(directory_path,"example_netcdf_file.nc")
+        write_and_verify_seconds = return_seconds_per_call(
+            lambda: write_and_verify(netcdf_file_path),number_of_calls)
+        atomic_write_seconds = return_seconds_per_call(
+            lambda: module_data_object.write_to_netcdf_file(
+                data_object,netcdf_file_path,write_atomically=True),
+            number_of_calls)
+
+        numbers_of_files_left = {}
+        write_seconds = return_seconds_per_call(
+            lambda: module_data_object.write_to_netcdf_file(
+                data_object,netcdf_file_path),1,1)
+        for write_atomically in [False, True]:
+            numbers_of_files_left[write_atomically] = 0
+            kills_index = 0
+            while kills_index < number_of_kills:
+                netcdf_file_path = os.path.join(
+                    directory_path,"killed_%i_%s.nc" % (
+                        kills_index,write_atomically))
+                process = multiprocessing.Process(
+                    target=module_data_object.write_to_netcdf_file,
+                    args=(data_object,netcdf_file_path),
+                    kwargs={"write_atomically": write_atomically})
+                process.start()
+                time.sleep(write_seconds * (kills_index + 1) /
+                           (number_of_kills + 1.0))
+                process.terminate()
+                process.join()
+                if os.path.exists(netcdf_file_path):
+                    numbers_of_files_left[write_atomically] += 1
+                kills_index += 1
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "write_to_netcdf_file (example template, 8640 x 130)",
+        "write, then verify by reading",write_and_verify_seconds,
+        "write atomically",atomic_write_seconds)
+    print "  files left at the path by %i killed writes: %i (%i when written atomically)" % (
+        number_of_kills,numbers_of_files_left[False],
+        numbers_of_files_left[True])
+#
+#########
+#
+# Compares two ways of building a day of 10 second data from the example
+# template out of many short netCDF files: extracting each file and growing
+# the values arrays by repeated concatenation, which copies the day so far
+# for every file, and concatenate_data_objects, which allocates the arrays
+# once and copies each file into place. The values of a packed variable
+# (int16 with a scale_factor attribute) are also concatenated, and the
+# number of them that differ from the values written is shown, since they
+# must not be truncated to the packed integer type.
+#
+def benchmark_concatenation(number_of_files=288,number_of_calls=1):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    number_of_times_per_file = 8640 / number_of_files
+    data_object = creator.create_from_template(
+        data_object_type,{"time": number_of_times_per_file, "altitude": 130},
+        example_substitutions)
+
+    def return_data_object_by_growing_arrays(netcdf_file_paths):
+        data_object = module_data_object.extract_from_netcdf_file(
+            netcdf_file_paths[0],prevent_masked_arrays=True)
+        for netcdf_file_path in netcdf_file_paths[1:]:
+            next_data_object = module_data_object.extract_from_netcdf_file(
+                netcdf_file_path,prevent_masked_arrays=True)
+            for variable_name in data_object["names_of_variables"]:
+                variable = data_object["variables"][variable_name]
+                if "time" in variable["dimensions"]:
+                    variable["values"] = numpy.concatenate(
+                        (variable["values"],
+                         next_data_object["variables"][variable_name][
+                             "values"]),
+                        variable["dimensions"].index("time"))
+            data_object["dimensions"]["time"] += \
+                next_data_object["dimensions"]["time"]
+
+        return data_object
+
+    directory_path = tempfile.mkdtemp()
+    try:
+        netcdf_file_paths = []
+        files_index = 0
+        while files_index < number_of_files:
+            data_object["variables"]["time"]["values"][:] = numpy.arange(
+                files_index * number_of_times_per_file,
+                (files_index + 1) * number_of_times_per_file) * 10.0
+            netcdf_file_paths.append(os.path.join(
+                directory_path,"example_netcdf_file_%04i.nc" % files_index))
+            module_data_object.write_to_netcdf_file(
+                data_object,netcdf_file_paths[-1])
+            files_index += 1
+
+        growing_seconds = return_seconds_per_call(
+            lambda: return_data_object_by_growing_arrays(netcdf_file_paths),
+            number_of_calls,3)
+        concatenating_seconds = return_seconds_per_call(
+            lambda: module_data_object.concatenate_data_objects(
+                netcdf_file_paths,"time",prevent_masked_arrays=True),
+            number_of_calls,3)
+
+        packed_data_object = {
+            "dimensions": {"time": 3}, "names_of_dimensions": ["time"],
+            "names_of_unlimited_dimensions": [], "global_attributes": {},
+            "names_of_global_attributes": [], "names_of_variables": ["x"],
+            "variables": {"x": {
+                "dimensions": ["time"], "data_type": "int16",
+                "names_of_attributes": ["scale_factor"],
+                "scale_factor": {
+                    "value": numpy.float32(0.01), "data_type": "float32"},
+                "values": None}}}
+        packed_netcdf_file_paths = []
+        packed_values = []
+        files_index = 0
+        while files_index < 3:
+            packed_values.append(
+                numpy.array([1.23,2.35,3.46]) + files_index)
+            packed_data_object["variables"]["x"]["values"] = \
+                packed_values[-1]
+            packed_netcdf_file_paths.append(os.path.join(
+                directory_path,"packed_netcdf_file_%i.nc" % files_index))
+            module_data_object.write_to_netcdf_file(
+                packed_data_object,packed_netcdf_file_paths[-1])
+            files_index += 1
+        concatenated_data_object = \
+            module_data_object.concatenate_data_objects(
+                packed_netcdf_file_paths,"time",prevent_masked_arrays=True)
+        number_of_packed_values_changed = numpy.sum(~numpy.isclose(
+            concatenated_data_object["variables"]["x"]["values"],
+            numpy.concatenate(packed_values)))
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "%i files of %i x 130 to one day (example template)" % (
+            number_of_files,number_of_times_per_file),
+        "growing arrays",growing_seconds,
+        "concatenate_data_objects",concatenating_seconds)
+    print "  %-28s %10i" % (
+        "packed values changed",number_of_packed_values_changed)
+#
+#########
+#
+# Compares the two ways of keeping a netCDF file up to date as batches of
+# records arrive during a day: rebuilding the whole data object and
+# rewriting the whole file for every batch, and appending each batch along
+# an unlimited time dimension. The example template is used, with time
+# declared as its unlimited dimension.
+#
+def benchmark_appending(number_of_batches=12,number_of_records_per_batch=720):
+    directory_path = tempfile.mkdtemp()
+    try:
+        template_file_path = os.path.join(
+            directory_path,"unlimited_time_template.yaml")
+        template_file_contents = file(example_template_file_path,"r").read()
+        file(template_file_path,"w").write(template_file_contents.replace(
+            "data_object_type:",
+            "unlimited_dimensions: [time]\ndata_object_type:",1))
+
+        creator = module_data_object.Creator()
+        data_object_type = creator.load_a_template(template_file_path)
+        netcdf_file_path = os.path.join(directory_path,"example_netcdf_file.nc")
+
+        start_time = timeit.default_timer()
+        batch_index = 0
+        while batch_index < number_of_batches:
+            data_object = creator.create_from_template(
+                data_object_type,
+                {"time": (batch_index + 1) * number_of_records_per_batch,
+                 "altitude": 130},
+                example_substitutions)
+            module_data_object.write_to_netcdf_file(
+                data_object,netcdf_file_path)
+            batch_index += 1
+        rewriting_seconds = timeit.default_timer() - start_time
+
+        start_time = timeit.default_timer()
+        batch_index = 0
+        while batch_index < number_of_batches:
+            data_object = creator.create_from_template(
+                data_object_type,
+                {"time": number_of_records_per_batch, "altitude": 130},
+                example_substitutions)
+            if batch_index == 0:
+                module_data_object.write_to_netcdf_file(
+                    data_object,netcdf_file_path)
+            else:
+                module_data_object.append_to_netcdf_file(
+                    data_object,netcdf_file_path)
+            batch_index += 1
+        appending_seconds = timeit.default_timer() - start_time
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "%i batches of %i records (example template, unlimited time)" % (
+            number_of_batches,number_of_records_per_batch),
+        "rewriting the whole file",rewriting_seconds,
+        "appending each batch",appending_seconds)
+#
+#########
+#
+# Returns the contents of a synthetic template file, which resembles a large
+# multi-instrument template. It has time and altitude dimensions and the
+# given number of 2-dimensional variables, each with a typical set of
+# attributes including a multi-line comment.
+#
+def return_synthetic_template_contents(number_of_variables):
+    lines = [
+        "data_object_type: synthetic-template-%i-variables" % number_of_variables,
+        "global_attributes:",
+        "- Conventions:",
+        "    data_type: str",
+        "    value: CF-1.6",
+        "- title:",
+        "    data_type: str",
+        "    value: Synthetic template with {number_of_variables} variables",
+        "- history:",
+        "    data_type: str",
+        "    value: \"\"",
+        "variables:",
+        "- time:",
+        "    - dimensions: [time]",
+        "    - data_type: float64",
+        "    - standard_name:",
+        "        data_type: str",
+        "        value: time",
+        "    - units:",
+        "        data_type: str",
+        "        value: seconds since 1970-01-01 00:00:00 +00:00",
+        "- altitude:",
+        "    - dimensions: [altitude]",
+        "    - data_type: float32",
+        "    - standard_name:",
+        "        data_type: str",
+        "        value: altitude",
+        "    - units:",
+        "        data_type: str",
+        "        value: m"]
+
+    variables_index = 0
+    while variables_index < number_of_variables:
+        lines.extend([
+            "- variable_%i:" % variables_index,
+            "    - dimensions: [time, altitude]",
+            "    - data_type: float32",
+            "    - long_name:",
+            "        data_type: str",
+            "        value: Synthetic quantity number %i" % variables_index,
+            "    - units:",
+            "        data_type: str",
+            "        value: m s-1",
+            "    - missing_value:",
+            "        data_type: float32",
+            "        value: -99999.0",
+            "    - valid_range:",
+            "        data_type: float32",
+            "        value: [-100.0, 100.0]",
+            "    - comment:",
+            "        data_type: str",
+            "        value: |",
+            "          A synthetic variable, which is included in order to",
+            "          make the template as large as a multi-instrument one."])
+        variables_index += 1
+
+    return "\n".join(lines) + "\n"
+#
+#########
+#
+# Compares parsing a large synthetic template file with the pure python yaml
+# loader (as previously used) and with the loader now used for templates,
+# i.e. the libyaml based safe loader where it is available. The time taken by
+# Creator.load_a_template (parsing, validation, and compiling the creation
+# plan) is also shown.
+#
+def benchmark_template_loading(number_of_variables=500,number_of_calls=3):
+    directory_path = tempfile.mkdtemp()
+    try:
+        template_file_path = os.path.join(
+            directory_path,"synthetic_template.yaml")
+        template_file_contents = return_synthetic_template_contents(
+            number_of_variables)
+        file(template_file_path,"w").write(template_file_contents)
+
+        python_loader_seconds = return_seconds_per_call(
+            lambda: yaml.load(template_file_contents,Loader=yaml.Loader),
+            number_of_calls)
+        template_loader_seconds = return_seconds_per_call(
+            lambda: yaml.load(
+                template_file_contents,
+                Loader=module_data_object.template_loader_class),
+            number_of_calls)
+        load_a_template_seconds = return_seconds_per_call(
+            lambda: module_data_object.Creator().load_a_template(
+                template_file_path),
+            number_of_calls)
+    finally:
+        shutil.rmtree(directory_path)
+
+    show_comparison(
+        "yaml parsing (synthetic template, %i variables, %i kB)" % (
+            number_of_variables,len(template_file_contents) // 1024),
+        "yaml.Loader",python_loader_seconds,
+        module_data_object.template_loader_class.__name__,
+        template_loader_seconds)
+    print "  Creator.load_a_template      %10.3f ms" % (
+        load_a_template_seconds * 1000.0)
+#
+#########
+#
+# Shows how the time taken by Creator.load_a_template - i.e. parsing,
+# validating, and compiling a template - scales with the number of variables
+# in a synthetic template. The time per variable should stay roughly
+# constant, i.e. no part of loading should grow faster than the size of the
+# template.
+#
+def benchmark_template_validation(
+        numbers_of_variables=[250, 1000, 4000],number_of_calls=3):
+
+    print "\nCreator.load_a_template (synthetic templates)"
+    print "  %-28s %10s %10s" % ("number of variables","time (ms)","us/variable")
+    directory_path = tempfile.mkdtemp()
+    try:
+        for number_of_variables in numbers_of_variables:
+            template_file_path = os.path.join(
+                directory_path,"synthetic_template.yaml")
+            file(template_file_path,"w").write(
+                return_synthetic_template_contents(number_of_variables))
+
+            load_a_template_seconds = return_seconds_per_call(
+                lambda: module_data_object.Creator().load_a_template(
+                    template_file_path),
+                number_of_calls)
+
+            print "  %-28i %10.1f %10.2f" % (
+                number_of_variables,load_a_template_seconds * 1000.0,
+                load_a_template_seconds * 1.0e6 / number_of_variables)
+    finally:
+        shutil.rmtree(directory_path)
+#
+#########
+#
+# Benchmark of the template directory watcher. The example template file in
+# a watched directory is edited several times, while data objects are being
+# created from it, and the reload metrics are shown. The reload latency
+# includes the time spent waiting for the next check of the directory, so it
+# should be a little over half of the polling interval on average.
+#
+def benchmark_template_hot_reload(number_of_edits=5,polling_interval=0.1):
+    print "\nCreator.watch_a_template_directory (polling interval %.2f s)" % (
+        polling_interval)
+    directory_path = tempfile.mkdtemp()
+    creator = module_data_object.Creator()
+    try:
+        template_file_path = os.path.join(directory_path,"template.yaml")
+        template_file_contents = file(example_template_file_path).read()
+        file(template_file_path,"w").write(template_file_contents)
+        creator.watch_a_template_directory(directory_path,polling_interval)
+        data_object_type = yaml.safe_load(
+            template_file_contents)["data_object_type"]
+
+        edits_index = 0
+        while edits_index < number_of_edits:
+            time.sleep(polling_interval * (0.3 + 0.11 * edits_index))
+            file(template_file_path,"w").write(template_file_contents.replace(
+                "Altitude profiles","Altitude profiles (edit %i)" % edits_index))
+            while creator.return_template_reload_metrics()[
+                "number_of_reloads"] <= edits_index:
+
+                creator.create_from_template(
+                    data_object_type,example_lengths_of_dimensions,
+                    example_substitutions)
+
+            edits_index += 1
+    finally:
+        creator.stop_watching_template_directories()
+        shutil.rmtree(directory_path)
+
+    template_reload_metrics = creator.return_template_reload_metrics()
+    print "  %-28s %10i" % (
+        "number of reloads",template_reload_metrics["number_of_reloads"])
+    print "  %-28s %10.1f ms" % (
+        "mean reload latency",
+        template_reload_metrics["mean_reload_latency"] * 1000.0)
+    print "  %-28s %10.1f ms" % (
+        "maximum reload latency",
+        template_reload_metrics["maximum_reload_latency"] * 1000.0)
+#
+#########
+#
+# Compares the allocation of the values arrays by Creator.create_from_template
+# for a synthetic template of 2-dimensional variables with missing values,
+# as for a spectrometer. The original approach (still used when walking the
+# template) allocates an array of zeros and then fills it with the missing
+# value. The creation plan fills each array as it is allocated, or defers
+# allocating it until it is first written to.
+#
+def benchmark_values_allocation(number_of_variables=20,number_of_calls=5):
+    directory_path = tempfile.mkdtemp()
+    try:
+        template_file_path = os.path.join(
+            directory_path,"synthetic_template.yaml")
+        file(template_file_path,"w").write(
+            return_synthetic_template_contents(number_of_variables))
+        creator = module_data_object.Creator()
+        data_object_type = creator.load_a_template(template_file_path)
+    finally:
+        shutil.rmtree(directory_path)
+
+    lengths_of_dimensions = {"time": 8640, "altitude": 130}
+    substitutions = {"number_of_variables": number_of_variables}
+    walking_seconds = return_seconds_per_call(
+        lambda: create_from_template_by_walking_the_template(
+            creator,data_object_type,lengths_of_dimensions,substitutions),
+        number_of_calls)
+    immediate_seconds = return_seconds_per_call(
+        lambda: creator.create_from_template(
+            data_object_type,lengths_of_dimensions,substitutions),
+        number_of_calls)
+    deferred_seconds = return_seconds_per_call(
+        lambda: creator.create_from_template(
+            data_object_type,lengths_of_dimensions,substitutions,
+            values_allocation="deferred"),
+        number_of_calls)
+
+    show_comparison(
+        "Creator.create_from_template (%i variables of %i x %i values)" % (
+            number_of_variables,lengths_of_dimensions["time"],
+            lengths_of_dimensions["altitude"]),
+        "zeros, then missing value",walking_seconds,
+        "filled on allocation",immediate_seconds)
+    print "  %-28s %10.3f ms" % (
+        "allocation deferred",deferred_seconds * 1000.0)
+#
+#########
+#
+# Compares two ways of creating a data object for values that are already
+# held in numpy arrays: creating it and then copying the values into its
+# arrays, or passing the arrays to Creator.create_from_template as values
+# buffers, which are referenced rather than copied.
+#
+def benchmark_values_buffers(number_of_variables=20,number_of_calls=5):
+    directory_path = tempfile.mkdtemp()
+    try:
+        template_file_path = os.path.join(
+            directory_path,"synthetic_template.yaml")
+        file(template_file_path,"w").write(
+            return_synthetic_template_contents(number_of_variables))
+        creator = module_data_object.Creator()
+        data_object_type = creator.load_a_template(template_file_path)
+    finally:
+        shutil.rmtree(directory_path)
+
+    lengths_of_dimensions = {"time": 8640, "altitude": 130}
+    substitutions = {"number_of_variables": number_of_variables}
+    values_buffers = {}
+    variables_index = 0
+    while variables_index < number_of_variables:
+        values_buffers["variable_%i" % variables_index] = numpy.random.rand(
+            lengths_of_dimensions["time"],
+            lengths_of_dimensions["altitude"]).astype(numpy.float32)
+        variables_index += 1
+
+    def create_and_copy():
+        data_object = creator.create_from_template(
+            data_object_type,lengths_of_dimensions,substitutions)
+        for variable_name in values_buffers:
+            data_object["variables"][variable_name]["values"][:] = \
+                values_buffers[variable_name]
+
+    copying_seconds = return_seconds_per_call(create_and_copy,number_of_calls)
+    buffers_seconds = return_seconds_per_call(
+        lambda: creator.create_from_template(
+            data_object_type,lengths_of_dimensions,substitutions,
+            values_buffers=values_buffers),
+        number_of_calls)
+
+    show_comparison(
+        "Creator.create_from_template (%i variables of %i x %i values held)" % (
+            number_of_variables,lengths_of_dimensions["time"],
+            lengths_of_dimensions["altitude"]),
+        "creating, then copying",copying_seconds,
+        "passing values buffers",buffers_seconds)
+#
+#########
+#
+# Measures the overhead of the timing statistics on
+# Creator.create_from_template, with deferred allocation so that the call is
+# dominated by the attribute formatting (i.e. the worst case). The statistics
+# collected from one call of each of the instrumented entry points (while
+# writing and extracting an example netCDF file) are then shown.
+#
+def benchmark_timing_statistics(number_of_calls=200):
+    creator = module_data_object.Creator()
+    data_object_type = creator.load_a_template(example_template_file_path)
+    create_data_object = lambda: creator.create_from_template(
+        data_object_type,example_lengths_of_dimensions,example_substitutions,
+        values_allocation="deferred")
+
+    module_data_object.set_timing_statistics(None)
+    disabled_seconds = return_seconds_per_call(
+        create_data_object,number_of_calls)
+    timing_statistics = module_data_object.TimingStatistics()
+    module_data_object.set_timing_statistics(timing_statistics)
+    enabled_seconds = return_seconds_per_call(
+        create_data_object,number_of_calls)
+
+    show_comparison(
+        "Creator.create_from_template (deferred allocation)",
+        "timing statistics enabled",enabled_seconds,
+        "timing statistics disabled",disabled_seconds)
+
+    timing_statistics.reset()
+    directory_path = tempfile.mkdtemp()
+    try:
+        netcdf_file_path = return_example_netcdf_file_path(
+            directory_path,example_lengths_of_dimensions)
+        module_data_object.extract_from_netcdf_file(netcdf_file_path)
+    finally:
+        module_data_object.set_timing_statistics(None)
+        shutil.rmtree(directory_path)
+
+    print
+    timing_statistics.show_statistics()
+#
+#########
+#
+if __name__ == "__main__":
+    benchmark_template_loading()
+    benchmark_template_validation()
+    benchmark_template_hot_reload()
+    benchmark_creation_plan()
+    benchmark_specialized_creator()
+    concurrent_creation_failures = benchmark_concurrent_creation()
+    benchmark_values_allocation()
+    benchmark_values_buffers()
+    benchmark_timing_statistics()
+    benchmark_metadata_only_extraction()
+    benchmark_hyperslab_extraction()
+    benchmark_netcdf_formats()
+    benchmark_in_memory_netcdf()
+    benchmark_atomic_writing()
+    benchmark_concatenation()
+    benchmark_appending()
+
+    if concurrent_creation_failures != []:
+        sys.exit(1)
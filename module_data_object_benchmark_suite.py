@@ -0,0 +1,419 @@
+# module_data_object_benchmark_suite.py
+#
+# Benchmark suite for David Hooper's module_data_object, for checking whether
+# a new version regresses on a range of workloads. Run it from the directory
+# that contains module_data_object.py, e.g.
+#
+#   python module_data_object_benchmark_suite.py --output new_results.json
+#   python module_data_object_benchmark_suite.py --compare old_results.json new_results.json
+#
+# Each scenario generates a synthetic template - scaled by the number of
+# variables, the number of attributes per variable, the lengths of the
+# dimensions, and the data type of the variables - and then repeatedly loads
+# it with Creator.load_a_template, creates a data object with
+# create_from_template, fills its values, writes it with
+# write_to_netcdf_file, and extracts it again with extract_from_netcdf_file.
+# Each call is timed end-to-end and per phase by the module's
+# TimingStatistics, and the results are written to a json file so that runs
+# can be compared. Everything runs offline, in a temporary directory.
+#
+# Note that the netCDF file that is extracted has just been written, so it is
+# normally read from the operating system's page cache rather than the disk.
+#
+import argparse, collections, datetime, json, netCDF4, numpy, os, platform, shutil, sys, tempfile
+import module_data_object
+#
+#########
+#
+# The version of the results file format, which is increased whenever the
+# scenarios or the layout of the results change (runs with different versions
+# should not be compared).
+#
+results_format_version = 1
+#
+#########
+#
+# The names of the entry points timed by the suite, in the order that they
+# are called.
+#
+names_of_entry_points = [
+    "load_a_template", "create_from_template", "write_to_netcdf_file",
+    "extract_from_netcdf_file"]
+#
+#########
+#
+# The substitutions made into the synthetic templates.
+#
+synthetic_substitutions = {
+    "site_name": "Synthetic observatory",
+    "observation_date": datetime.datetime(2017,8,1)}
+#
+#########
+#
+# The scenario that all of the others are varied from, one parameter at a
+# time.
+#
+baseline_scenario = collections.OrderedDict([
+    ("number_of_variables", 20),
+    ("number_of_attributes_per_variable", 6),
+    ("lengths_of_dimensions", collections.OrderedDict([
+        ("time", 720), ("altitude", 130)])),
+    ("data_type", "float32"),
+    ("netcdf_format", "NETCDF3_CLASSIC")])
+#
+#########
+#
+# Returns the default scenarios: the baseline scenario, and scenarios in
+# which one of its parameters is scaled up or down or replaced. Each
+# scenario is named after the parameter that differs from the baseline.
+#
+def return_default_scenarios():
+    variations = [
+        ("number_of_variables", [5, 80, 320]),
+        ("number_of_attributes_per_variable", [3, 24, 96]),
+        ("time", [90, 5760, 11520]),
+        ("data_type", ["int8", "int16", "int32", "float64"]),
+        ("netcdf_format", ["NETCDF4"])]
+
+    scenarios = collections.OrderedDict()
+    scenarios["baseline"] = baseline_scenario
+    for parameter_name, parameter_values in variations:
+        for parameter_value in parameter_values:
+            scenario = json.loads(
+                json.dumps(baseline_scenario),
+                object_pairs_hook=collections.OrderedDict)
+            if parameter_name in scenario["lengths_of_dimensions"]:
+                scenario["lengths_of_dimensions"][parameter_name] = \
+                    parameter_value
+            else:
+                scenario[parameter_name] = parameter_value
+            scenarios["%s_%s" % (parameter_name,parameter_value)] = scenario
+
+    return scenarios
+#
+#########
+#
+# Returns the contents of the synthetic template file for a scenario. Every
+# variable has long_name, units, and missing_value attributes; the remaining
+# attributes alternate between str values with substitution fields and
+# numerical list values, so that both kinds of attribute are exercised.
+#
+def return_synthetic_template_contents(scenario_name,scenario):
+    data_type = scenario["data_type"]
+    if data_type.startswith("int"):
+        missing_value = "-99"
+        list_value = "[1, 2, 3, 4]"
+    else:
+        missing_value = "-99999.0"
+        list_value = "[1.0, 2.5, 5.0, 10.0]"
+
+    lines = [
+        "data_object_type: benchmark-suite-%s" % scenario_name,
+        "global_attributes:",
+        "- Conventions:",
+        "    data_type: str",
+        "    value: CF-1.6",
+        "- title:",
+        "    data_type: str",
+        "    value: Benchmark suite scenario %s at {site_name}" % scenario_name,
+        "- history:",
+        "    data_type: str",
+        "    value: \"\"",
+        "variables:",
+        "- time:",
+        "    - dimensions: [time]",
+        "    - data_type: float64",
+        "    - standard_name:",
+        "        data_type: str",
+        "        value: time",
+        "    - units:",
+        "        data_type: str",
+        "        value: seconds since {observation_date:%Y-%m-%d} 00:00:00 +00:00",
+        "- altitude:",
+        "    - dimensions: [altitude]",
+        "    - data_type: float32",
+        "    - standard_name:",
+        "        data_type: str",
+        "        value: altitude",
+        "    - units:",
+        "        data_type: str",
+        "        value: m"]
+
+    variables_index = 0
+    while variables_index < scenario["number_of_variables"]:
+        lines.extend([
+            "- variable_%i:" % variables_index,
+            "    - dimensions: [time, altitude]",
+            "    - data_type: %s" % data_type,
+            "    - long_name:",
+            "        data_type: str",
+            "        value: Synthetic quantity number %i" % variables_index,
+            "    - units:",
+            "        data_type: str",
+            "        value: m s-1",
+            "    - missing_value:",
+            "        data_type: %s" % data_type,
+            "        value: %s" % missing_value])
+
+        attributes_index = 3
+        while attributes_index < scenario["number_of_attributes_per_variable"]:
+            if attributes_index % 2 == 1:
+                lines.extend([
+                    "    - comment_%i:" % attributes_index,
+                    "        data_type: str",
+                    "        value: Measured at {site_name} on {observation_date:%%Y-%%m-%%d} (note %i)" % attributes_index])
+            else:
+                lines.extend([
+                    "    - parameter_%i:" % attributes_index,
+                    "        data_type: %s" % data_type,
+                    "        value: %s" % list_value])
+            attributes_index += 1
+
+        variables_index += 1
+
+    return "\n".join(lines) + "\n"
+#
+#########
+#
+# Fills the values of a synthetic data object with smoothly varying values of
+# the appropriate data type, as they would be by a data processing program.
+#
+def fill_synthetic_data_object(data_object):
+    lengths_of_dimensions = data_object["dimensions"]
+    data_object["variables"]["time"]["values"][:] = numpy.arange(
+        lengths_of_dimensions["time"]) * 10.0
+    data_object["variables"]["altitude"]["values"][:] = numpy.arange(
+        lengths_of_dimensions["altitude"]) * 150.0 + 1000.0
+
+    pattern = numpy.add.outer(
+        numpy.arange(lengths_of_dimensions["time"]) % 60,
+        numpy.arange(lengths_of_dimensions["altitude"]) % 60)
+    for variable_name in data_object["names_of_variables"]:
+        if variable_name.startswith("variable_"):
+            data_object["variables"][variable_name]["values"][:] = pattern
+#
+#########
+#
+# Returns a summary of the statistics of the calls of one entry point: the
+# number of calls, the minimum and median of the time per call, the median
+# time per call of each phase, and the number of bytes of values moved per
+# call.
+#
+def return_summary_of_calls(calls_statistics):
+    summary = collections.OrderedDict()
+    summary["number_of_calls"] = len(calls_statistics)
+    summary["minimum_seconds"] = min(
+        [call_statistics["seconds"] for call_statistics in calls_statistics])
+    summary["median_seconds"] = float(numpy.median(
+        [call_statistics["seconds"] for call_statistics in calls_statistics]))
+
+    summary["median_seconds_per_phase"] = collections.OrderedDict()
+    for phase_name in calls_statistics[0]["seconds_per_phase"]:
+        summary["median_seconds_per_phase"][phase_name] = float(numpy.median(
+            [call_statistics["seconds_per_phase"].get(phase_name,0.0)
+             for call_statistics in calls_statistics]))
+
+    summary["number_of_bytes_per_call"] = sum(
+        calls_statistics[0]["numbers_of_bytes_per_variable"].values())
+
+    return summary
+#
+#########
+#
+# Runs one scenario and returns its results: the scenario's parameters, the
+# size of its template file, and a summary of the calls of each entry point
+# (see return_summary_of_calls).
+#
+def return_results_for_scenario(scenario_name,scenario,number_of_repeats):
+    calls_statistics_per_entry_point = collections.OrderedDict()
+    for entry_point in names_of_entry_points:
+        calls_statistics_per_entry_point[entry_point] = []
+
+    def record_a_call(entry_point,call_statistics):
+        if entry_point in calls_statistics_per_entry_point:
+            calls_statistics_per_entry_point[entry_point].append(
+                call_statistics)
+
+    template_file_contents = return_synthetic_template_contents(
+        scenario_name,scenario)
+    directory_path = tempfile.mkdtemp()
+    try:
+        template_file_path = os.path.join(directory_path,"template.yaml")
+        netcdf_file_path = os.path.join(directory_path,"data_object.nc")
+        file(template_file_path,"w").write(template_file_contents)
+
+        module_data_object.set_timing_statistics(
+            module_data_object.TimingStatistics(record_a_call))
+        repeats_index = 0
+        while repeats_index < number_of_repeats:
+            creator = module_data_object.Creator()
+            data_object_type = creator.load_a_template(template_file_path)
+            data_object = creator.create_from_template(
+                data_object_type,scenario["lengths_of_dimensions"],
+                synthetic_substitutions)
+            fill_synthetic_data_object(data_object)
+            module_data_object.write_to_netcdf_file(
+                data_object,netcdf_file_path,
+                netcdf_format=scenario["netcdf_format"])
+            module_data_object.extract_from_netcdf_file(netcdf_file_path)
+            os.remove(netcdf_file_path)
+            repeats_index += 1
+    finally:
+        module_data_object.set_timing_statistics(None)
+        shutil.rmtree(directory_path)
+
+    results = collections.OrderedDict()
+    results["parameters"] = scenario
+    results["number_of_template_bytes"] = len(template_file_contents)
+    results["entry_points"] = collections.OrderedDict()
+    for entry_point in names_of_entry_points:
+        results["entry_points"][entry_point] = return_summary_of_calls(
+            calls_statistics_per_entry_point[entry_point])
+
+    return results
+#
+#########
+#
+# Returns a description of the machine and software versions, so that runs
+# made in different environments can be told apart.
+#
+def return_environment():
+    environment = collections.OrderedDict()
+    environment["host_name"] = platform.node()
+    environment["platform"] = platform.platform()
+    environment["processor"] = platform.processor()
+    environment["python_version"] = platform.python_version()
+    environment["numpy_version"] = numpy.__version__
+    environment["netcdf4_python_version"] = netCDF4.__version__
+    environment["netcdf_library_version"] = netCDF4.__netcdf4libversion__
+    environment["template_loader"] = \
+        module_data_object.template_loader_class.__name__
+
+    return environment
+#
+#########
+#
+# Main function that runs the named scenarios (all of the default ones if no
+# names are given), shows the median time per call of each entry point as
+# each scenario finishes, and returns the results of the run as a
+# dictionary, which can be written to a json file.
+#
+def run_benchmark_suite(names_of_scenarios=[],number_of_repeats=5):
+    default_scenarios = return_default_scenarios()
+    if names_of_scenarios == []:
+        names_of_scenarios = default_scenarios.keys()
+
+    results = collections.OrderedDict()
+    results["results_format_version"] = results_format_version
+    results["date"] = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+    results["number_of_repeats"] = number_of_repeats
+    results["environment"] = return_environment()
+    results["scenarios"] = collections.OrderedDict()
+
+    print "%-40s %10s %10s %10s %10s" % (
+        "scenario (median ms per call)","load","create","write","extract")
+    for scenario_name in names_of_scenarios:
+        if scenario_name not in default_scenarios:
+            print "ERROR: %s.run_benchmark_suite()" % __file__
+            print "  there is no scenario named %s" % scenario_name
+        else:
+            scenario_results = return_results_for_scenario(
+                scenario_name,default_scenarios[scenario_name],
+                number_of_repeats)
+            results["scenarios"][scenario_name] = scenario_results
+            print "%-40s %10.2f %10.2f %10.2f %10.2f" % tuple(
+                [scenario_name] +
+                [1000.0 * scenario_results["entry_points"][entry_point][
+                    "median_seconds"]
+                 for entry_point in names_of_entry_points])
+
+    return results
+#
+#########
+#
+# Main function that compares the results of two runs, which have been
+# written to json files. The ratio of the median time per call of each entry
+# point in each scenario (candidate / reference) is shown, and those more
+# than 1 + tolerance are marked as regressions. Scenarios that are only in
+# one of the runs are ignored. The function returns the number of
+# regressions.
+#
+def compare_benchmark_results(
+        reference_results_path,candidate_results_path,tolerance=0.1):
+
+    reference_results = json.load(file(reference_results_path))
+    candidate_results = json.load(file(candidate_results_path))
+    number_of_regressions = 0
+
+    if (reference_results["results_format_version"] !=
+        candidate_results["results_format_version"]):
+
+        print "WARNING: %s.compare_benchmark_results()" % __file__
+        print "  the results were written by different versions of the suite"
+
+    print "%-40s %-24s %10s %10s %8s" % (
+        "scenario","entry point","ref. (ms)","cand. (ms)","ratio")
+    for scenario_name in candidate_results["scenarios"]:
+        if scenario_name in reference_results["scenarios"]:
+            for entry_point in names_of_entry_points:
+                reference_seconds = reference_results["scenarios"][
+                    scenario_name]["entry_points"][entry_point][
+                    "median_seconds"]
+                candidate_seconds = candidate_results["scenarios"][
+                    scenario_name]["entry_points"][entry_point][
+                    "median_seconds"]
+                ratio = candidate_seconds / reference_seconds
+                marker = ""
+                if ratio > 1.0 + tolerance:
+                    marker = "  REGRESSION"
+                    number_of_regressions += 1
+
+                print "%-40s %-24s %10.2f %10.2f %8.2f%s" % (
+                    scenario_name,entry_point,1000.0 * reference_seconds,
+                    1000.0 * candidate_seconds,ratio,marker)
+
+    print "\n%i regressions of more than %i%%" % (
+        number_of_regressions,round(100.0 * tolerance))
+
+    return number_of_regressions
+#
+#########
+#
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(
+        description="Benchmark suite for module_data_object")
+    argument_parser.add_argument(
+        "--output",default="module_data_object_benchmark_results.json",
+        help="path of the json file that the results are written to")
+    argument_parser.add_argument(
+        "--scenario",action="append",default=[],dest="names_of_scenarios",
+        help="name of a scenario to run (may be given more than once; all of the scenarios are run by default)")
+    argument_parser.add_argument(
+        "--number-of-repeats",type=int,default=5,
+        help="number of times that each scenario is run")
+    argument_parser.add_argument(
+        "--list-scenarios",action="store_true",
+        help="show the names of the scenarios and exit")
+    argument_parser.add_argument(
+        "--compare",nargs=2,metavar=("REFERENCE","CANDIDATE"),
+        help="compare the results in two json files instead of running the suite")
+    argument_parser.add_argument(
+        "--tolerance",type=float,default=0.1,
+        help="fractional increase in the median time per call that counts as a regression when comparing")
+    arguments = argument_parser.parse_args()
+
+    if arguments.list_scenarios:
+        for scenario_name in return_default_scenarios():
+            print scenario_name
+    elif arguments.compare is not None:
+        if compare_benchmark_results(
+            arguments.compare[0],arguments.compare[1],arguments.tolerance) > 0:
+
+            sys.exit(1)
+    else:
+        results = run_benchmark_suite(
+            arguments.names_of_scenarios,arguments.number_of_repeats)
+        output_file = file(arguments.output,"w")
+        json.dump(results,output_file,indent=2)
+        output_file.close()
+        print "\nThe results have been written to %s" % arguments.output